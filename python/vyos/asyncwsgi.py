@@ -0,0 +1,426 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+An asyncio HTTP/1.1 server for WSGI applications, such as the HTTP API.
+
+Connections are handled by the event loop, with keep-alive, so idle and
+slow clients cost nothing but a socket. The application itself runs in
+thread pools: every request is dispatched to a pool chosen by the server
+owner, e.g. one for reads and one for commits, so that slow requests of
+one kind can't hold up the others.
+
+Each pool has a bounded queue. A request that finds it full is refused
+with 503 right away, and a request that doesn't get a response in the
+pool's timeout gets a 504 (the application keeps running it, Python
+threads can't be stopped).
+
+Responses of known length are sent with Content-Length, others are
+streamed with chunked transfer encoding.
+"""
+
+import io
+import sys
+import asyncio
+import traceback
+import concurrent.futures
+
+from urllib.parse import unquote
+
+DEFAULT_WORKERS = 8
+DEFAULT_QUEUE_DEPTH = 64
+DEFAULT_TIMEOUT = 60
+DEFAULT_KEEPALIVE_TIMEOUT = 15
+
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+# Streamed chunks the application may produce ahead of the client
+_STREAM_BUFFER = 16
+
+_reasons = {
+    400: 'Bad Request',
+    413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error',
+    501: 'Not Implemented',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+    505: 'HTTP Version Not Supported',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or _reasons[status])
+        self.status = status
+
+
+class WorkerPool(object):
+    """
+    Args:
+        name (str): pool name, used for thread names
+        workers (int): number of threads
+        queue_depth (int): number of requests that may wait for a thread
+        timeout (float): seconds a request may take before it gets a 504
+
+    Attributes:
+        pending (int): requests running or waiting in the pool
+        rejected (int): total requests refused because the queue was full
+        timeouts (int): total requests that timed out
+    """
+    def __init__(self, name, workers=DEFAULT_WORKERS, queue_depth=DEFAULT_QUEUE_DEPTH,
+                 timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                              thread_name_prefix=name)
+        # Only changed from the event loop thread
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def depth(self):
+        """ Returns: the number of requests waiting for a thread """
+        return max(0, self.pending - self.workers)
+
+    def full(self):
+        return self.pending >= self.workers + self.queue_depth
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class _Stream(object):
+    """ Passes a response from the application thread to the event loop """
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=_STREAM_BUFFER)
+        # Set by the event loop if the client is gone
+        self.aborted = False
+
+    def put(self, item):
+        # Blocks while the client is slower than the application
+        asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+
+def _run_app(app, environ, stream):
+    """ Runs in a pool thread """
+    response = []
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info is not None and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response[:] = [status, headers]
+        return written.append
+
+    try:
+        result = app(environ, start_response)
+        try:
+            if isinstance(result, (list, tuple)):
+                stream.put(('response', response[0], response[1], b''.join(written + list(result))))
+                return
+            body = iter(result)
+            # start_response may be called as late as the first chunk
+            first = b''.join(written) + next(body, b'')
+            stream.put(('start', response[0], response[1], first))
+            for chunk in body:
+                if stream.aborted:
+                    return
+                if chunk:
+                    stream.put(('chunk', chunk))
+            stream.put(('end',))
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+    except Exception:
+        if not stream.aborted:
+            stream.put(('error', traceback.format_exc()))
+
+
+def _status_line(status):
+    return 'HTTP/1.1 {0} {1}\r\n'.format(status, _reasons.get(status, ''))
+
+
+class AsyncWSGIServer(object):
+    """
+    Args:
+        app: WSGI application
+        host (str): listen address
+        port (int): listen port
+        pools (list): WorkerPool objects, the first one is the default
+        select_pool (callable): takes a WSGI environ, returns the pool to run
+            the request in, or None for the default pool
+        keepalive_timeout (float): seconds an idle connection is kept open
+    """
+    def __init__(self, app, host, port, pools, select_pool=None,
+                 keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT):
+        self.app = app
+        self.host = host
+        self.port = int(port)
+        self.pools = pools
+        self.select_pool = select_pool
+        self.keepalive_timeout = keepalive_timeout
+        self.loop = None
+        self._server = None
+        self._connections = set()
+
+    async def start(self):
+        self.loop = asyncio.get_event_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=MAX_HEADER_SIZE)
+        # With port 0, the port is chosen by the system
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        # Idle keep-alive connections
+        for task in list(self._connections):
+            task.cancel()
+        if self._connections:
+            await asyncio.wait(list(self._connections))
+        for pool in self.pools:
+            pool.shutdown()
+
+    def serve_forever(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self.start())
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self.stop())
+            loop.close()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keepalive_timeout)
+                except asyncio.LimitOverrunError:
+                    await self._send_error(writer, 431, False)
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+
+                try:
+                    environ, keep_alive = await self._read_request(head, reader, writer)
+                except HTTPError as e:
+                    await self._send_error(writer, e.status, False, str(e))
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+
+                if not await self._respond(environ, writer, keep_alive):
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception:
+            print(traceback.format_exc(), file=sys.stderr)
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, head, reader, writer):
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        if version not in ['HTTP/1.0', 'HTTP/1.1']:
+            raise HTTPError(505)
+
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise HTTPError(400, "Malformed header line")
+            name = name.strip().upper().replace('-', '_')
+            value = value.strip()
+            headers[name] = headers[name] + ',' + value if name in headers else value
+
+        connection = headers.get('CONNECTION', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive = 'close' not in connection
+        else:
+            keep_alive = 'keep-alive' in connection
+
+        if headers.get('EXPECT', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+
+        if 'chunked' in headers.get('TRANSFER_ENCODING', '').lower():
+            body = await self._read_chunked(reader)
+        else:
+            try:
+                length = int(headers.get('CONTENT_LENGTH', '0'))
+            except ValueError:
+                raise HTTPError(400, "Malformed Content-Length")
+            if length > MAX_BODY_SIZE:
+                raise HTTPError(413)
+            body = await asyncio.wait_for(reader.readexactly(length), self.keepalive_timeout)
+
+        path, _, query = target.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path, 'latin-1'),
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': headers.pop('CONTENT_TYPE', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': str(self.port),
+            'SERVER_PROTOCOL': version,
+            'REMOTE_ADDR': writer.get_extra_info('peername', ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        headers.pop('CONTENT_LENGTH', None)
+        for name, value in headers.items():
+            environ['HTTP_' + name] = value
+        return environ, keep_alive
+
+    async def _read_chunked(self, reader):
+        body = b''
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+            try:
+                size = int(line.split(b';')[0], 16)
+            except ValueError:
+                raise HTTPError(400, "Malformed chunk size")
+            if len(body) + size > MAX_BODY_SIZE:
+                raise HTTPError(413)
+            if size == 0:
+                # Skip trailers
+                while (await reader.readline()) not in [b'\r\n', b'\n', b'']:
+                    pass
+                return body
+            body += await asyncio.wait_for(reader.readexactly(size), self.keepalive_timeout)
+            await reader.readline()
+
+    async def _send_error(self, writer, status, keep_alive, message=None):
+        body = (message or _reasons[status]).encode() + b'\n'
+        headers = [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))]
+        if status == 503:
+            headers.append(('Retry-After', '1'))
+        self._write_head(writer, _status_line(status), headers, keep_alive)
+        writer.write(body)
+        await writer.drain()
+
+    def _write_head(self, writer, status_line, headers, keep_alive):
+        head = status_line
+        for name, value in headers:
+            head += '{0}: {1}\r\n'.format(name, value)
+        head += 'Connection: {0}\r\n\r\n'.format('keep-alive' if keep_alive else 'close')
+        writer.write(head.encode('latin-1'))
+
+    async def _respond(self, environ, writer, keep_alive):
+        """ Returns: True if the connection can be used for another request """
+        pool = None
+        if self.select_pool is not None:
+            pool = self.select_pool(environ)
+        if pool is None:
+            pool = self.pools[0]
+
+        if pool.full():
+            pool.rejected += 1
+            await self._send_error(writer, 503, keep_alive, "Too many requests, try again later")
+            return keep_alive
+
+        stream = _Stream(self.loop)
+        pool.pending += 1
+        future = pool.executor.submit(_run_app, self.app, environ, stream)
+        future.add_done_callback(lambda f: self.loop.call_soon_threadsafe(self._release, pool))
+
+        try:
+            item = await asyncio.wait_for(stream.queue.get(), pool.timeout)
+        except asyncio.TimeoutError:
+            # If it's still in the queue, it will never run
+            future.cancel()
+            stream.aborted = True
+            pool.timeouts += 1
+            await self._send_error(writer, 504, keep_alive, "Request timed out")
+            return keep_alive
+
+        if item[0] == 'error':
+            print(item[1], file=sys.stderr)
+            await self._send_error(writer, 500, keep_alive)
+            return keep_alive
+
+        _, status, headers, data = item
+        code = int(status.split(' ', 1)[0])
+        no_body = (environ['REQUEST_METHOD'] == 'HEAD') or (code in [204, 304]) or (code < 200)
+        names = [name.lower() for name, _ in headers]
+
+        if item[0] == 'response':
+            if not no_body and 'content-length' not in names:
+                headers = headers + [('Content-Length', str(len(data)))]
+            self._write_head(writer, 'HTTP/1.1 {0}\r\n'.format(status), headers, keep_alive)
+            if not no_body:
+                writer.write(data)
+            await writer.drain()
+            return keep_alive
+
+        # A streamed response
+        chunked = False
+        if not no_body and 'content-length' not in names:
+            if environ['SERVER_PROTOCOL'] == 'HTTP/1.1':
+                chunked = True
+                headers = headers + [('Transfer-Encoding', 'chunked')]
+            else:
+                # The end of the response is the end of the connection
+                keep_alive = False
+        self._write_head(writer, 'HTTP/1.1 {0}\r\n'.format(status), headers, keep_alive)
+
+        try:
+            while True:
+                if data and not no_body:
+                    writer.write(b'%x\r\n%s\r\n' % (len(data), data) if chunked else data)
+                    await writer.drain()
+                item = await asyncio.wait_for(stream.queue.get(), pool.timeout)
+                if item[0] == 'end':
+                    break
+                elif item[0] == 'error':
+                    # Too late for an error response, the client must see
+                    # that the response is incomplete
+                    print(item[1], file=sys.stderr)
+                    return False
+                data = item[1]
+        except (asyncio.TimeoutError, ConnectionError):
+            stream.aborted = True
+            # Let the application thread finish
+            while not stream.queue.empty():
+                stream.queue.get_nowait()
+            return False
+
+        if chunked and not no_body:
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        return keep_alive
+
+    def _release(self, pool):
+        pool.pending -= 1
@@ -0,0 +1,204 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Group commits for config sessions shared by concurrent clients.
+
+Every client submits its own list of operations and waits for the result.
+The first client to arrive becomes the leader: it waits for a short window,
+takes every request submitted in the meantime, applies them in the order
+they arrived and commits them all at once. Clients that arrive while a
+group is being committed form the next group, led by the first of them.
+
+Each request still gets its own result:
+
+* A request whose operations fail, or whose check rejects it, fails alone.
+  The session is discarded and the group is applied again without it.
+* If the commit of a group fails, the group is split in half and each half
+  is committed on its own, until the requests that make it fail are found.
+"""
+
+import time
+import threading
+
+from vyos.configsession import ConfigSessionError
+
+DEFAULT_WINDOW = 0.05
+
+
+class _Request(object):
+    def __init__(self, ops, check):
+        self.ops = ops
+        self.check = check
+        self.errors = None
+        self.exception = None
+        self.lead = False
+
+    @property
+    def done(self):
+        return self.errors is not None or self.exception is not None
+
+
+class CommitCoalescer(object):
+    """
+    Args:
+        session (ConfigSession): the session all requests are applied in
+        lock (threading.Lock): lock held while the session is used,
+            shared with other users of the session
+        window (float): how long the leader waits for more requests, in seconds
+        on_commit (callable): called after every successful commit, with the
+            lock held and before the results are returned to clients
+        lock_wait (vyos.metrics.Histogram): records how long groups wait for the lock
+        commit_duration (vyos.metrics.Histogram): records how long commits take
+    """
+    def __init__(self, session, lock=None, window=DEFAULT_WINDOW, on_commit=None,
+                 lock_wait=None, commit_duration=None):
+        self.session = session
+        self.lock = lock if lock is not None else threading.Lock()
+        self.window = window
+        self.on_commit = on_commit
+        self.lock_wait = lock_wait
+        self.commit_duration = commit_duration
+        self._cond = threading.Condition()
+        self._pending = []
+        self._leader = False
+
+        # Totals, for monitoring
+        self.commits = 0
+        self.failed_commits = 0
+
+    def depth(self):
+        """ Returns: the number of requests waiting for the next group """
+        with self._cond:
+            return len(self._pending)
+
+    def submit(self, ops, check=None):
+        """
+        Apply and commit operations, together with those of other clients.
+
+        Args:
+            ops (list): (op, path, value) tuples, as for ConfigSession.apply_batch
+            check (callable): called right before the operations are applied,
+                may raise ConfigSessionError to reject the request
+
+        Returns:
+            list: (index, message) for every error, empty on success.
+            The index is that of the failed operation, None for errors
+            of the check or the commit.
+        """
+        req = _Request(ops, check)
+        with self._cond:
+            self._pending.append(req)
+            first = not self._leader
+            if first:
+                self._leader = True
+                req.lead = True
+            while not (req.done or req.lead):
+                self._cond.wait()
+
+        if not req.done:
+            self._lead(wait=first)
+
+        if req.exception is not None:
+            raise req.exception
+        return req.errors
+
+    def _lead(self, wait):
+        # A leader that took over from the previous one has been waiting
+        # while the previous group was committed, that's its window
+        if wait and self.window > 0:
+            time.sleep(self.window)
+
+        with self._cond:
+            group = self._pending
+            self._pending = []
+
+        start = time.monotonic()
+        with self.lock:
+            if self.lock_wait is not None:
+                self.lock_wait.observe(time.monotonic() - start)
+            try:
+                self._commit(group)
+            except Exception as e:
+                for req in group:
+                    if not req.done:
+                        req.exception = e
+                try:
+                    self.session.discard()
+                except Exception:
+                    pass
+
+        with self._cond:
+            if self._pending:
+                self._pending[0].lead = True
+            else:
+                self._leader = False
+            self._cond.notify_all()
+
+    def _apply(self, reqs):
+        """ Returns: (request, errors) for the requests that failed """
+        failed = []
+        for req in reqs:
+            try:
+                if req.check is not None:
+                    req.check()
+                errors = self.session.apply_batch(req.ops)
+            except ConfigSessionError as e:
+                errors = [(None, str(e))]
+            if errors:
+                failed.append((req, errors))
+        return failed
+
+    def _commit(self, reqs):
+        while reqs:
+            failed = self._apply(reqs)
+            if not failed:
+                break
+            # Changes of the failed requests must not be committed
+            self.session.discard()
+            for req, errors in failed:
+                req.errors = errors
+            reqs = [r for r in reqs if not r.done]
+
+        if not reqs:
+            return
+
+        start = time.monotonic()
+        try:
+            self.session.commit()
+            error = None
+        except ConfigSessionError as e:
+            error = e
+        if self.commit_duration is not None:
+            self.commit_duration.observe(time.monotonic() - start)
+
+        if error is None:
+            self.commits += 1
+        else:
+            self.failed_commits += 1
+            self.session.discard()
+            if len(reqs) == 1:
+                reqs[0].errors = [(None, str(error))]
+                return
+            middle = len(reqs) // 2
+            self._commit(reqs[:middle])
+            self._commit(reqs[middle:])
+            return
+
+        if self.on_commit is not None:
+            self.on_commit()
+
+        for req in reqs:
+            req.errors = []
@@ -0,0 +1,256 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Plans the config scripts of a commit, so that vyos-configd can run scripts
+of independent subsystems concurrently.
+
+The commit engine runs the owner of every changed node one by one, in the
+order of their priorities. Most scripts under ``service`` and a few under
+``system`` only manage their own daemon, so waiting for e.g. ``ssh.py``
+to restart sshd before ``snmp.py`` can start is wasted time.
+
+A plan is a list of tasks, one per changed owner node (and per changed tag
+value of tag nodes), in the order the commit engine would run them, and a
+dependency graph. A task runs after every task that precedes it in that
+order, unless both are in ``PARALLEL_SUBTREES``, neither node is under the
+other, and they share no scripts, counting the scripts named in their
+module level ``dependencies`` lists.
+
+The commit engine still asks for every script in turn, and CommitRun decides
+which tasks may start before they are asked for. Their exit codes and output
+are handed over when the commit engine asks for them, so errors are reported
+in the serial order, and the commit engine discards the changes under the
+nodes of failed scripts as it always does.
+"""
+
+import os
+import ast
+import shlex
+
+from vyos.defaults import directories
+
+CONF_SCRIPTS_VAR = '${vyos_conf_scripts_dir}'
+
+# Subtrees whose scripts may run concurrently with each other
+PARALLEL_SUBTREES = [
+    ['service'],
+    ['system', 'ntp'],
+    ['system', 'syslog'],
+]
+
+# Nodes without a priority of their own or on any of their ancestors
+# are committed after all other nodes
+DEFAULT_PRIORITY = 1000000
+
+DEFAULT_JOBS = 4
+
+
+def _is_under(path, subtree):
+    return path[:len(subtree)] == subtree
+
+def script_dependencies(script):
+    """
+    Returns:
+        str list: file names of the scripts a conf_mode script declares
+        in its module level ``dependencies`` list
+    """
+    try:
+        with open(script, 'r') as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, ValueError):
+        return []
+
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        if not any(isinstance(t, ast.Name) and t.id == 'dependencies' for t in node.targets):
+            continue
+        try:
+            value = ast.literal_eval(node.value)
+        except ValueError:
+            return []
+        return [os.path.basename(d) for d in value if isinstance(d, str)]
+    return []
+
+
+class Task(object):
+    """
+    A run of the owner of a config node.
+
+    Args:
+        owner (str): owner attribute of the node, as in the interface definition
+        path (str list): path of the node, without the tag value
+        priority (int): commit priority of the node
+        tag_value (str): tag value, for owners of tag nodes
+        conf_dir (str): directory of the conf_mode scripts
+    """
+    def __init__(self, owner, path, priority, tag_value=None, conf_dir=directories['conf_mode']):
+        self.owner = owner
+        self.path = list(path)
+        self.priority = priority
+        self.tag_value = tag_value
+
+        self.argv = shlex.split(owner.replace(CONF_SCRIPTS_VAR, conf_dir))
+        # Scripts run with sudo are still the same script
+        script = self.argv[1] if self.argv[0] == 'sudo' and len(self.argv) > 1 else self.argv[0]
+        self.script = os.path.basename(script)
+        self.scripts = set([self.script] + script_dependencies(script))
+
+        self.parallel = any(_is_under(self.path, s) for s in PARALLEL_SUBTREES)
+
+    def full_path(self):
+        """ Returns: path of the node, with the tag value """
+        if self.tag_value is None:
+            return self.path
+        return self.path + [self.tag_value]
+
+    def env(self, env=None):
+        """ Returns: the environment to run the owner in, based on env or os.environ """
+        env = dict(env if env is not None else os.environ)
+        if self.tag_value is not None:
+            env['VYOS_TAGNODE_VALUE'] = self.tag_value
+        else:
+            env.pop('VYOS_TAGNODE_VALUE', None)
+        return env
+
+    def __repr__(self):
+        return "Task({0}, {1})".format(" ".join(self.full_path()), self.script)
+
+
+def find_tasks(index, diff, conf_dir=directories['conf_mode']):
+    """
+    Args:
+        index (NodeIndex): index of the config nodes, with owners
+        diff (ConfigDiff): differences between the running and the proposed config
+
+    Returns:
+        list: tasks for the owners of changed nodes, in the order
+        the commit engine runs them
+    """
+    tasks = []
+
+    def walk(children, path, priority):
+        for name in sorted(children):
+            entry = children[name]
+            node_path = path + [name]
+            node_priority = entry.get('priority', priority)
+            if not diff.is_changed(node_path):
+                continue
+
+            owner = entry.get('owner')
+            if entry['type'] == 'tag':
+                values = sorted(set(diff.added(node_path)) | set(diff.deleted(node_path)) |
+                                set(diff.changed(node_path)))
+                for value in values:
+                    if owner:
+                        tasks.append(Task(owner, node_path, node_priority, value, conf_dir))
+                    walk(entry.get('children', {}), node_path + [value], node_priority)
+            else:
+                if owner:
+                    tasks.append(Task(owner, node_path, node_priority, None, conf_dir))
+                walk(entry.get('children', {}), node_path, node_priority)
+
+    walk(index.lookup([])['children'], [], DEFAULT_PRIORITY)
+
+    # sorted() is stable, so nodes of the same priority keep the order of
+    # the walk, in which parents come before their children
+    return sorted(tasks, key=lambda t: t.priority)
+
+def independent(a, b):
+    """ Returns: True if tasks a and b may run concurrently """
+    if not (a.parallel and b.parallel):
+        return False
+    if _is_under(a.path, b.path) or _is_under(b.path, a.path):
+        return False
+    return not (a.scripts & b.scripts)
+
+def build_graph(tasks):
+    """
+    Returns:
+        list: for every task, the set of indices of the tasks it must wait for
+    """
+    graph = []
+    for i, task in enumerate(tasks):
+        graph.append(set(j for j in range(i) if not independent(tasks[j], task)))
+    return graph
+
+
+class CommitRun(object):
+    """
+    The progress of a commit through its plan.
+
+    The commit engine asks for the tasks one by one, in the order of the plan.
+    A task that has not been asked for yet may start once all tasks it waits
+    for are done, if it is in ``PARALLEL_SUBTREES`` and fewer than ``jobs``
+    tasks are running. Once the commit engine asks for a task, all tasks
+    before it are done, whether they ran here or not (e.g. owners that
+    are not Python scripts run without vyos-configd).
+
+    Args:
+        tasks (list): the plan, as returned by find_tasks()
+        jobs (int): maximum number of tasks running at the same time
+    """
+    def __init__(self, tasks, jobs=DEFAULT_JOBS):
+        self.tasks = tasks
+        self.graph = build_graph(tasks)
+        self.jobs = max(1, jobs)
+        self.requested = set()
+        self.running = set()
+        self.done = set()
+
+    def match(self, argv, tag_value):
+        """
+        Returns:
+            int: index of the first task not asked for yet that runs argv
+            with the tag value, None if the plan has no such task
+        """
+        for i, task in enumerate(self.tasks):
+            if i not in self.requested and task.argv == argv and task.tag_value == tag_value:
+                return i
+        return None
+
+    def request(self, i):
+        """ The commit engine asks for task i """
+        self.requested.add(i)
+        for j in range(i):
+            if j not in self.running:
+                self.done.add(j)
+
+    def start(self, i):
+        self.running.add(i)
+
+    def finish(self, i):
+        self.running.discard(i)
+        self.done.add(i)
+
+    def ready(self, i):
+        """ Returns: True if task i, asked for, may start """
+        return not (self.graph[i] & self.running)
+
+    def prefetch(self):
+        """
+        Returns:
+            list: indices of the tasks that may start before they are asked for
+        """
+        tasks = []
+        for i, task in enumerate(self.tasks):
+            if len(self.running) + len(tasks) >= self.jobs:
+                break
+            if i in self.requested or i in self.running or i in self.done:
+                continue
+            if task.parallel and self.graph[i] <= self.done:
+                tasks.append(i)
+        return tasks
@@ -64,11 +64,37 @@ should also use these functions because not having nodes you've just created in
 However, in operational mode, only the running config is available. Currently, you need to use special functions
 for reading it from operational mode scripts, they can be distinguished by the word "effective" in their names.
 In the future base versions may be made to detect if they are called from a config session or not.
+
+Config snapshots
+################
+
+By default, a config object loads the running and the proposed configs into memory
+the first time it needs them (using one ``showConfig`` call each) and answers all
+subsequent queries from that snapshot, instead of calling ``cli-shell-api`` once
+or several times per query. Since a snapshot is never refreshed, long-lived processes
+that modify the config, such as the HTTP API server, should use ``Config(snapshot=False)``,
+or ``vyos.configversions`` to get a fresh snapshot after every commit.
+
+Node type queries (``is_tag``, ``is_leaf``, ``is_multi``) are answered from the node index
+built from the XML interface definitions (see ``vyos.configindex``), and only nodes defined
+elsewhere need a ``cli-shell-api`` call.
+
+Backend calls are made through a long-lived shell shared with other config objects
+and config sessions using the same environment (see ``vyos.shellapi``).
+
+The old behaviour can also be restored for all config objects by setting the ``VYOS_CONFIG_BACKEND``
+environment variable to ``cli-shell-api``.
 """
 
-import subprocess
+import os
 import re
 
+import vyos.configindex
+import vyos.shellapi
+import vyos.trace
+from vyos.configsnapshot import ConfigSnapshot
+from vyos.configdiff import ConfigDiff
+
 
 class VyOSError(Exception):
     """
@@ -79,15 +105,40 @@ class VyOSError(Exception):
     pass
 
 
+def _to_dict(node, entry):
+    """ Convert a snapshot subtree to the get_config_dict format, using node index entries """
+    if isinstance(node, list):
+        if entry is not None and entry['type'] == 'tag':
+            return dict((v, {}) for v in node)
+        elif not node:
+            return {}
+        elif (entry is not None and entry.get('multi')) or (entry is None and len(node) > 1):
+            return list(node)
+        return node[0]
+
+    children = entry.get('children') if entry is not None else None
+    if entry is not None and entry['type'] == 'tag':
+        return dict((value, _children_to_dict(subtree, children)) for value, subtree in node.items())
+    return _children_to_dict(node, children)
+
+def _children_to_dict(node, children):
+    if isinstance(node, list):
+        # A tag value printed with a value of its own, not a valid config
+        return list(node)
+    if not children:
+        children = {}
+    return dict((name, _to_dict(subtree, children.get(name))) for name, subtree in node.items())
+
+
 class Config(object):
     """
     The class of config access objects.
 
     Internally, in the current implementation, this object is *almost* stateless,
     the only state it keeps is relative *config path* for convenient access to config
-    subtrees.
+    subtrees, and the config snapshot, if it's enabled.
     """
-    def __init__(self, session_env=None):
+    def __init__(self, session_env=None, snapshot=None):
         self._cli_shell_api = "/bin/cli-shell-api"
         self._level = ""
         if session_env:
@@ -95,23 +146,184 @@ class Config(object):
         else:
             self.__session_env = None
 
+        legacy = os.environ.get('VYOS_CONFIG_BACKEND') == 'cli-shell-api'
+        if snapshot is None:
+            snapshot = not legacy
+        self._snapshot = snapshot
+        if legacy:
+            self._node_index = vyos.configindex.NodeIndex({})
+        else:
+            self._node_index = vyos.configindex.load()
+        self._running_config = None
+        self._session_config = None
+        self._config_diff = None
+        # Whether the object is used in a config session, which can't change
+        self._in_session = None
+
     def _make_command(self, op, path):
         args = path.split()
         cmd = [self._cli_shell_api, op] + args
         return cmd
 
+    @vyos.trace.traced('config')
     def _run(self, cmd):
-        if self.__session_env:
-            p = subprocess.Popen(cmd, stdout=subprocess.PIPE, env=self.__session_env)
-        else:
-            p = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-        out = p.stdout.read()
-        p.wait()
-        if p.returncode != 0:
+        returncode, out = vyos.shellapi.run(cmd, env=self.__session_env)
+        if returncode != 0:
             raise VyOSError()
         else:
             return out.decode('ascii')
 
+    def _load_snapshot(self):
+        if self._running_config is not None:
+            return
+
+        running_config_text = self.show_config_raw(effective=True)
+
+        # Proposed config only exists in a config session,
+        # in op mode it's the same as the running config
+        if self.in_session():
+            session_config_text = self.show_config_raw()
+        else:
+            session_config_text = running_config_text
+
+        self._running_config = ConfigSnapshot(running_config_text)
+        if session_config_text is running_config_text:
+            self._session_config = self._running_config
+        else:
+            self._session_config = ConfigSnapshot(session_config_text)
+
+    def _make_path(self, path):
+        return (self._level + path).split()
+
+    def _session_snapshot(self):
+        self._load_snapshot()
+        return self._session_config
+
+    def _running_snapshot(self):
+        self._load_snapshot()
+        return self._running_config
+
+    def show_config_raw(self, effective=False):
+        """
+        Retrieve the complete running or proposed config, including
+        default values, in the format suitable for loading a snapshot from.
+
+        Args:
+            effective (bool): return the running config rather than the proposed config
+
+        Returns:
+            str: config text, empty string if the config is not available
+        """
+        if effective:
+            cmd = [self._cli_shell_api, '--show-active-only']
+        else:
+            cmd = [self._cli_shell_api, '--show-working-only']
+        cmd += ['--show-show-defaults', '--show-ignore-edit', 'showConfig']
+        try:
+            return self._run(cmd)
+        except VyOSError:
+            # Before the config system is initialized during boot,
+            # there's no config to show
+            return ''
+
+    def _session_exists(self):
+        if self._in_session is None:
+            self._in_session = self.in_session()
+        return self._in_session
+
+    def _read_subtree(self, path_list, effective):
+        """
+        Read a subtree of the running or proposed config with one showConfig
+        call, for config objects without a snapshot. showConfig prints the
+        children of a node, so leaf nodes are read with their parent.
+
+        Returns:
+            the subtree, as ConfigSnapshot.get_subtree returns it
+        """
+        if not effective:
+            # Outside of a session, the proposed config is the running config
+            effective = not self._session_exists()
+
+        name = None
+        if path_list:
+            leaf = self._node_index.is_leaf(path_list)
+            if leaf is None:
+                try:
+                    self._run([self._cli_shell_api, 'isLeaf'] + path_list)
+                    leaf = True
+                except VyOSError:
+                    leaf = False
+            if leaf:
+                path_list, name = path_list[:-1], path_list[-1]
+
+        if effective:
+            cmd = [self._cli_shell_api, '--show-active-only']
+        else:
+            cmd = [self._cli_shell_api, '--show-working-only']
+        cmd += ['--show-show-defaults', '--show-ignore-edit', 'showConfig'] + path_list
+        try:
+            subtree = ConfigSnapshot(self._run(cmd)).get_subtree([])
+        except VyOSError:
+            return None
+        if name is not None:
+            return subtree.get(name) if isinstance(subtree, dict) else None
+        return subtree
+
+    def get_config_dict(self, path='', effective=False):
+        """
+        Retrieve a config subtree as a dict. With the snapshot enabled, the
+        backend is only called the first time, to load the snapshot. Without it,
+        only the subtree is read, with one showConfig call per call (plus an
+        isLeaf call for paths the node index doesn't know, and an inSession
+        call the first time).
+
+        Non-leaf nodes become dicts, tag nodes become dicts indexed by tag values.
+        Values of multi nodes are lists, values of other leaf nodes are strings,
+        and valueless nodes are empty dicts. For multi nodes that are not in the
+        node index, a list is only returned if the node has more than one value.
+
+        Args:
+            path (str): Configuration tree path, can be empty
+            effective (bool): retrieve the running config rather than the proposed config
+
+        Returns:
+            dict: config subtree, empty dict if the node doesn't exist
+        """
+        path_list = self._make_path(path)
+        if self._snapshot:
+            if effective:
+                snapshot = self._running_snapshot()
+            else:
+                snapshot = self._session_snapshot()
+            subtree = snapshot.get_subtree(path_list)
+        else:
+            subtree = self._read_subtree(path_list, effective)
+
+        if subtree is None:
+            return {}
+        return _to_dict(subtree, self._node_index.lookup(path_list))
+
+    def get_config_diff(self):
+        """
+        Compare the running and the proposed config.
+
+        With the snapshot enabled, the diff is computed once and reused.
+
+        Returns:
+            ConfigDiff: the differences, queried by absolute config paths
+        """
+        if self._snapshot:
+            if self._config_diff is None:
+                self._config_diff = ConfigDiff(self._running_snapshot(), self._session_snapshot())
+            return self._config_diff
+
+        running = ConfigSnapshot(self.show_config_raw(effective=True))
+        if self._session_exists():
+            proposed = ConfigSnapshot(self.show_config_raw())
+        else:
+            proposed = running
+        return ConfigDiff(running, proposed)
+
     def set_level(self, path):
         """
         Set the *edit level*, that is, a relative config tree path.
@@ -148,6 +360,9 @@ class Config(object):
             This function cannot be used outside a configuration sessions.
             In operational mode scripts, use ``exists_effective``.
         """
+        if self._snapshot:
+            return self._session_snapshot().exists(self._make_path(path))
+
         try:
             self._run(self._make_command('exists', self._level + path))
             return True
@@ -202,6 +417,10 @@ class Config(object):
         Note:
             It also returns False if node doesn't exist.
         """
+        res = self._node_index.is_multi(self._make_path(path))
+        if res is not None:
+            return res
+
         try:
             self._run(self._make_command('isMulti', self._level + path))
             return True
@@ -219,6 +438,10 @@ class Config(object):
         Note:
             It also returns False if node doesn't exist.
         """
+        res = self._node_index.is_tag(self._make_path(path))
+        if res is not None:
+            return res
+
         try:
             self._run(self._make_command('isTag', self._level + path))
             return True
@@ -236,6 +459,10 @@ class Config(object):
         Note:
             It also returns False if node doesn't exist.
         """
+        res = self._node_index.is_leaf(self._make_path(path))
+        if res is not None:
+            return res
+
         try:
             self._run(self._make_command('isLeaf', self._level + path))
             return True
@@ -269,6 +496,11 @@ class Config(object):
             raise VyOSError("Cannot use return_value on multi node: {0}".format(full_path))
         elif not self.is_leaf(path):
             raise VyOSError("Cannot use return_value on non-leaf node: {0}".format(full_path))
+        elif self._snapshot:
+            value = self._session_snapshot().return_value(self._make_path(path))
+            if value is None:
+                return(default)
+            return value
         else:
             try:
                 out = self._run(self._make_command('returnValue', full_path))
@@ -299,6 +531,11 @@ class Config(object):
             raise VyOSError("Cannot use return_values on non-multi node: {0}".format(full_path))
         elif not self.is_leaf(path):
             raise VyOSError("Cannot use return_values on non-leaf node: {0}".format(full_path))
+        elif self._snapshot:
+            values = self._session_snapshot().return_values(self._make_path(path))
+            if values is None:
+                return(default)
+            return values
         else:
             try:
                 out = self._run(self._make_command('returnValues', full_path))
@@ -329,6 +566,11 @@ class Config(object):
         """
         full_path = self._level + path
         if self.is_tag(path):
+            if self._snapshot:
+                nodes = self._session_snapshot().list_nodes(self._make_path(path))
+                if nodes is None:
+                    return(default)
+                return nodes
             try:
                 out = self._run(self._make_command('listNodes', full_path))
                 values = re.findall(r"\'(.*?)\'", out)
@@ -352,6 +594,9 @@ class Config(object):
             This function is safe to use in operational mode. In configuration mode,
             it ignores uncommited changes.
         """
+        if self._snapshot:
+            return self._running_snapshot().exists(self._make_path(path))
+
         try:
             self._run(self._make_command('existsEffective', self._level + path))
             return True
@@ -377,6 +622,11 @@ class Config(object):
             raise VyOSError("Cannot use return_effective_value on multi node: {0}".format(full_path))
         elif not self.is_leaf(path):
             raise VyOSError("Cannot use return_effective_value on non-leaf node: {0}".format(full_path))
+        elif self._snapshot:
+            value = self._running_snapshot().return_value(self._make_path(path))
+            if value is None:
+                return(default)
+            return value
         else:
             try:
                 out = self._run(self._make_command('returnEffectiveValue', full_path))
@@ -402,6 +652,11 @@ class Config(object):
             raise VyOSError("Cannot use return_effective_values on non-multi node: {0}".format(full_path))
         elif not self.is_leaf(path):
             raise VyOSError("Cannot use return_effective_values on non-leaf node: {0}".format(full_path))
+        elif self._snapshot:
+            values = self._running_snapshot().return_values(self._make_path(path))
+            if values is None:
+                return(default)
+            return values
         else:
             try:
                 out = self._run(self._make_command('returnEffectiveValues', full_path))
@@ -429,6 +684,11 @@ class Config(object):
         """
         full_path = self._level + path
         if self.is_tag(path):
+            if self._snapshot:
+                nodes = self._running_snapshot().list_nodes(self._make_path(path))
+                if nodes is None:
+                    return(default)
+                return nodes
             try:
                 out = self._run(self._make_command('listEffectiveNodes', full_path))
                 values = out.split()
@@ -18,7 +18,10 @@ A library for retrieving value dicts from VyOS configs in a declarative fashion.
 
 """
 
+import os
+
 from vyos import ConfigError
+from vyos.config import VyOSError
 
 def retrieve_config(path_hash, base_path, config):
     """
@@ -41,6 +44,10 @@ def retrieve_config(path_hash, base_path, config):
     Returns:
         dict: config dict
     """
+    config_dict = config.get_config_dict(" ".join(base_path))
+    return _retrieve_from_dict(path_hash, base_path, config_dict)
+
+def _retrieve_from_dict(path_hash, base_path, config_dict):
     config_hash = {}
 
     for k in path_hash:
@@ -58,25 +65,39 @@ def retrieve_config(path_hash, base_path, config):
         if type(typ) != type:
             raise ValueError("In field {0}: type must be a type, not a {1}".format(k, type(typ)))
 
-        path = base_path + path
+        node = config_dict
+        for name in path:
+            if not isinstance(node, dict) or name not in node:
+                node = None
+                break
+            node = node[name]
 
-        path_str = " ".join(path)
+        path_str = " ".join(base_path + path)
 
         if typ == str:
-            config_hash[k] = config.return_value(path_str)
+            if isinstance(node, list):
+                raise VyOSError("Cannot use return_value on multi node: {0}".format(path_str))
+            config_hash[k] = node if isinstance(node, str) else None
         elif typ == list:
-            config_hash[k] = config.return_values(path_str)
+            if node is None:
+                config_hash[k] = []
+            elif isinstance(node, str):
+                config_hash[k] = [node]
+            elif isinstance(node, list):
+                config_hash[k] = node
+            else:
+                raise VyOSError("Cannot use return_values on non-leaf node: {0}".format(path_str))
         elif typ == bool:
-            config_hash[k] = config.exists(path_str)
+            config_hash[k] = node is not None
         elif typ == dict:
             try:
                 inner_hash = path_hash[k][2]
             except IndexError:
                 raise ValueError("The type of the \'{0}\' field is dict, but inner options hash is missing from the tuple".format(k))
             config_hash[k] = {}
-            nodes = config.list_nodes(path_str)
-            for node in nodes:
-                config_hash[k][node] = retrieve_config(inner_hash, path + [node], config)
+            if isinstance(node, dict):
+                for name in node:
+                    config_hash[k][name] = _retrieve_from_dict(inner_hash, base_path + path + [name], node[name])
 
     return config_hash
 
@@ -98,17 +119,75 @@ def get_ethertype(ethertype_val):
         raise ConfigError('invalid ethertype "{}"'.format(ethertype_val))
 
 
-def vlan_to_dict(conf):
+def _get_values(config_dict, key):
+    """
+    Return values of a leaf node in a config dict as a list,
+    whether the node is a multi node or not
+    """
+    value = config_dict.get(key, [])
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def vlan_to_dict(conf, diff=None):
     """
     Common used function which will extract VLAN related information from config
     and represent the result as Python dictionary.
 
-    Function call's itself recursively if a vif-s/vif-c pair is detected.
+    The config level must be set to the vif, vif-s or vif-c node. Q-in-Q customer
+    interfaces (vif-c) of a vif-s are included in the result.
+
+    Removed addresses and vif-c interfaces are taken from the config diff,
+    and the 'changed' key tells whether the VLAN interface was touched at all
+    by the changes being committed. Callers that already have the diff pass it
+    in, so that it is not computed again for every VLAN interface.
+    """
+    if diff is None:
+        diff = conf.get_config_diff()
+    level = conf.get_level().split()
+    return _vlan_dict_to_dict(level, conf.get_config_dict(), diff)
+
+
+def vlan_parent_changed(diff, path):
+    """
+    Check if the settings of an interface with VLAN interfaces changed,
+    apart from its vif and vif-s nodes. VLAN interfaces track some of them,
+    e.g. the MTU, so they all need to be configured again then.
+
+    Args:
+        diff (ConfigDiff): changes being committed
+        path (str): config path of the interface, e.g. "interfaces ethernet eth0"
     """
+    children = diff.added(path) + diff.deleted(path) + diff.changed(path)
+    return any(name not in ['vif', 'vif-s'] for name in children)
+
+
+def vlan_changed(ifname, vlan, parent_changed=False):
+    """
+    Check if a VLAN interface needs to be configured: it or its parent
+    interface was touched by the changes being committed, or it or one of
+    its vif-c interfaces does not exist yet (e.g. on boot).
+
+    Args:
+        ifname (str): name of the parent interface, e.g. eth0
+        vlan (dict): VLAN dict as returned by vlan_to_dict()
+        parent_changed (bool): as returned by vlan_parent_changed()
+    """
+    if parent_changed or vlan['changed']:
+        return True
+    vlan_ifname = '{0}.{1}'.format(ifname, vlan['id'])
+    if not os.path.exists('/sys/class/net/{0}'.format(vlan_ifname)):
+        return True
+    return any(vlan_changed(vlan_ifname, vif_c) for vif_c in vlan.get('vif_c', []))
+
+
+def _vlan_dict_to_dict(path, vif, diff):
     vlan = {
-        'id': conf.get_level().split()[-1], # get the '100' in 'interfaces bonding bond0 vif-s 100'
+        'id': path[-1], # get the '100' in 'interfaces bonding bond0 vif-s 100'
         'address': [],
         'address_remove': [],
+        'changed': diff.is_changed(path),
         'description': '',
         'dhcp_client_id': '',
         'dhcp_hostname': '',
@@ -125,97 +204,70 @@ def vlan_to_dict(conf):
         'mtu': 1500
     }
     # retrieve configured interface addresses
-    if conf.exists('address'):
-        vlan['address'] = conf.return_values('address')
+    vlan['address'] = _get_values(vif, 'address')
 
     # Determine interface addresses (currently effective) - to determine which
     # address is no longer valid and needs to be removed from the bond
-    eff_addr = conf.return_effective_values('address')
-    act_addr = conf.return_values('address')
-    vlan['address_remove'] = list_diff(eff_addr, act_addr)
+    vlan['address_remove'] = diff.deleted(path + ['address'])
 
     # retrieve interface description
-    if conf.exists('description'):
-        vlan['description'] = conf.return_value('description')
-
-    # get DHCP client identifier
-    if conf.exists('dhcp-options client-id'):
-        vlan['dhcp_client_id'] = conf.return_value('dhcp-options client-id')
+    vlan['description'] = vif.get('description', '')
 
-    # DHCP client host name (overrides the system host name)
-    if conf.exists('dhcp-options host-name'):
-        vlan['dhcp_hostname'] = conf.return_value('dhcp-options host-name')
-
-    # DHCP client vendor identifier
-    if conf.exists('dhcp-options vendor-class-id'):
-        vlan['dhcp_vendor_class_id'] = conf.return_value('dhcp-options vendor-class-id')
+    # DHCP client identifier, host name (overrides the system host name)
+    # and vendor identifier
+    dhcp_options = vif.get('dhcp-options', {})
+    vlan['dhcp_client_id'] = dhcp_options.get('client-id', '')
+    vlan['dhcp_hostname'] = dhcp_options.get('host-name', '')
+    vlan['dhcp_vendor_class_id'] = dhcp_options.get('vendor-class-id', '')
 
     # DHCPv6 only acquire config parameters, no address
-    if conf.exists('dhcpv6-options parameters-only'):
-        vlan['dhcpv6_prm_only'] = True
-
-    # DHCPv6 temporary IPv6 address
-    if conf.exists('dhcpv6-options temporary'):
-        vlan['dhcpv6_temporary'] = True
+    # and DHCPv6 temporary IPv6 address
+    dhcpv6_options = vif.get('dhcpv6-options', {})
+    vlan['dhcpv6_prm_only'] = 'parameters-only' in dhcpv6_options
+    vlan['dhcpv6_temporary'] = 'temporary' in dhcpv6_options
 
     # ignore link state changes
-    if conf.exists('disable-link-detect'):
+    if 'disable-link-detect' in vif:
         vlan['disable_link_detect'] = 2
 
     # disable VLAN interface
-    if conf.exists('disable'):
-        vlan['disable'] = True
+    vlan['disable'] = 'disable' in vif
 
     # Media Access Control (MAC) address
-    if conf.exists('mac'):
-        vlan['mac'] = conf.return_value('mac')
+    vlan['mac'] = vif.get('mac', '')
 
     # Maximum Transmission Unit (MTU)
-    if conf.exists('mtu'):
-        vlan['mtu'] = int(conf.return_value('mtu'))
+    if 'mtu' in vif:
+        vlan['mtu'] = int(vif['mtu'])
 
     # VLAN egress QoS
-    if conf.exists('egress-qos'):
-        vlan['egress_qos'] = conf.return_value('egress-qos')
+    vlan['egress_qos'] = vif.get('egress-qos', '')
 
     # egress changes QoS require VLAN interface recreation
-    if vlan['egress_qos'] != conf.return_effective_value('egress-qos'):
-        vlan['egress_qos_changed'] = True
+    vlan['egress_qos_changed'] = diff.is_changed(path + ['egress-qos'])
 
     # VLAN ingress QoS
-    if conf.exists('ingress-qos'):
-        vlan['ingress_qos'] = conf.return_value('ingress-qos')
+    vlan['ingress_qos'] = vif.get('ingress-qos', '')
 
     # ingress changes QoS require VLAN interface recreation
-    if vlan['ingress_qos'] != conf.return_effective_value('ingress-qos'):
-        vlan['ingress_qos_changed'] = True
+    vlan['ingress_qos_changed'] = diff.is_changed(path + ['ingress-qos'])
 
     # ethertype is mandatory on vif-s nodes and only exists here!
-    # check if this is a vif-s node at all:
-    if conf.get_level().split()[-2] == 'vif-s':
+    if path[-2] == 'vif-s':
         vlan['vif_c'] = []
         vlan['vif_c_remove'] = []
 
         # ethertype uses a default of 0x88A8
-        tmp = '0x88A8'
-        if conf.exists('ethertype'):
-             tmp = conf.return_value('ethertype')
-        vlan['ethertype'] = get_ethertype(tmp)
+        vlan['ethertype'] = get_ethertype(vif.get('ethertype', '0x88A8'))
 
         # get vif-c interfaces (currently effective) - to determine which vif-c
         # interface is no longer present and needs to be removed
-        eff_intf = conf.list_effective_nodes('vif-c')
-        act_intf = conf.list_nodes('vif-c')
-        vlan['vif_c_remove'] = list_diff(eff_intf, act_intf)
-
-        # check if there is a Q-in-Q vlan customer interface
-        # and call this function recursively
-        if conf.exists('vif-c'):
-            cfg_level = conf.get_level()
-            # add new key (vif-c) to dictionary
-            for vif in conf.list_nodes('vif-c'):
-                # set config level to vif interface
-                conf.set_level(cfg_level + ' vif-c ' + vif)
-                vlan['vif_c'].append(vlan_to_dict(conf))
+        vlan['vif_c_remove'] = diff.deleted(path + ['vif-c'])
+
+        # add Q-in-Q vlan customer interfaces
+        vif_c = vif.get('vif-c', {})
+        for vif_c_id in vif_c:
+            vlan['vif_c'].append(_vlan_dict_to_dict(path + ['vif-c', vif_c_id],
+                                                    vif_c[vif_c_id], diff))
 
     return vlan
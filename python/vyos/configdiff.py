@@ -0,0 +1,155 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Structural differences between the running (effective) and the proposed config.
+
+The two trees are compared once, when the diff is created, and every node
+whose subtree differs is recorded. Queries take absolute config paths,
+e.g. ``diff.deleted('interfaces ethernet eth0 vif')``, and never call
+the config backend.
+
+Config scripts normally get a diff from ``vyos.config.Config.get_config_diff``.
+"""
+
+
+def _path_tuple(path):
+    if isinstance(path, str):
+        return tuple(path.split())
+    return tuple(path)
+
+def _names(node):
+    """ Names of the children of a node, or values of a leaf node, in config order """
+    if node is None:
+        return []
+    return list(node)
+
+
+class ConfigDiff(object):
+    """
+    Differences between two config snapshots.
+
+    Args:
+        running (ConfigSnapshot): the running config
+        proposed (ConfigSnapshot): the proposed config
+    """
+    def __init__(self, running, proposed):
+        self._running = running
+        self._proposed = proposed
+        # Nodes that exist in both configs but differ, nodes that only
+        # exist in the proposed config, and nodes that only exist
+        # in the running config. Children of added and deleted nodes
+        # are not recorded.
+        self._changed = set()
+        self._added = set()
+        self._deleted = set()
+        self._compare(running.get_subtree([]), proposed.get_subtree([]), ())
+
+    def _compare(self, old, new, path):
+        if isinstance(old, dict) and isinstance(new, dict):
+            differs = False
+            for name in old:
+                if name not in new:
+                    self._deleted.add(path + (name,))
+                    differs = True
+                elif self._compare(old[name], new[name], path + (name,)):
+                    differs = True
+            for name in new:
+                if name not in old:
+                    self._added.add(path + (name,))
+                    differs = True
+        else:
+            # Leaf nodes, or a node that is a leaf on one side only
+            # (childless tag nodes may be printed as leaf nodes)
+            differs = (old != new)
+
+        if differs:
+            self._changed.add(path)
+        return differs
+
+    def _get(self, path, effective):
+        if effective:
+            return self._running.get_subtree(list(path))
+        return self._proposed.get_subtree(list(path))
+
+    def is_changed(self, path=''):
+        """
+        Returns:
+            True if the node or anything under it was added, deleted or
+            modified. Nodes under an added or deleted node only count if
+            they exist in one of the configs.
+        """
+        path = _path_tuple(path)
+        if path in self._changed:
+            return True
+        for i in range(len(path), 0, -1):
+            if path[:i] in self._added:
+                return self._get(path, False) is not None
+            if path[:i] in self._deleted:
+                return self._get(path, True) is not None
+        return False
+
+    def added(self, path):
+        """
+        Returns:
+            str list: children (or values, for leaf nodes) of the node
+            that only exist in the proposed config
+        """
+        path = _path_tuple(path)
+        if not self.is_changed(path):
+            return []
+        old = _names(self._get(path, True))
+        return [n for n in _names(self._get(path, False)) if n not in old]
+
+    def deleted(self, path):
+        """
+        Returns:
+            str list: children (or values, for leaf nodes) of the node
+            that only exist in the running config
+        """
+        path = _path_tuple(path)
+        if not self.is_changed(path):
+            return []
+        new = _names(self._get(path, False))
+        return [n for n in _names(self._get(path, True)) if n not in new]
+
+    def changed(self, path):
+        """
+        Returns:
+            str list: children of the node that exist in both configs,
+            but whose subtrees differ
+        """
+        path = _path_tuple(path)
+        if path not in self._changed:
+            return []
+        old = self._get(path, True)
+        new = self._get(path, False)
+        if not (isinstance(old, dict) and isinstance(new, dict)):
+            return []
+        return [n for n in new if n in old and (path + (n,)) in self._changed]
+
+    def unchanged(self, path):
+        """
+        Returns:
+            str list: children of the node that are the same in both configs
+        """
+        path = _path_tuple(path)
+        new = self._get(path, False)
+        if not isinstance(new, dict):
+            return []
+        old = self._get(path, True)
+        if not isinstance(old, dict):
+            return []
+        return [n for n in new if n in old and not self.is_changed(path + (n,))]
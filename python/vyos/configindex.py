@@ -0,0 +1,127 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Lookups of config node types in the index built from the XML interface
+definitions at build time by ``scripts/build-config-index``.
+
+The index is a trie that mirrors the config tree. Every entry has a
+``type`` (``node``, ``tag`` or ``leaf``), optional ``multi``, ``valueless``,
+``priority``, ``default`` and ``owner`` properties, and a ``children`` dict.
+Children of a tag node entry are the children of its tag values.
+
+Only nodes defined in this package are in the index. For all other
+nodes, lookups return None and callers should ask the config backend.
+"""
+
+import os
+import json
+
+from vyos.defaults import directories
+
+INDEX_FILE = os.path.join(directories['data'], 'config-index.json')
+
+_indexes = {}
+
+
+class NodeIndex(object):
+    def __init__(self, tree):
+        self._tree = tree
+
+    def lookup(self, path):
+        """
+        Args:
+            path (str list): config path, with tag values
+
+        Returns:
+            dict: index entry, None if the node is unknown
+        """
+        children = self._tree
+        entry = {'type': 'node', 'children': children}
+        i = 0
+        while i < len(path):
+            if not children:
+                return None
+            entry = children.get(path[i])
+            if entry is None:
+                return None
+            children = entry.get('children')
+            if i + 1 < len(path):
+                if entry['type'] == 'tag':
+                    # Tag values (e.g. "eth0" in "interfaces ethernet eth0")
+                    # are not in the index, they are neither tag nor leaf nodes
+                    i += 1
+                    entry = {'type': 'node', 'children': children}
+                elif entry['type'] == 'leaf':
+                    # A value after a leaf node
+                    return None
+            i += 1
+        return entry
+
+    def _get(self, path, prop):
+        entry = self.lookup(path)
+        if entry is None:
+            return None
+        return entry.get(prop, False)
+
+    def is_tag(self, path):
+        """ Returns: True/False, None if the node is unknown """
+        entry = self.lookup(path)
+        if entry is None:
+            return None
+        return entry['type'] == 'tag'
+
+    def is_leaf(self, path):
+        """ Returns: True/False, None if the node is unknown """
+        entry = self.lookup(path)
+        if entry is None:
+            return None
+        return entry['type'] == 'leaf'
+
+    def is_multi(self, path):
+        """ Returns: True/False, None if the node is unknown """
+        return self._get(path, 'multi')
+
+    def is_valueless(self, path):
+        """ Returns: True/False, None if the node is unknown """
+        return self._get(path, 'valueless')
+
+    def priority(self, path):
+        """ Returns: the commit priority of a node, None if it has none or is unknown """
+        return self._get(path, 'priority') or None
+
+    def default_value(self, path):
+        """ Returns: the default value of a leaf node, None if it has none or is unknown """
+        return self._get(path, 'default') or None
+
+    def owner(self, path):
+        """ Returns: the owner (config script) of a node, None if it has none or is unknown """
+        return self._get(path, 'owner') or None
+
+
+def load(index_file=INDEX_FILE):
+    """
+    Load the index, once per process.
+
+    Returns:
+        NodeIndex: the index, empty if the index file is not available
+    """
+    if index_file not in _indexes:
+        try:
+            with open(index_file, 'r') as f:
+                _indexes[index_file] = NodeIndex(json.load(f))
+        except (OSError, ValueError):
+            _indexes[index_file] = NodeIndex({})
+    return _indexes[index_file]
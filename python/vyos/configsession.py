@@ -15,8 +15,15 @@
 import os
 import re
 import sys
+import tempfile
 import subprocess
 
+import vyos.shellapi
+import vyos.trace
+from vyos.config import Config
+from vyos.configtree import ConfigTree, ConfigTreeError
+from vyos.configsnapshot import ConfigSnapshot
+
 CLI_SHELL_API = '/bin/cli-shell-api'
 SET = '/opt/vyatta/sbin/my_set'
 DELETE = '/opt/vyatta/sbin/my_delete'
@@ -24,11 +31,18 @@ COMMENT = '/opt/vyatta/sbin/my_comment'
 COMMIT = '/opt/vyatta/sbin/my_commit'
 DISCARD = '/opt/vyatta/sbin/my_discard'
 SHOW_CONFIG = ['/bin/cli-shell-api', 'showConfig']
+# The working config as it is, without the markers of uncommitted changes
+# a plain showConfig adds in a session with pending changes
+SHOW_WORKING_CONFIG = ['/bin/cli-shell-api', '--show-working-only', '--show-ignore-edit', 'showConfig']
 LOAD_CONFIG = ['/bin/cli-shell-api', 'loadFile']
 
 # Default "commit via" string
 APP = "vyos-http-api"
 
+# Smaller batches are applied one operation at a time,
+# loading a whole config is not worth it for them
+BATCH_THRESHOLD = 8
+
 # When started as a service rather than from a user shell,
 # the process lacks the VyOS-specific environment that comes
 # from bash configs, so we have to inject it
@@ -69,6 +83,164 @@ class ConfigSessionError(Exception):
     pass
 
 
+def _run_op(op, path, value, env):
+    if op == 'set':
+        cmd = [SET] + path
+    elif op == 'delete':
+        cmd = [DELETE] + path
+    elif op == 'comment':
+        # An empty comment removes the comment
+        return _run([COMMENT] + path + [value], env)
+    else:
+        return "\"{0}\" is not a valid operation".format(op)
+    if value:
+        cmd.append(value)
+    return _run(cmd, env)
+
+def _run(cmd, env):
+    """ Returns: the error message if the command failed, None otherwise """
+    code, output = vyos.shellapi.run(cmd, env=env, stderr=True)
+    if code != 0:
+        return output.decode().strip()
+    return None
+
+def _run_ops(ops, env, indices=None):
+    errors = []
+    for i, (op, path, value) in enumerate(ops):
+        if indices is not None and i not in indices:
+            continue
+        msg = _run_op(op, path, value, env)
+        if msg is not None:
+            errors.append((i, msg))
+    return errors
+
+def _tree_apply(tree, config, op, path, value, tags):
+    """
+    Apply a set or delete operation to a config tree
+
+    Returns:
+        str: error message, None on success
+    """
+    path_str = " ".join(path)
+    if op == 'set':
+        if not value:
+            # Setting an existing node without a value changes nothing
+            if not tree.exists(path):
+                tree.set(path)
+        else:
+            tree.set(path, value=value, replace=(not config.is_multi(path_str)))
+        # New tag nodes must be marked as such, or they'll be written
+        # as normal nodes, e.g. "ethernet { eth0 { ..."
+        for i in range(1, len(path)):
+            prefix = " ".join(path[:i])
+            if prefix not in tags:
+                tags[prefix] = config.is_tag(prefix)
+            if tags[prefix]:
+                tree.set_tag(path[:i])
+    else:
+        try:
+            if value:
+                if value not in tree.return_values(path):
+                    raise ConfigTreeError()
+                tree.delete_value(path, value)
+            else:
+                if not tree.exists(path):
+                    raise ConfigTreeError()
+                tree.delete(path)
+        except ConfigTreeError:
+            return "Nothing to delete (the specified {0} does not exist)".format(
+                   "value" if value else "node")
+    return None
+
+def _load(config_string, env):
+    with tempfile.NamedTemporaryFile('w', prefix='vyos-batch-', delete=False) as f:
+        f.write(config_string)
+    try:
+        return _run(LOAD_CONFIG + [f.name], env)
+    finally:
+        os.unlink(f.name)
+
+def _apply_tree(ops, env):
+    code, working = vyos.shellapi.run(SHOW_WORKING_CONFIG, env=env)
+    if code != 0:
+        raise ConfigSessionError("Could not read the working config")
+    working = working.decode()
+
+    # Node types come from the node index, with no backend calls for most nodes
+    config = Config(session_env=env, snapshot=False)
+    # showConfig does not escape backslashes, which configtree expects; cf. T1001
+    tree = ConfigTree(working.replace("\\", "\\\\"))
+
+    errors = []
+    failed = set()
+    comments = set()
+    tags = {}
+    for i, (op, path, value) in enumerate(ops):
+        if op == 'comment':
+            # Config trees cannot hold comments
+            comments.add(i)
+            continue
+        if op not in ['set', 'delete']:
+            errors.append((i, "\"{0}\" is not a valid operation".format(op)))
+            failed.add(i)
+            continue
+        msg = _tree_apply(tree, config, op, path, value, tags)
+        if msg is not None:
+            errors.append((i, msg))
+            failed.add(i)
+
+    expected_string = tree.to_string()
+    msg = _load(expected_string, env)
+    if msg is not None:
+        # Put the working config back and fall back to one operation at a time,
+        # that tells which operations are at fault
+        if _load(working, env) is not None:
+            raise ConfigSessionError("Could not restore the working config after a failed load: {0}".format(msg))
+        return _run_ops(ops, env)
+
+    # Operations with invalid paths or values are silently dropped by the load,
+    # so check that every operation had its effect, and redo those that didn't
+    # on their own to get the actual error messages
+    code, loaded = vyos.shellapi.run(SHOW_WORKING_CONFIG, env=env)
+    if code != 0:
+        raise ConfigSessionError("Could not read the working config")
+    expected = ConfigSnapshot(expected_string)
+    actual = ConfigSnapshot(loaded.decode())
+    redo = set(comments)
+    for i, (op, path, value) in enumerate(ops):
+        if i not in failed and i not in comments:
+            if expected.get_subtree(path) != actual.get_subtree(path):
+                redo.add(i)
+    errors += _run_ops(ops, env, indices=redo)
+
+    return sorted(errors)
+
+def apply_batch(ops, env=None):
+    """
+    Apply a list of config operations to the working config of a session.
+
+    Large batches are applied to a copy of the working config that is loaded
+    back in one backend call, smaller ones one operation at a time.
+    Failed operations do not stop the others from being applied.
+
+    Args:
+        ops (list): (op, path, value) tuples, where op is "set", "delete"
+            or "comment", path is a list of strings, and value is a string,
+            empty or None for operations without a value
+        env (dict): session environment, the environment of the current
+            process if None (e.g. for scripts run from the CLI)
+
+    Returns:
+        list: (index, error message) tuples for the failed operations,
+        empty if all operations succeeded
+    """
+    ops = [(op, list(path), value or '') for op, path, value in ops]
+    if len(ops) < BATCH_THRESHOLD:
+        return _run_ops(ops, env)
+    return _apply_tree(ops, env)
+
+
+
 class ConfigSession(object):
     """
     The write API of VyOS.
@@ -112,10 +284,10 @@ class ConfigSession(object):
         except Exception as e:
             print("Could not tear down session {0}: {1}".format(self.__session_id, e), file=sys.stderr)
 
+    @vyos.trace.traced('session')
     def __run_command(self, cmd_list):
-        p = subprocess.Popen(cmd_list, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=self.__session_env)
-        result = p.wait()
-        output = p.stdout.read().decode()
+        result, output = vyos.shellapi.run(cmd_list, env=self.__session_env, stderr=True)
+        output = output.decode()
         if result != 0:
             raise ConfigSessionError(output)
         return output
@@ -137,6 +309,48 @@ class ConfigSession(object):
             value = [value]
         self.__run_command([DELETE] + path + value)
 
+    def apply_batch(self, ops):
+        """
+        Apply a list of (op, path, value) operations, see apply_batch()
+
+        Returns:
+            list: (index, error message) tuples for the failed operations
+        """
+        return apply_batch(ops, env=self.__session_env)
+
+    def __apply_or_raise(self, ops):
+        errors = self.apply_batch(ops)
+        if errors:
+            raise ConfigSessionError("\n".join(
+                  "[{0}]: {1}".format(" ".join(ops[i][1] + [ops[i][2] or ""]).strip(), msg)
+                  for i, msg in errors))
+
+    def set_many(self, items):
+        """
+        Set many paths at once.
+
+        Args:
+            items (list): (path, value) tuples
+
+        Raises:
+            ConfigSessionError: with the error messages of all failed paths,
+                the other paths are set nevertheless
+        """
+        self.__apply_or_raise([('set', path, value) for path, value in items])
+
+    def delete_many(self, items):
+        """
+        Delete many paths at once.
+
+        Args:
+            items (list): (path, value) tuples
+
+        Raises:
+            ConfigSessionError: with the error messages of all failed paths,
+                the other paths are deleted nevertheless
+        """
+        self.__apply_or_raise([('delete', path, value) for path, value in items])
+
     def comment(self, path, value=None):
         if not value:
             value = [""]
@@ -0,0 +1,181 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+In-memory snapshots of a VyOS config, built from the output of
+``cli-shell-api showConfig``.
+
+A snapshot is parsed once and answers ``exists``, ``return_values``
+and ``list_nodes`` queries without talking to the config backend.
+
+Internally the config is kept as nested dicts: a non-leaf node is a dict
+of its children (for tag nodes, the keys are the tag values), a leaf node
+is a list of its values (empty for valueless nodes).
+"""
+
+
+class ConfigSnapshotError(Exception):
+    pass
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        # showConfig escapes double quotes but not backslashes, cf. T1001
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+def parse_config(config_string):
+    """
+    Parse a config in the curly braces format into a nested dict
+
+    Args:
+        config_string (str): config text, e.g. the output of showConfig
+
+    Returns:
+        dict: the config tree
+
+    Raises:
+        ConfigSnapshotError: if braces are unbalanced
+    """
+    root = {}
+    stack = [root]
+    in_comment = False
+
+    for lineno, line in enumerate(config_string.splitlines(), start=1):
+        line = line.strip()
+
+        if in_comment:
+            if '*/' in line:
+                in_comment = False
+            continue
+        if line.startswith('/*'):
+            in_comment = '*/' not in line
+            continue
+        if not line:
+            continue
+
+        if line == '}':
+            if len(stack) < 2:
+                raise ConfigSnapshotError("Unbalanced closing brace at line {0}".format(lineno))
+            stack.pop()
+            continue
+
+        opening = line.endswith('{')
+        if opening:
+            line = line[:-1].rstrip()
+
+        parts = line.split(None, 1)
+        name = parts[0]
+        value = _unquote(parts[1]) if len(parts) > 1 else None
+        parent = stack[-1]
+
+        if opening:
+            node = parent.setdefault(name, {})
+            if isinstance(node, list):
+                # Childless tag nodes may have been printed as leaf nodes
+                node = parent[name] = dict((v, {}) for v in node)
+            # Tag nodes are printed as "name value {"
+            if value is not None:
+                node = node.setdefault(value, {})
+            stack.append(node)
+        else:
+            values = parent.setdefault(name, [])
+            if isinstance(values, dict):
+                # A childless tag node next to ones that have children
+                if value is not None:
+                    values.setdefault(value, {})
+            elif value is not None:
+                values.append(value)
+
+    if len(stack) != 1:
+        raise ConfigSnapshotError("Unbalanced braces: {0} block(s) not closed".format(len(stack) - 1))
+
+    return root
+
+
+class ConfigSnapshot(object):
+    """
+    An immutable, fully loaded copy of a config tree.
+
+    Paths are lists of node names, the same as in ``vyos.configtree``.
+    """
+    def __init__(self, config_string=''):
+        self._tree = parse_config(config_string)
+
+    def _find(self, path):
+        node = self._tree
+        for name in path:
+            if not isinstance(node, dict) or name not in node:
+                return None
+            node = node[name]
+        return node
+
+    def exists(self, path):
+        """
+        Returns:
+            True if the node exists. Like cli-shell-api, this also accepts
+            a leaf node path with a value appended to it.
+        """
+        if self._find(path) is not None:
+            return True
+        if not path:
+            return False
+        values = self._find(path[:-1])
+        return isinstance(values, list) and (path[-1] in values)
+
+    def return_values(self, path):
+        """
+        Returns:
+            str list: values of a leaf node, None if it's not a leaf node
+            or doesn't exist
+        """
+        values = self._find(path)
+        if isinstance(values, list):
+            return list(values)
+        return None
+
+    def return_value(self, path):
+        """
+        Returns:
+            str: the first value of a leaf node, None if it has no value
+            or doesn't exist
+        """
+        values = self.return_values(path)
+        if values:
+            return values[0]
+        return None
+
+    def list_nodes(self, path):
+        """
+        Returns:
+            str list: names of the children of a node, in config order,
+            None if the node doesn't exist
+        """
+        node = self._find(path)
+        if isinstance(node, dict):
+            return list(node.keys())
+        elif isinstance(node, list):
+            # Tag nodes without children are sometimes printed
+            # as leaf nodes, e.g. "server 0.pool.ntp.org"
+            return list(node)
+        return None
+
+    def get_subtree(self, path):
+        """
+        Returns:
+            the raw subtree at the given path (dict or list), None if
+            it doesn't exist. The caller must not modify it.
+        """
+        return self._find(path)
@@ -0,0 +1,114 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Numbered snapshots of the running config for long-lived readers.
+
+A ``ConfigVersion`` is an operational mode config object with its snapshot
+loaded, tagged with a generation number. It's never modified, so any number
+of threads can read it at once without locking.
+
+``ConfigVersions`` keeps the current version. It should be refreshed after
+every commit the process makes itself; commits made by others, e.g. from
+the CLI, are picked up when the current version gets older than ``max_age``.
+The generation number only changes when the config does, so it's suitable
+for cache validation, e.g. in HTTP ETags.
+"""
+
+import time
+import threading
+
+import vyos.config
+
+DEFAULT_MAX_AGE = 1.0
+
+
+class ConfigVersion(object):
+    """
+    Attributes:
+        generation (int): the number of the version, starting from 1
+        config (vyos.config.Config): config object with the running config loaded
+        tree (dict): the complete running config, as returned by get_config_dict
+    """
+    def __init__(self, generation, config, tree):
+        self.generation = generation
+        self.config = config
+        self.tree = tree
+        self.created = time.monotonic()
+        self._shown = {}
+
+    def show_config(self, path):
+        """
+        Returns:
+            str: the running config subtree as printed by showConfig,
+            empty string if it doesn't exist
+
+        Note:
+            The output is retrieved from the backend the first time it's
+            needed and reused for the rest of the version's lifetime.
+            showConfig output has no default values, so it can't be made
+            from the snapshot.
+        """
+        key = " ".join(path)
+        if key not in self._shown:
+            self._shown[key] = self.config.show_config(key, default='')
+        return self._shown[key]
+
+
+class ConfigVersions(object):
+    """
+    Args:
+        max_age (float): maximum age of the current version, in seconds,
+            before it's checked for changes
+        config_class: callable returning a new config object
+    """
+    def __init__(self, max_age=DEFAULT_MAX_AGE, config_class=None):
+        self.max_age = max_age
+        self._config_class = config_class or (lambda: vyos.config.Config(snapshot=True))
+        self._current = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Load the running config, and make it the current version if it has changed.
+
+        Returns:
+            ConfigVersion: the current version
+        """
+        with self._lock:
+            config = self._config_class()
+            tree = config.get_config_dict(effective=True)
+            current = self._current
+            if current is not None and current.tree == tree:
+                version = ConfigVersion(current.generation, current.config, current.tree)
+                version._shown = current._shown
+            else:
+                generation = current.generation + 1 if current is not None else 1
+                version = ConfigVersion(generation, config, tree)
+            self._current = version
+            return version
+
+    def current(self):
+        """
+        Returns:
+            ConfigVersion: the current version, refreshed first if it's too old.
+            While one thread refreshes it, others keep getting the old version.
+        """
+        version = self._current
+        if version is None:
+            return self.refresh()
+        if time.monotonic() - version.created > self.max_age and not self._lock.locked():
+            return self.refresh()
+        return version
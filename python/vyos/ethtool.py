@@ -0,0 +1,171 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Ethernet offloads, pause frames and link speed over the SIOCETHTOOL
+ioctl, without running ``ethtool``.
+
+Only what ``vyos.ifconfig`` needs is implemented, with the commands
+ethtool has had since its beginning: reading and changing the gro, gso,
+sg, tso and ufo offloads, flow control, and speed, duplex and
+autonegotiation. Errors are raised as OSError with the errno the kernel
+returned, EOPNOTSUPP for what the driver doesn't support.
+
+All requests go through ``_ioctl``, which the tests replace.
+"""
+
+import errno
+import fcntl
+import ctypes
+import collections
+import socket
+import struct
+
+SIOCETHTOOL = 0x8946
+
+ETHTOOL_GSET = 0x01
+ETHTOOL_SSET = 0x02
+ETHTOOL_GPAUSEPARAM = 0x12
+ETHTOOL_SPAUSEPARAM = 0x13
+ETHTOOL_GSG = 0x18
+ETHTOOL_SSG = 0x19
+ETHTOOL_GTSO = 0x1e
+ETHTOOL_STSO = 0x1f
+ETHTOOL_GUFO = 0x21
+ETHTOOL_SUFO = 0x22
+ETHTOOL_GGSO = 0x23
+ETHTOOL_SGSO = 0x24
+ETHTOOL_GGRO = 0x2b
+ETHTOOL_SGRO = 0x2c
+
+# The commands reading and changing an offload, by the name ethtool -K uses
+FEATURES = {
+    'gro': (ETHTOOL_GGRO, ETHTOOL_SGRO),
+    'gso': (ETHTOOL_GGSO, ETHTOOL_SGSO),
+    'sg': (ETHTOOL_GSG, ETHTOOL_SSG),
+    'tso': (ETHTOOL_GTSO, ETHTOOL_STSO),
+    'ufo': (ETHTOOL_GUFO, ETHTOOL_SUFO),
+}
+
+DUPLEX_HALF = 0
+DUPLEX_FULL = 1
+DUPLEXES = {DUPLEX_HALF: 'half', DUPLEX_FULL: 'full'}
+
+SPEED_UNKNOWN = 0xffffffff
+
+# Bits of ethtool_cmd.supported and .advertising which are not link modes:
+# autonegotiation, ports and pause frames
+SUPPORTED_PORTS = (1 << 6) | (1 << 7) | (1 << 8) | (1 << 9) | (1 << 10) | (1 << 11) | (1 << 16)
+SUPPORTED_PAUSE = (1 << 13) | (1 << 14)
+
+_IFREQ = struct.Struct('16sP')
+_VALUE = struct.Struct('=II')
+_PAUSEPARAM = struct.Struct('=IIII')
+_CMD = struct.Struct('=IIIHBBBBBBIIHBBI8x')
+
+# struct ethtool_cmd of ETHTOOL_GSET and ETHTOOL_SSET
+EthtoolCmd = collections.namedtuple('EthtoolCmd', [
+    'cmd', 'supported', 'advertising', 'speed', 'duplex', 'port', 'phy_address',
+    'transceiver', 'autoneg', 'mdio_support', 'maxtxpkt', 'maxrxpkt', 'speed_hi',
+    'eth_tp_mdix', 'eth_tp_mdix_ctrl', 'lp_advertising'])
+
+
+def _ioctl(ifname, data):
+    """
+    Send an ethtool request to the driver of an interface.
+
+    Args:
+        ifname (str): the interface
+        data (bytes): the ethtool structure of the request, starting with
+            the command
+
+    Returns:
+        bytes: the structure as the driver left it
+    """
+    buf = ctypes.create_string_buffer(data, len(data))
+    ifreq = _IFREQ.pack(ifname.encode(), ctypes.addressof(buf))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        fcntl.ioctl(sock.fileno(), SIOCETHTOOL, ifreq)
+    return buf.raw
+
+
+def get_feature(ifname, feature):
+    """
+    Returns:
+        bool: whether an offload, e.g. "gro", is on. UFO is gone from
+        Linux 4.14 on, there it is off.
+    """
+    get, _ = FEATURES[feature]
+    try:
+        _, value = _VALUE.unpack(_ioctl(ifname, _VALUE.pack(get, 0)))
+    except OSError as e:
+        if feature == 'ufo' and e.errno == errno.EOPNOTSUPP:
+            return False
+        raise
+    return bool(value)
+
+def set_feature(ifname, feature, enable):
+    """ Turn an offload on or off, as ``ethtool -K <ifname> <feature> on|off`` """
+    _, set = FEATURES[feature]
+    _ioctl(ifname, _VALUE.pack(set, int(enable)))
+
+
+def get_pause(ifname):
+    """
+    Returns:
+        dict: "autoneg", "rx" and "tx" pause frames, as bool
+    """
+    data = _ioctl(ifname, _PAUSEPARAM.pack(ETHTOOL_GPAUSEPARAM, 0, 0, 0))
+    _, autoneg, rx, tx = _PAUSEPARAM.unpack(data)
+    return {'autoneg': bool(autoneg), 'rx': bool(rx), 'tx': bool(tx)}
+
+def set_pause(ifname, autoneg, rx, tx):
+    """ As ``ethtool --pause <ifname> autoneg on|off rx on|off tx on|off`` """
+    _ioctl(ifname, _PAUSEPARAM.pack(ETHTOOL_SPAUSEPARAM, int(autoneg), int(rx), int(tx)))
+
+
+def _get_cmd(ifname):
+    request = EthtoolCmd._make([ETHTOOL_GSET] + [0] * (len(EthtoolCmd._fields) - 1))
+    return EthtoolCmd._make(_CMD.unpack(_ioctl(ifname, _CMD.pack(*request))))
+
+def get_link(ifname):
+    """
+    Returns:
+        dict: "speed" in Mbit/s, None if unknown, "duplex", "half", "full"
+        or None if unknown, and "autoneg", as bool
+    """
+    cmd = _get_cmd(ifname)
+    speed = cmd.speed | (cmd.speed_hi << 16)
+    return {
+        'speed': speed if speed not in [0, SPEED_UNKNOWN] else None,
+        'duplex': DUPLEXES.get(cmd.duplex),
+        'autoneg': bool(cmd.autoneg),
+    }
+
+def set_link(ifname, speed=None, duplex=None):
+    """
+    Set the speed in Mbit/s and duplex, "half" or "full", of a link, as
+    ``ethtool -s <ifname> speed <speed> duplex <duplex> autoneg off``.
+    Without them, autonegotiation is turned on and all supported link modes
+    are advertised, as ``ethtool -s <ifname> autoneg on``.
+    """
+    cmd = _get_cmd(ifname)._replace(cmd=ETHTOOL_SSET)
+    if speed is None:
+        modes = cmd.supported & ~(SUPPORTED_PORTS | SUPPORTED_PAUSE)
+        cmd = cmd._replace(autoneg=1, advertising=modes | (cmd.advertising & SUPPORTED_PAUSE))
+    else:
+        cmd = cmd._replace(autoneg=0, speed=speed & 0xffff, speed_hi=speed >> 16,
+                           duplex=DUPLEX_FULL if duplex == 'full' else DUPLEX_HALF)
+    _ioctl(ifname, _CMD.pack(*cmd))
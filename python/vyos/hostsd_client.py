@@ -1,40 +1,47 @@
+import os
 import json
+import threading
 
 import zmq
 
 
 SOCKET_PATH = "ipc:///run/vyos-hostsd.sock"
 
+# All clients of a process share one connection, requests are sent
+# one at a time. It's made again after a timeout, when the REQ socket
+# is left waiting for a reply that may never come, and after a fork.
+_lock = threading.Lock()
+_socket = None
+_socket_pid = None
+
 
 class VyOSHostsdError(Exception):
     pass
 
 
-class Client(object):
-    def __init__(self):
-        try:
-            context = zmq.Context()
-            self.__socket = context.socket(zmq.REQ)
-            self.__socket.RCVTIMEO = 10000 #ms
-            self.__socket.setsockopt(zmq.LINGER, 0)
-            self.__socket.connect(SOCKET_PATH)
-        except zmq.error.Again:
-            raise VyOSHostsdError("Could not connect to vyos-hostsd")
-
-    def _communicate(self, msg):
-        try:
-            request = json.dumps(msg).encode()
-            self.__socket.send(request)
-
-            reply_msg = self.__socket.recv().decode()
-            reply = json.loads(reply_msg)
-            if 'error' in reply:
-                raise VyOSHostsdError(reply['error'])
-            else:
-                return reply["data"]
-        except zmq.error.Again:
-            raise VyOSHostsdError("Could not connect to vyos-hostsd")
-
+def _connect():
+    global _socket, _socket_pid
+    if _socket is None or _socket_pid != os.getpid():
+        socket = zmq.Context.instance().socket(zmq.REQ)
+        socket.RCVTIMEO = 10000 #ms
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(SOCKET_PATH)
+        _socket = socket
+        _socket_pid = os.getpid()
+    return _socket
+
+def _disconnect():
+    global _socket
+    if _socket is not None:
+        _socket.close()
+        _socket = None
+
+
+class _Messages(object):
+    """
+    Operations of vyos-hostsd. A mixin, the classes that use it send
+    or collect the messages in a _communicate(msg) method of their own.
+    """
     def set_host_name(self, host_name, domain_name, search_domains):
         msg = {
             'type': 'host_name',
@@ -67,3 +74,77 @@ class Client(object):
         msg = {'type': 'name_servers', 'op': 'get', 'tag': tag}
         return self._communicate(msg)
 
+
+class Batch(_Messages):
+    """
+    Operations collected to be sent in one message, and applied
+    by vyos-hostsd all at once, or not at all if any of them fails::
+
+        with client.batch() as batch:
+            batch.delete_hosts(tag)
+            batch.add_hosts(tag, hosts)
+
+    The batch is sent when the with block ends without an exception.
+    Results of get operations are in ``results`` after that.
+    """
+    def __init__(self, client):
+        self._client = client
+        self.messages = []
+        self.results = None
+
+    def _communicate(self, msg):
+        self.messages.append(msg)
+
+    def send(self):
+        if self.messages:
+            self.results = self._client.send_batch(self.messages)
+        else:
+            self.results = []
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+
+class Client(_Messages):
+    def __init__(self):
+        try:
+            with _lock:
+                _connect()
+        except zmq.error.ZMQError:
+            raise VyOSHostsdError("Could not connect to vyos-hostsd")
+
+    def _communicate(self, msg):
+        request = json.dumps(msg).encode()
+        with _lock:
+            try:
+                socket = _connect()
+                socket.send(request)
+                reply_msg = socket.recv().decode()
+            except zmq.error.Again:
+                _disconnect()
+                raise VyOSHostsdError("Could not connect to vyos-hostsd")
+
+        reply = json.loads(reply_msg)
+        if 'error' in reply:
+            raise VyOSHostsdError(reply['error'])
+        else:
+            return reply["data"]
+
+    def batch(self):
+        """ Returns: Batch: operations to send in one message """
+        return Batch(self)
+
+    def send_batch(self, messages):
+        """
+        Args:
+            messages (list): messages, as sent for single operations
+
+        Returns:
+            list: the result of every message, None for changes
+        """
+        return self._communicate({'op': 'batch', 'data': messages})
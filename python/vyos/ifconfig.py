@@ -15,12 +15,16 @@
 
 import os
 import re
-import jinja2
 import json
+import errno
+import ipaddress
+
+import vyos.netlink
+import vyos.ethtool
 
 from vyos.validate import *
-from ipaddress import IPv4Network, IPv6Address
-from netifaces import ifaddresses, AF_INET, AF_INET6
+from vyos.validate import AddressSnapshot
+from vyos.template import get_template
 from subprocess import Popen, PIPE, STDOUT
 from time import sleep
 
@@ -54,7 +58,66 @@ interface "{{ intf }}" {
 
 """
 
+def _default_dhcp_options(ifname):
+    return {
+        'intf' : ifname,
+        'hostname' : '',
+        'client_id' : '',
+        'vendor_class_id' : ''
+    }
+
+def _default_dhcpv6_options(ifname):
+    return {
+        'intf' : ifname,
+        'dhcpv6_prm_only' : False,
+        'dhcpv6_temporary' : False
+    }
+
+def _check_mac(mac):
+    """ Raises ValueError if the MAC address can't be set on an interface """
+    # a mac address consits out of 6 octets
+    octets = len(mac.split(':'))
+    if octets != 6:
+        raise ValueError('wrong number of MAC octets: {} '.format(octets))
+
+    # validate against the first mac address byte if it's a multicast
+    # address
+    if int(mac.split(':')[0], 16) & 1:
+        raise ValueError('{} is a multicast MAC address'.format(mac))
+
+    # overall mac address is not allowed to be 00:00:00:00:00:00
+    if sum(int(i, 16) for i in mac.split(':')) == 0:
+        raise ValueError('00:00:00:00:00:00 is not a valid MAC address')
+
+    # check for VRRP mac address
+    if mac.split(':')[0] == '0' and mac.split(':')[1] == '0' and mac.split(':')[2] == '94' and mac.split(':')[3] == '0' and mac.split(':')[4] == '1':
+        raise ValueError('{} is a VRRP MAC address'.format(mac))
+
+def _check_mtu(mtu):
+    if mtu < 68 or mtu > 9000:
+        raise ValueError('Invalid MTU size: "{}"'.format(mtu))
+
+
+# Netlink errors Interface._ip ignores, as the ip commands did: no such
+# link, link or address already there, no such address
+_IP_NOOP_ERRORS = [errno.ENODEV, errno.EEXIST, errno.EADDRNOTAVAIL]
+
+
 class Interface:
+    # Settings a Reconciler only changes when the kernel has another value:
+    # by setter, the setting in get_settings() and the value a call of the
+    # setter leaves there, None if the call changes nothing
+    _settings = {
+        'set_mtu': ('mtu', lambda mtu: str(mtu)),
+        'set_mac': ('mac', lambda mac: mac.lower() if mac else None),
+        'set_alias': ('alias', lambda ifalias=None: ifalias or ''),
+        'set_state': ('state', lambda state: state),
+        'set_link_detect': ('link_detect', lambda link_filter: str(int(link_filter))),
+        'set_arp_cache_tmo': ('arp_cache_tmo', lambda tmo: str(int(tmo) * 1000)),
+        'set_proxy_arp': ('proxy_arp', lambda enable: str(int(enable))),
+        'set_proxy_arp_pvlan': ('proxy_arp_pvlan', lambda enable: str(int(enable))),
+    }
+
     def __init__(self, ifname, type=None):
         """
         This is the base interface class which supports basic IP/MAC address
@@ -67,6 +130,11 @@ class Interface:
         creating the following file:
         vyos@vyos# touch /tmp/vyos.ifconfig.debug
 
+        NETLINK:
+        Links and addresses are changed over rtnetlink, see vyos.netlink.
+        To use the ip commands instead, set VYOS_IFCONFIG_BACKEND=iproute2
+        in the environment.
+
         Example:
         >>> from vyos.ifconfig import Interface
         >>> i = Interface('eth0')
@@ -78,7 +146,7 @@ class Interface:
 
         if not os.path.exists('/sys/class/net/{}'.format(self._ifname)):
             cmd = 'ip link add dev {} type {}'.format(self._ifname, type)
-            self._cmd(cmd)
+            self._ip(cmd, vyos.netlink.link_add, self._ifname, type)
 
         # per interface DHCP config files
         self._dhcp_cfg_file = dhclient_base + self._ifname + '.conf'
@@ -91,19 +159,14 @@ class Interface:
         self._dhcpv6_lease_file = dhclient_base + self._ifname + '.v6leases'
 
         # DHCP options
-        self._dhcp_options = {
-            'intf' : self._ifname,
-            'hostname' : '',
-            'client_id' : '',
-            'vendor_class_id' : ''
-        }
+        self._dhcp_options = _default_dhcp_options(self._ifname)
 
         # DHCPv6 options
-        self._dhcpv6_options = {
-            'intf' : self._ifname,
-            'dhcpv6_prm_only' : False,
-            'dhcpv6_temporary' : False
-        }
+        self._dhcpv6_options = _default_dhcpv6_options(self._ifname)
+
+        # addresses of the interface, read when first needed and kept
+        # up to date by add_addr and del_addr
+        self._addresses = None
 
     def _debug_msg(self, msg):
         if os.path.isfile('/tmp/vyos.ifconfig.debug'):
@@ -119,6 +182,27 @@ class Interface:
         # do we need some error checking code here?
         return tmp.decode()
 
+    def _ip(self, command, func, *args, **kwargs):
+        """
+        Make a change with a vyos.netlink function, or run the equivalent
+        ip command if netlink is not used. As with the ip commands, errors
+        of changes that are already made or of links that are already gone
+        are ignored, e.g. removing a bridge port deleted earlier in the same
+        commit. Other netlink errors are raised, as NetlinkError.
+        """
+        if vyos.netlink.get_socket() is None:
+            return self._cmd(command)
+
+        self._debug_msg("netlink '{}'".format(command))
+        try:
+            func(*args, **kwargs)
+        except vyos.netlink.NetlinkError as e:
+            if e.errno not in _IP_NOOP_ERRORS:
+                raise
+            self._debug_msg("returned:\n{}".format(e.strerror))
+            return e.strerror
+        return ''
+
     def _read_sysfs(self, filename):
         """
         Provide a single primitive w/ error checking for reading from sysfs.
@@ -130,6 +214,15 @@ class Interface:
         self._debug_msg("read '{}' < '{}'".format(value, filename))
         return value
 
+    def _read_setting(self, filename):
+        """
+        Read a setting from sysfs or procfs, None if there is no such setting.
+        """
+        try:
+            return self._read_sysfs(filename)
+        except OSError:
+            return None
+
     def _write_sysfs(self, filename, value):
         """
         Provide a single primitive w/ error checking for writing to sysfs.
@@ -169,7 +262,59 @@ class Interface:
         # after interface removal no other commands should be allowed
         # to be called and instead should raise an Exception:
         cmd = 'ip link del dev {}'.format(self._ifname)
-        return self._cmd(cmd)
+        return self._ip(cmd, vyos.netlink.link_del, self._ifname)
+
+    def get_settings(self):
+        """
+        Read the settings of the interface a Reconciler compares, all at once:
+        the link over rtnetlink, or from sysfs, and the IPv4 sysctls. Settings
+        which can't be read are None.
+
+        Example:
+        >>> from vyos.ifconfig import Interface
+        >>> Interface('eth0').get_settings()['mtu']
+        '1500'
+        """
+        if vyos.netlink.get_socket() is not None:
+            link = vyos.netlink.link_get(self._ifname)
+        else:
+            sysfs = '/sys/class/net/{}/'.format(self._ifname)
+            link = {
+                'flags': int(self._read_sysfs(sysfs + 'flags'), 16),
+                'mtu': self._read_sysfs(sysfs + 'mtu'),
+                'address': self._read_sysfs(sysfs + 'address'),
+                'alias': self._read_sysfs(sysfs + 'ifalias'),
+            }
+
+        settings = {
+            'mtu': str(link['mtu']),
+            'mac': link.get('address'),
+            'alias': link['alias'],
+            'state': 'up' if link['flags'] & vyos.netlink.IFF_UP else 'down',
+        }
+        for setting, filename in [
+                ('link_detect', 'conf/{}/link_filter'),
+                ('arp_cache_tmo', 'neigh/{}/base_reachable_time_ms'),
+                ('proxy_arp', 'conf/{}/proxy_arp'),
+                ('proxy_arp_pvlan', 'conf/{}/proxy_arp_pvlan')]:
+            settings[setting] = self._read_setting('/proc/sys/net/ipv4/' +
+                                                   filename.format(self._ifname))
+        return settings
+
+    def reconciler(self):
+        """
+        Start collecting settings of this interface, to only apply those the
+        kernel doesn't have yet. See Reconciler.
+
+        Example:
+        >>> from vyos.ifconfig import Interface
+        >>> r = Interface('eth0').reconciler()
+        >>> r.set_mtu(1500)
+        >>> r.set_state('up')
+        >>> r.apply()
+        [('state', 'down', 'up')]
+        """
+        return Reconciler(self)
 
     def get_mtu(self):
         """
@@ -193,11 +338,14 @@ class Interface:
         >>> Interface('eth0').get_mtu()
         '1400'
         """
-        if mtu < 68 or mtu > 9000:
-            raise ValueError('Invalid MTU size: "{}"'.format(mru))
+        _check_mtu(mtu)
+
+        if vyos.netlink.get_socket() is None:
+            return self._write_sysfs('/sys/class/net/{}/mtu'
+                                     .format(self._ifname), mtu)
 
-        return self._write_sysfs('/sys/class/net/{}/mtu'
-                                 .format(self._ifname), mtu)
+        cmd = 'ip link set dev {} mtu {}'.format(self._ifname, mtu)
+        return self._ip(cmd, vyos.netlink.link_set, self._ifname, mtu=mtu)
 
     def set_mac(self, mac):
         """
@@ -211,28 +359,12 @@ class Interface:
         if not mac:
             return None
 
-        # a mac address consits out of 6 octets
-        octets = len(mac.split(':'))
-        if octets != 6:
-            raise ValueError('wrong number of MAC octets: {} '.format(octets))
-
-        # validate against the first mac address byte if it's a multicast
-        # address
-        if int(mac.split(':')[0], 16) & 1:
-            raise ValueError('{} is a multicast MAC address'.format(mac))
-
-        # overall mac address is not allowed to be 00:00:00:00:00:00
-        if sum(int(i, 16) for i in mac.split(':')) == 0:
-            raise ValueError('00:00:00:00:00:00 is not a valid MAC address')
-
-        # check for VRRP mac address
-        if mac.split(':')[0] == '0' and addr.split(':')[1] == '0' and mac.split(':')[2] == '94' and mac.split(':')[3] == '0' and mac.split(':')[4] == '1':
-            raise ValueError('{} is a VRRP MAC address'.format(mac))
+        _check_mac(mac)
 
         # Assemble command executed on system. Unfortunately there is no way
         # of altering the MAC address via sysfs
         cmd = 'ip link set dev {} address {}'.format(self._ifname, mac)
-        return self._cmd(cmd)
+        return self._ip(cmd, vyos.netlink.link_set, self._ifname, address=mac)
 
 
     def set_arp_cache_tmo(self, tmo):
@@ -301,6 +433,9 @@ class Interface:
         >>> Interface('eth0').get_state()
         'up'
         """
+        if vyos.netlink.get_socket() is not None:
+            return vyos.netlink.link_get(self._ifname)['operstate']
+
         cmd = 'ip -json link show dev {}'.format(self._ifname)
         tmp = self._cmd(cmd)
         out = json.loads(tmp)
@@ -322,7 +457,7 @@ class Interface:
         # Assemble command executed on system. Unfortunately there is no way
         # to up/down an interface via sysfs
         cmd = 'ip link set dev {} {}'.format(self._ifname, state)
-        return self._cmd(cmd)
+        return self._ip(cmd, vyos.netlink.link_set, self._ifname, state=state)
 
     def set_proxy_arp(self, enable):
         """
@@ -379,31 +514,16 @@ class Interface:
         ['172.16.33.30/24', 'fe80::20c:29ff:fe11:a174/64']
         """
 
-        ipv4 = []
-        ipv6 = []
-
-        if AF_INET in ifaddresses(self._ifname).keys():
-            for v4_addr in ifaddresses(self._ifname)[AF_INET]:
-                # we need to manually assemble a list of IPv4 address/prefix
-                prefix = '/' + \
-                    str(IPv4Network('0.0.0.0/' + v4_addr['netmask']).prefixlen)
-                ipv4.append(v4_addr['addr'] + prefix)
+        return AddressSnapshot([self._ifname]).get_addr(self._ifname)
 
-        if AF_INET6 in ifaddresses(self._ifname).keys():
-            for v6_addr in ifaddresses(self._ifname)[AF_INET6]:
-                # Note that currently expanded netmasks are not supported. That means
-                # 2001:db00::0/24 is a valid argument while 2001:db00::0/ffff:ff00:: not.
-                # see https://docs.python.org/3/library/ipaddress.html
-                bits = bin(
-                    int(v6_addr['netmask'].replace(':', ''), 16)).count('1')
-                prefix = '/' + str(bits)
-
-                # we alsoneed to remove the interface suffix on link local
-                # addresses
-                v6_addr['addr'] = v6_addr['addr'].split('%')[0]
-                ipv6.append(v6_addr['addr'] + prefix)
-
-        return ipv4 + ipv6
+    def _get_addresses(self):
+        """
+        Returns:
+            AddressSnapshot: of this interface, taken once
+        """
+        if self._addresses is None:
+            self._addresses = AddressSnapshot([self._ifname])
+        return self._addresses
 
     def add_addr(self, addr):
         """
@@ -424,14 +544,20 @@ class Interface:
         >>> j.get_addr()
         ['192.0.2.1/24', '2001:db8::ffff/64']
         """
+        if addr in ['dhcp', 'dhcpv6']:
+            # the DHCP client changes the addresses from now on
+            self._addresses = None
+
         if addr == 'dhcp':
             self._set_dhcp()
         elif addr == 'dhcpv6':
             self._set_dhcpv6()
         else:
-            if not is_intf_addr_assigned(self._ifname, addr):
+            addresses = self._get_addresses()
+            if not addresses.is_intf_addr_assigned(self._ifname, addr):
                 cmd = 'ip addr add "{}" dev "{}"'.format(addr, self._ifname)
-                return self._cmd(cmd)
+                self._ip(cmd, vyos.netlink.addr_add, self._ifname, addr)
+                addresses.add(self._ifname, addr)
 
     def del_addr(self, addr):
         """
@@ -455,14 +581,26 @@ class Interface:
         >>> j.get_addr()
         ['2001:db8::ffff/64']
         """
+        if addr in ['dhcp', 'dhcpv6']:
+            # the DHCP client changed the addresses
+            self._addresses = None
+
         if addr == 'dhcp':
             self._del_dhcp()
         elif addr == 'dhcpv6':
             self._del_dhcpv6()
         else:
-            if is_intf_addr_assigned(self._ifname, addr):
+            addresses = self._get_addresses()
+            if addresses.is_intf_addr_assigned(self._ifname, addr):
                 cmd = 'ip addr del "{}" dev "{}"'.format(addr, self._ifname)
-                return self._cmd(cmd)
+                self._ip(cmd, vyos.netlink.addr_del, self._ifname, addr)
+                if ipaddress.ip_interface(addr).version == 4:
+                    # Deleting a primary IPv4 address also deletes the
+                    # secondary addresses of its subnet, unless
+                    # promote_secondaries is set: read them again
+                    self._addresses = None
+                else:
+                    addresses.remove(self._ifname, addr)
 
 
     def get_dhcp_options(self):
@@ -516,7 +654,7 @@ class Interface:
                 dhcp['hostname'] = f.read().rstrip('\n')
 
         # render DHCP configuration
-        tmpl = jinja2.Template(dhcp_cfg)
+        tmpl = get_template(dhcp_cfg)
         dhcp_text = tmpl.render(dhcp)
         with open(self._dhcp_cfg_file, 'w') as f:
             f.write(dhcp_text)
@@ -598,7 +736,7 @@ class Interface:
             raise Exception('DHCPv6 temporary and parameters-only options are mutually exclusive!')
 
         # render DHCP configuration
-        tmpl = jinja2.Template(dhcpv6_cfg)
+        tmpl = get_template(dhcpv6_cfg)
         dhcpv6_text = tmpl.render(dhcpv6)
         with open(self._dhcpv6_cfg_file, 'w') as f:
             f.write(dhcpv6_text)
@@ -672,6 +810,88 @@ class Interface:
             os.remove(self._dhcpv6_lease_file)
 
 
+class Reconciler(object):
+    """
+    Settings of an interface, applied only where the kernel has other values.
+
+    Calls of the setters of the interface are collected, apply() then reads
+    the settings of the interface once, with get_settings(), and makes the
+    calls that change something, in order. A later call of the same setter
+    replaces an earlier one. Setters the interface doesn't compare, e.g.
+    add_port or add_addr, are called as they come. Other methods are those
+    of the interface.
+
+    Applying a configuration again which didn't change only reads the
+    settings, no link is bounced.
+    """
+    def __init__(self, interface):
+        self._interface = interface
+        self._calls = []
+        self._current = None
+
+    def __getattr__(self, name):
+        method = getattr(self._interface, name)
+        if not name.startswith(('set_', 'add_', 'del_')):
+            return method
+
+        def call(*args, **kwargs):
+            if name in self._interface._settings:
+                self._calls = [c for c in self._calls if c[0] != name]
+            self._calls.append((name, args, kwargs))
+        return call
+
+    def _change(self, name, args, kwargs):
+        """ Returns: (setting, current value, new value), None without a change """
+        setting, value = self._interface._settings[name]
+        new = value(*args, **kwargs)
+        if new is None or new == self._current.get(setting):
+            return None
+        return (setting, self._current.get(setting), new)
+
+    def refresh(self):
+        """
+        Read the settings of the interface again, after changing it other
+        than through this Reconciler.
+        """
+        self._current = None
+
+    def changes(self):
+        """
+        Returns:
+            list: (setting, current value, new value) of the collected calls
+            that change something, in call order
+        """
+        if self._current is None:
+            self._current = self._interface.get_settings()
+        changes = [self._change(name, args, kwargs) for name, args, kwargs in self._calls
+                   if name in self._interface._settings]
+        return [c for c in changes if c]
+
+    def apply(self):
+        """
+        Make the collected calls that change something.
+
+        Returns:
+            list: (setting, old value, new value) of the changes made
+        """
+        if self._current is None:
+            self._current = self._interface.get_settings()
+
+        changes = []
+        for name, args, kwargs in self._calls:
+            if name in self._interface._settings:
+                change = self._change(name, args, kwargs)
+                if change is None:
+                    continue
+                self._interface._debug_msg("{0} '{1}' -> '{2}'".format(*change))
+                self._current[change[0]] = change[2]
+                changes.append(change)
+            getattr(self._interface, name)(*args, **kwargs)
+
+        self._calls = []
+        return changes
+
+
 class LoopbackIf(Interface):
 
     """
@@ -715,9 +935,21 @@ class STPIf(Interface):
     A spanning-tree capable interface. This applies only to bridge port member
     interfaces!
     """
+    _settings = dict(Interface._settings,
+        set_path_cost=('path_cost', lambda cost: str(cost)),
+        set_path_priority=('path_priority', lambda priority: str(priority)),
+    )
+
     def __init__(self, ifname):
         super().__init__(ifname)
 
+    def get_settings(self):
+        settings = super().get_settings()
+        brport = '/sys/class/net/{}/brport/'.format(self._ifname)
+        settings['path_cost'] = self._read_setting(brport + 'path_cost')
+        settings['path_priority'] = self._read_setting(brport + 'priority')
+        return settings
+
     def set_path_cost(self, cost):
         """
         Set interface path cost, only relevant for STP enabled interfaces
@@ -761,10 +993,27 @@ class BridgeIf(Interface):
 
     The Linux bridge code implements a subset of the ANSI/IEEE 802.1d standard.
     """
+    _settings = dict(Interface._settings,
+        set_ageing_time=('ageing_time', lambda time: str(int(time) * 100)),
+        set_forward_delay=('forward_delay', lambda time: str(int(time) * 100)),
+        set_hello_time=('hello_time', lambda time: str(int(time) * 100)),
+        set_max_age=('max_age', lambda time: str(int(time) * 100)),
+        set_priority=('priority', lambda priority: str(priority)),
+        set_stp=('stp_state', lambda state: str(int(state))),
+        set_multicast_querier=('multicast_querier', lambda enable: str(int(enable))),
+    )
 
     def __init__(self, ifname):
         super().__init__(ifname, type='bridge')
 
+    def get_settings(self):
+        settings = super().get_settings()
+        for setting in ['ageing_time', 'forward_delay', 'hello_time', 'max_age',
+                        'priority', 'stp_state', 'multicast_querier']:
+            settings[setting] = self._read_setting('/sys/class/net/{}/bridge/{}'
+                                                   .format(self._ifname, setting))
+        return settings
+
     def set_ageing_time(self, time):
         """
         Set bridge interface MAC address aging time in seconds. Internal kernel
@@ -871,7 +1120,7 @@ class BridgeIf(Interface):
         >>> BridgeIf('br0').add_port('eth1')
         """
         cmd = 'ip link set dev {} master {}'.format(interface, self._ifname)
-        return self._cmd(cmd)
+        return self._ip(cmd, vyos.netlink.link_set, interface, master=self._ifname)
 
     def del_port(self, interface):
         """
@@ -882,7 +1131,7 @@ class BridgeIf(Interface):
         >>> BridgeIf('br0').del_port('eth1')
         """
         cmd = 'ip link set dev {} nomaster'.format(interface)
-        return self._cmd(cmd)
+        return self._ip(cmd, vyos.netlink.link_set, interface, master='')
 
 class VLANIf(Interface):
     """
@@ -955,6 +1204,7 @@ class VLANIf(Interface):
         vlan_ifname = self._ifname + '.' + str(vlan_id)
         if not os.path.exists('/sys/class/net/{}'.format(vlan_ifname)):
             self._vlan_id = int(vlan_id)
+            info = vyos.netlink.vlan_info(self._vlan_id, ethertype, ingress_qos, egress_qos)
 
             if ethertype:
                 self._ethertype = ethertype
@@ -972,7 +1222,7 @@ class VLANIf(Interface):
             # create interface in the system
             cmd = 'ip link add link {intf} name {intf}.{vlan} type vlan {proto} id {vlan} {opt_e} {opt_i}' \
                    .format(intf=self._ifname, vlan=self._vlan_id, proto=ethertype, opt_e=opt_e, opt_i=opt_i)
-            self._cmd(cmd)
+            self._ip(cmd, vyos.netlink.link_add, vlan_ifname, 'vlan', link=self._ifname, info=info)
 
         # return new object mapping to the newly created interface
         # we can now work on this object for e.g. IP address setting
@@ -994,14 +1244,356 @@ class VLANIf(Interface):
         vlan_ifname = self._ifname + '.' + str(vlan_id)
         VLANIf(vlan_ifname).remove()
 
+    def plan(self):
+        """
+        Start collecting changes to the VLAN interfaces of this interface,
+        to make them all at once. See VLANPlan.
+
+        Example:
+        >>> from vyos.ifconfig import VLANIf
+        >>> plan = VLANIf('eth0').plan()
+        >>> plan.add_vlan(10).add_addr('192.0.2.1/24')
+        >>> plan.commit()
+        []
+        """
+        return VLANPlan(self._ifname)
+
+
+# Stages of a VLAN plan, changes of a stage need those of the previous ones
+PLAN_REMOVE = 0
+# VLANs are created in a stage per level, the parent of a Q-in-Q VLAN first
+PLAN_CREATE = 1
+PLAN_CONFIGURE = 100
+PLAN_ADDRESS = 101
+PLAN_DHCP = 102
+
+# Errors of changes that are already in place, by errno, and as ip reports them
+_PLAN_NOOP_ERRORS = {
+    errno.EEXIST: ['File exists', 'Address already assigned'],
+    errno.EADDRNOTAVAIL: ['Cannot assign requested address', 'Address not found'],
+}
+
+
+class _PlanOperation(object):
+    """
+    A change of a VLAN plan: an ip command, made over netlink with the
+    request returned by request(), or a call that makes the change itself,
+    e.g. a sysfs write.
+    """
+    def __init__(self, stage, cmd, request=None, call=None, noop_error=None):
+        self.stage = stage
+        self.cmd = cmd
+        self.request = request
+        self.call = call
+        self.noop_error = noop_error
+
+    def is_noop(self, error):
+        if self.noop_error is None:
+            return False
+        if isinstance(error, OSError):
+            return error.errno == self.noop_error
+        return any(m in error for m in _PLAN_NOOP_ERRORS[self.noop_error])
+
+
+class VLANPlan(object):
+    """
+    Changes to the VLAN interfaces (vif, vif-s and vif-c) of an interface,
+    collected and then made all at once by commit().
+
+    Links are removed first, then created, configured and given their
+    addresses, each stage with a single batch of netlink requests, or
+    a single ``ip -batch`` without netlink. Changes that fail don't stop
+    the others, their errors are returned by commit().
+
+    The VLANs are PlannedVLAN objects, which take the same calls as
+    VLANIf objects, so the same code can configure either.
+    """
+    def __init__(self, ifname):
+        self._ifname = ifname
+        self._removed = set()
+        self.operations = []
+
+    def _add(self, stage, cmd, **kwargs):
+        self.operations.append(_PlanOperation(stage, cmd, **kwargs))
+
+    def _exists(self, ifname):
+        """ Returns: whether a link exists when the plan gets to create it """
+        return ifname not in self._removed and os.path.exists('/sys/class/net/{}'.format(ifname))
+
+    def _remove(self, ifname):
+        # Sub interfaces go first, Q-in-Q before 802.1q
+        links = [f for f in os.listdir('/sys/class/net') if f.startswith(ifname + '.')]
+        links.sort(key=lambda f: f.count('.'), reverse=True)
+        for link in links + [ifname]:
+            if link in self._removed or not os.path.exists('/sys/class/net/{}'.format(link)):
+                continue
+            self._removed.add(link)
+            self._add(PLAN_REMOVE, 'dhcp stop dev {}'.format(link), call=lambda link=link: _stop_dhcp(link))
+            self._add(PLAN_REMOVE, 'link del dev {}'.format(link),
+                      request=lambda link=link: vyos.netlink.link_del_request(link))
+
+    def _vlan(self, parent, vlan_id, stage, ethertype='', ingress_qos='', egress_qos=''):
+        vlan_ifname = parent + '.' + str(vlan_id)
+        if not self._exists(vlan_ifname):
+            info = vyos.netlink.vlan_info(vlan_id, ethertype, ingress_qos, egress_qos)
+            cmd = 'link add link {intf} name {name} type vlan'.format(intf=parent, name=vlan_ifname)
+            if ethertype:
+                cmd += ' proto {}'.format(ethertype)
+            cmd += ' id {}'.format(vlan_id)
+            if egress_qos:
+                cmd += ' egress-qos-map ' + egress_qos
+            if ingress_qos:
+                cmd += ' ingress-qos-map ' + ingress_qos
+            self._add(stage, cmd, request=lambda: vyos.netlink.link_add_request(
+                vlan_ifname, 'vlan', link=parent, info=info))
+        return PlannedVLAN(self, vlan_ifname, stage)
+
+    def add_vlan(self, vlan_id, ethertype='', ingress_qos='', egress_qos=''):
+        """
+        Create a VLAN interface, unless it exists, as VLANIf.add_vlan()
+
+        Returns:
+            PlannedVLAN: the VLAN interface, to plan its configuration
+        """
+        return self._vlan(self._ifname, vlan_id, PLAN_CREATE, ethertype, ingress_qos, egress_qos)
+
+    def del_vlan(self, vlan_id):
+        """ Remove a VLAN interface and its sub interfaces, as VLANIf.del_vlan() """
+        self._remove(self._ifname + '.' + str(vlan_id))
+
+    def commit(self):
+        """
+        Make the planned changes.
+
+        Returns:
+            list: (index, error message) tuples for the failed changes,
+            indexes of the operations list, empty if all changes were made
+        """
+        errors = []
+        netlink = vyos.netlink.get_socket()
+        for stage in sorted(set(op.stage for op in self.operations)):
+            ops = [(i, op) for i, op in enumerate(self.operations) if op.stage == stage]
+            for i, op in ops:
+                if op.call is None:
+                    continue
+                try:
+                    op.call()
+                except Exception as e:
+                    errors.append((i, str(e)))
+
+            links = [(i, op) for i, op in ops if op.request is not None]
+            if not links:
+                continue
+            if netlink is not None:
+                results = self._commit_netlink(netlink, links)
+            else:
+                results = self._commit_iproute2(links)
+            for i, op in links:
+                error = results.get(i)
+                if error is not None and not op.is_noop(error):
+                    errors.append((i, str(error)))
+
+        return sorted(errors)
+
+    def _commit_netlink(self, netlink, links):
+        """ Returns: dict: the NetlinkError of failed changes, by index """
+        results = {}
+        requests = []
+        for i, op in links:
+            try:
+                requests.append((i, op.request()))
+            except vyos.netlink.NetlinkError as e:
+                # No such link, e.g. its creation failed
+                results[i] = e
+        errors = netlink.request_batch('vlan plan {}'.format(self._ifname), [r for _, r in requests])
+        for (i, _), error in zip(requests, errors):
+            results[i] = error
+        return results
+
+    def _run_batch(self, commands):
+        p = Popen(['ip', '-force', '-batch', '-'], stdin=PIPE, stdout=PIPE, stderr=STDOUT)
+        return p.communicate(('\n'.join(commands) + '\n').encode())[0].decode()
+
+    def _commit_iproute2(self, links):
+        """ Returns: dict: the error message of failed changes, by index """
+        output = self._run_batch([op.cmd for _, op in links])
+        # Errors are followed by the number of the line that failed
+        results = {}
+        message = []
+        for line in output.splitlines():
+            failed = re.match(r'Command failed -:(\d+)', line)
+            if failed:
+                i = links[int(failed.group(1)) - 1][0]
+                results[i] = '{}: {}'.format(self.operations[i].cmd, ' '.join(message))
+                message = []
+            else:
+                message.append(line.strip())
+        return results
+
+
+def _stop_dhcp(ifname):
+    i = Interface(ifname)
+    i._del_dhcp()
+    i._del_dhcpv6()
+
+
+class PlannedVLAN(object):
+    """
+    A VLAN interface of a VLANPlan. Changes are added to the plan,
+    they are made by VLANPlan.commit().
+    """
+    def __init__(self, plan, ifname, stage):
+        self._plan = plan
+        self._ifname = ifname
+        self._stage = stage
+        self._dhcp_options = _default_dhcp_options(ifname)
+        self._dhcpv6_options = _default_dhcpv6_options(ifname)
+
+    def _sysfs(self, cmd, method, *args):
+        # Made by a VLANIf once the link exists
+        ifname = self._ifname
+        self._plan._add(PLAN_CONFIGURE, cmd, call=lambda: getattr(VLANIf(ifname), method)(*args))
+
+    def _link_set(self, cmd, **kwargs):
+        ifname = self._ifname
+        self._plan._add(PLAN_CONFIGURE, 'link set dev {} {}'.format(ifname, cmd),
+                        request=lambda: vyos.netlink.link_set_request(ifname, **kwargs))
+
+    def add_vlan(self, vlan_id, ethertype='', ingress_qos='', egress_qos=''):
+        """ Create a Q-in-Q VLAN interface on this one """
+        return self._plan._vlan(self._ifname, vlan_id, self._stage + 1, ethertype, ingress_qos, egress_qos)
+
+    def del_vlan(self, vlan_id):
+        self._plan._remove(self._ifname + '.' + str(vlan_id))
+
+    def get_dhcp_options(self):
+        return self._dhcp_options
+
+    def set_dhcp_options(self, options):
+        self._dhcp_options = options
+
+    def get_dhcpv6_options(self):
+        return self._dhcpv6_options
+
+    def set_dhcpv6_options(self, options):
+        self._dhcpv6_options = options
+
+    def set_alias(self, ifalias=None):
+        self._sysfs('alias {}'.format(ifalias or ''), 'set_alias', ifalias)
+
+    def set_link_detect(self, link_filter):
+        self._sysfs('link_filter {}'.format(link_filter), 'set_link_detect', link_filter)
+
+    def set_mtu(self, mtu):
+        _check_mtu(mtu)
+        self._link_set('mtu {}'.format(mtu), mtu=mtu)
+
+    def set_mac(self, mac):
+        if not mac:
+            return
+        _check_mac(mac)
+        self._link_set('address {}'.format(mac), address=mac)
+
+    def set_state(self, state):
+        if state not in ['up', 'down']:
+            raise ValueError('state must be "up" or "down"')
+        self._link_set(state, state=state)
+
+    def add_addr(self, addr):
+        ifname = self._ifname
+        if addr in ['dhcp', 'dhcpv6']:
+            # With the options set at the time of the commit
+            def start():
+                i = VLANIf(ifname)
+                i.set_dhcp_options(self._dhcp_options)
+                i.set_dhcpv6_options(self._dhcpv6_options)
+                i.add_addr(addr)
+            self._plan._add(PLAN_DHCP, '{} start dev {}'.format(addr, ifname), call=start)
+        else:
+            # Invalid addresses are rejected now, not in the middle of the commit
+            ipaddress.ip_interface(addr)
+            self._plan._add(PLAN_ADDRESS, 'addr add {} dev {}'.format(addr, ifname),
+                            request=lambda: vyos.netlink.addr_add_request(ifname, addr),
+                            noop_error=errno.EEXIST)
+
+    def del_addr(self, addr):
+        ifname = self._ifname
+        if addr in ['dhcp', 'dhcpv6']:
+            self._plan._add(PLAN_ADDRESS, '{} stop dev {}'.format(addr, ifname),
+                            call=lambda: VLANIf(ifname).del_addr(addr))
+        else:
+            ipaddress.ip_interface(addr)
+            self._plan._add(PLAN_ADDRESS, 'addr del {} dev {}'.format(addr, ifname),
+                            request=lambda: vyos.netlink.addr_del_request(ifname, addr),
+                            noop_error=errno.EADDRNOTAVAIL)
+
 
 class EthernetIf(VLANIf):
     """
     Abstraction of a Linux Ethernet Interface
     """
+    _settings = dict(VLANIf._settings,
+        set_flow_control=('flow_control', lambda enable: enable),
+        set_speed_duplex=('speed_duplex', lambda speed, duplex:
+                          'auto' if 'auto' in [speed, duplex] else '{}/{}'.format(speed, duplex)),
+        set_gro=('gro', lambda state: state),
+        set_gso=('gso', lambda state: state),
+        set_sg=('sg', lambda state: state),
+        set_tso=('tso', lambda state: state),
+        set_ufo=('ufo', lambda state: state),
+    )
+
     def __init__(self, ifname):
         super().__init__(ifname)
 
+    def get_settings(self):
+        """
+        Read the settings a Reconciler compares: those of every interface,
+        the offloads, link speed and duplex and flow control, over the
+        SIOCETHTOOL ioctl.
+        """
+        settings = super().get_settings()
+
+        for feature in vyos.ethtool.FEATURES:
+            try:
+                enabled = vyos.ethtool.get_feature(self._ifname, feature)
+                settings[feature] = 'on' if enabled else 'off'
+            except OSError:
+                settings[feature] = None
+
+        settings['speed_duplex'] = None
+        try:
+            link = vyos.ethtool.get_link(self._ifname)
+            if link['autoneg']:
+                settings['speed_duplex'] = 'auto'
+            elif link['speed'] and link['duplex']:
+                settings['speed_duplex'] = '{}/{}'.format(link['speed'], link['duplex'])
+        except OSError:
+            pass
+
+        # on or off, for all of autonegotiation, rx and tx
+        settings['flow_control'] = None
+        try:
+            pause = set(vyos.ethtool.get_pause(self._ifname).values())
+            if len(pause) == 1:
+                settings['flow_control'] = 'on' if pause.pop() else 'off'
+        except OSError:
+            pass
+        return settings
+
+    def _ethtool_error(self, error, setting):
+        """
+        Not every driver supports every setting, only other errors are raised.
+        Drivers also reject settings the NIC can't do with EINVAL, e.g. ixgbe
+        pause frame autonegotiation on fiber, those are skipped as well.
+        """
+        if error.errno == errno.EOPNOTSUPP:
+            self._debug_msg('driver does not support changing {} settings!'.format(setting))
+        elif error.errno == errno.EINVAL:
+            self._debug_msg('driver rejected the {} settings!'.format(setting))
+        else:
+            raise error
+
     def get_driver_name(self):
         """
         Return the driver name used by NIC. Some NICs don't support all
@@ -1035,15 +1627,16 @@ class EthernetIf(VLANIf):
                             .format(self.get_driver_name()))
             return
 
-        # Assemble command executed on system. Unfortunately there is no way
-        # to change this setting via sysfs
-        cmd = '/sbin/ethtool --pause {0} autoneg {1} tx {1} rx {1}'.format(
-              self._ifname, enable)
+        # Unchanged pause parameters are not set again
+        pause = enable == 'on'
         try:
-            # An exception will be thrown if the settings are not changed
-            return self._cmd(cmd)
-        except CalledProcessError:
-            pass
+            if vyos.ethtool.get_pause(self._ifname) == {'autoneg': pause, 'rx': pause, 'tx': pause}:
+                return
+            self._debug_msg("ethtool '--pause {0} autoneg {1} tx {1} rx {1}'"
+                            .format(self._ifname, enable))
+            vyos.ethtool.set_pause(self._ifname, pause, pause, pause)
+        except OSError as e:
+            self._ethtool_error(e, 'flow control')
 
 
     def set_speed_duplex(self, speed, duplex):
@@ -1070,15 +1663,39 @@ class EthernetIf(VLANIf):
                             .format(self.get_driver_name()))
             return
 
+        # Changing the link settings restarts the link, unchanged ones are
+        # not set again
+        try:
+            link = vyos.ethtool.get_link(self._ifname)
+            if speed == 'auto' or duplex == 'auto':
+                if link['autoneg']:
+                    return
+                self._debug_msg("ethtool '-s {} autoneg on'".format(self._ifname))
+                vyos.ethtool.set_link(self._ifname)
+            else:
+                if not link['autoneg'] and (link['speed'], link['duplex']) == (int(speed), duplex):
+                    return
+                self._debug_msg("ethtool '-s {} speed {} duplex {} autoneg off'"
+                                .format(self._ifname, speed, duplex))
+                vyos.ethtool.set_link(self._ifname, int(speed), duplex)
+        except OSError as e:
+            self._ethtool_error(e, 'speed/duplex')
 
-        cmd = '/sbin/ethtool -s {}'.format(self._ifname)
-        if speed == 'auto' or duplex == 'auto':
-            cmd += ' autoneg on'
-        else:
-            cmd += ' speed {} duplex {} autoneg off'.format(speed, duplex)
-
-        return self._cmd(cmd)
+    def _set_feature(self, feature, state):
+        """
+        Turn an offload on or off, unless it already is.
+        """
+        if state not in ['on', 'off']:
+            raise ValueError('state must be "on" or "off"')
 
+        enable = state == 'on'
+        try:
+            if vyos.ethtool.get_feature(self._ifname, feature) == enable:
+                return
+            self._debug_msg("ethtool '-K {} {} {}'".format(self._ifname, feature, state))
+            vyos.ethtool.set_feature(self._ifname, feature, enable)
+        except OSError as e:
+            self._ethtool_error(e, feature)
 
     def set_gro(self, state):
         """
@@ -1087,12 +1704,7 @@ class EthernetIf(VLANIf):
         >>> i = EthernetIf('eth0')
         >>> i.set_gro('on')
         """
-        if state not in ['on', 'off']:
-            raise ValueError('state must be "on" or "off"')
-
-        cmd = '/sbin/ethtool -K {} gro {}'.format(self._ifname, state)
-        return self._cmd(cmd)
-
+        return self._set_feature('gro', state)
 
     def set_gso(self, state):
         """
@@ -1101,12 +1713,7 @@ class EthernetIf(VLANIf):
         >>> i = EthernetIf('eth0')
         >>> i.set_gso('on')
         """
-        if state not in ['on', 'off']:
-            raise ValueError('state must be "on" or "off"')
-
-        cmd = '/sbin/ethtool -K {} gso {}'.format(self._ifname, state)
-        return self._cmd(cmd)
-
+        return self._set_feature('gso', state)
 
     def set_sg(self, state):
         """
@@ -1115,12 +1722,7 @@ class EthernetIf(VLANIf):
         >>> i = EthernetIf('eth0')
         >>> i.set_sg('on')
         """
-        if state not in ['on', 'off']:
-            raise ValueError('state must be "on" or "off"')
-
-        cmd = '/sbin/ethtool -K {} sg {}'.format(self._ifname, state)
-        return self._cmd(cmd)
-
+        return self._set_feature('sg', state)
 
     def set_tso(self, state):
         """
@@ -1129,12 +1731,7 @@ class EthernetIf(VLANIf):
         >>> i = EthernetIf('eth0')
         >>> i.set_tso('on')
         """
-        if state not in ['on', 'off']:
-            raise ValueError('state must be "on" or "off"')
-
-        cmd = '/sbin/ethtool -K {} tso {}'.format(self._ifname, state)
-        return self._cmd(cmd)
-
+        return self._set_feature('tso', state)
 
     def set_ufo(self, state):
         """
@@ -1143,11 +1740,7 @@ class EthernetIf(VLANIf):
         >>> i = EthernetIf('eth0')
         >>> i.set_udp_offload('on')
         """
-        if state not in ['on', 'off']:
-            raise ValueError('state must be "on" or "off"')
-
-        cmd = '/sbin/ethtool -K {} ufo {}'.format(self._ifname, state)
-        return self._cmd(cmd)
+        return self._set_feature('ufo', state)
 
 
 class BondIf(VLANIf):
@@ -1158,9 +1751,25 @@ class BondIf(VLANIf):
     either hot standby or load balancing services. Additionally, link integrity
     monitoring may be performed.
     """
+    _settings = dict(VLANIf._settings,
+        set_hash_policy=('hash_policy', lambda mode: mode),
+        set_mode=('mode', lambda mode: mode),
+        set_primary=('primary', lambda interface: interface or ''),
+    )
+
     def __init__(self, ifname):
         super().__init__(ifname, type='bond')
 
+    def get_settings(self):
+        settings = super().get_settings()
+        for setting, filename in [('hash_policy', 'xmit_hash_policy'),
+                                  ('mode', 'mode'), ('primary', 'primary')]:
+            # e.g. "802.3ad 4", the name is compared
+            value = self._read_setting('/sys/class/net/{}/bonding/{}'
+                                       .format(self._ifname, filename))
+            settings[setting] = value.split(' ')[0] if value is not None else None
+        return settings
+
     def remove(self):
         """
         Remove interface from operating system. Removing the interface
@@ -1488,7 +2097,9 @@ class VXLANIf(Interface, ):
 
                 cmd = 'ip link add {intf} type vxlan id {vni} {grp_rem} {dev} dstport {port}' \
                        .format(intf=self._ifname, vni=config['vni'], grp_rem=group, dev=dev, port=config['port'])
-                self._cmd(cmd)
+                info = vyos.netlink.vxlan_info(config['vni'], group=config['group'], remote=config['remote'],
+                                               dev=config['dev'], port=config['port'])
+                self._ip(cmd, vyos.netlink.link_add, self._ifname, 'vxlan', info=info)
 
         super().__init__(ifname, type='vxlan')
 
@@ -0,0 +1,169 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+In-process metrics, rendered in the Prometheus text format.
+
+Metrics are plain counters updated in place, there's no background
+thread and nothing is computed until they are rendered. Values that
+the process keeps anyway, e.g. queue lengths, can be exposed with
+a function called at render time instead of being updated.
+
+Labels are passed as keyword arguments::
+
+    requests = Counter('requests_total', 'Requests handled', ['route'])
+    requests.inc(route='/retrieve')
+"""
+
+import bisect
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds, from fast config reads to slow commits
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _format_labels(names, values, extra=None):
+    pairs = ['{0}="{1}"'.format(n, _escape(v)) for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append('{0}="{1}"'.format(extra[0], _escape(extra[1])))
+    if not pairs:
+        return ''
+    return '{' + ','.join(pairs) + '}'
+
+
+class _Metric(object):
+    type = None
+
+    def __init__(self, name, help, labels=(), function=None):
+        """
+        Args:
+            name (str): metric name
+            help (str): description
+            labels (list): label names
+            function (callable): returns the value at render time, a number,
+                or a dict of label value tuples to numbers
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.function = function
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        try:
+            return tuple(labels[name] for name in self.labels)
+        except KeyError as e:
+            raise ValueError("Missing label {0} for {1}".format(e, self.name))
+
+    def samples(self):
+        """ Returns: (label values, value) pairs """
+        if self.function is not None:
+            values = self.function()
+            if not isinstance(values, dict):
+                values = {(): values}
+            return sorted(values.items())
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self):
+        lines = ['# HELP {0} {1}'.format(self.name, self.help),
+                 '# TYPE {0} {1}'.format(self.name, self.type)]
+        for key, value in self.samples():
+            lines.append('{0}{1} {2}'.format(self.name, _format_labels(self.labels, key),
+                                             _format_value(value)))
+        return lines
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Counts are per bucket here, cumulative in the output
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def render(self):
+        lines = ['# HELP {0} {1}'.format(self.name, self.help),
+                 '# TYPE {0} {1}'.format(self.name, self.type)]
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append('{0}_bucket{1} {2}'.format(self.name,
+                    _format_labels(self.labels, key, ('le', _format_value(bound))), cumulative))
+            labels = _format_labels(self.labels, key)
+            lines.append('{0}_sum{1} {2}'.format(self.name, labels, _format_value(total)))
+            lines.append('{0}_count{1} {2}'.format(self.name, labels, cumulative))
+        return lines
+
+
+class Registry(object):
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """ Returns: the metric, so that it can be created and registered at once """
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """ Returns: str: all metrics in the Prometheus text format """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,433 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Link and address changes over rtnetlink, without running ``ip``.
+
+Only what ``vyos.ifconfig`` needs is implemented: creating and deleting
+links of a few kinds, adding and removing addresses, and setting the
+state, MTU, MAC address and master of a link. Every request waits for
+the kernel's acknowledgement, errors are raised as NetlinkError with
+the errno the kernel returned.
+
+Every change has a ``*_request`` function that builds the request
+without sending it, so that many of them can be sent together with
+``Netlink.request_batch``.
+
+One socket is opened per process, the first time it's needed. Setting
+the ``VYOS_IFCONFIG_BACKEND`` environment variable to ``iproute2`` makes
+``get_socket`` return None, and ``vyos.ifconfig`` run ``ip`` commands
+as it used to.
+"""
+
+import os
+import errno
+import collections
+import socket
+import struct
+import threading
+import ipaddress
+
+import vyos.trace
+
+NETLINK_ROUTE = 0
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_LINK = 5
+IFLA_MASTER = 10
+IFLA_OPERSTATE = 16
+IFLA_LINKINFO = 18
+IFLA_IFALIAS = 20
+
+IFLA_INFO_KIND = 1
+IFLA_INFO_DATA = 2
+
+IFLA_VLAN_ID = 1
+IFLA_VLAN_EGRESS_QOS = 3
+IFLA_VLAN_INGRESS_QOS = 4
+IFLA_VLAN_PROTOCOL = 5
+IFLA_VLAN_QOS_MAPPING = 1
+
+IFLA_VXLAN_ID = 1
+IFLA_VXLAN_GROUP = 2
+IFLA_VXLAN_LINK = 3
+IFLA_VXLAN_PORT = 15
+IFLA_VXLAN_GROUP6 = 16
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+IFF_UP = 0x1
+
+NLA_F_NESTED = 0x8000
+
+_NLMSGHDR = struct.Struct('=IHHII')
+_IFINFOMSG = struct.Struct('=BxHiII')
+_IFADDRMSG = struct.Struct('=BBBBI')
+_RTATTR = struct.Struct('=HH')
+_NLMSGERR = struct.Struct('=i')
+
+# As ip shows them, by IFLA_OPERSTATE value
+OPERSTATES = ['unknown', 'notpresent', 'down', 'lowerlayerdown', 'testing', 'dormant', 'up']
+
+VLAN_PROTOCOLS = {'802.1q': 0x8100, '802.1ad': 0x88a8}
+
+# Requests sent before their acknowledgements are read, the acknowledgements
+# of a chunk must fit in the socket receive buffer
+BATCH_CHUNK = 256
+
+_lock = threading.Lock()
+_socket = None
+_socket_pid = None
+
+
+class NetlinkError(OSError):
+    pass
+
+
+# A request, as Netlink.request takes it
+Request = collections.namedtuple('Request', ['cmd', 'type', 'flags', 'payload'])
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+def attr(type, data):
+    """
+    Args:
+        type (int): attribute type
+        data (bytes, str or list): the value, a str is null terminated,
+            a list of attributes makes a nested attribute
+
+    Returns:
+        bytes: the attribute, padded
+    """
+    if isinstance(data, str):
+        data = data.encode() + b'\0'
+    elif isinstance(data, list):
+        data = b''.join(data)
+        type |= NLA_F_NESTED
+    length = _RTATTR.size + len(data)
+    return _RTATTR.pack(length, type) + data + b'\0' * (_align(length) - length)
+
+def parse_attrs(data):
+    """ Returns: dict: attribute values by type, as bytes """
+    attrs = {}
+    offset = 0
+    while offset + _RTATTR.size <= len(data):
+        length, type = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attrs[type & ~NLA_F_NESTED] = data[offset + _RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+def _u16(value):
+    return struct.pack('=H', value)
+
+def _u32(value):
+    return struct.pack('=I', value)
+
+def _be16(value):
+    return struct.pack('!H', value)
+
+def ifindex(ifname):
+    """ Returns: the index of a link, raises NetlinkError if there is none """
+    try:
+        return socket.if_nametoindex(ifname)
+    except OSError:
+        raise NetlinkError(errno.ENODEV, 'Cannot find device "{0}"'.format(ifname))
+
+
+class Netlink(object):
+    """ A NETLINK_ROUTE socket, for requests answered by an acknowledgement """
+    def __init__(self):
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self._sock.bind((0, 0))
+        self._seq = 0
+
+    def close(self):
+        self._sock.close()
+
+    def _message(self, type, flags, payload):
+        """ Returns: (sequence number, message) """
+        self._seq += 1
+        flags |= NLM_F_REQUEST
+        if type != RTM_GETLINK:
+            flags |= NLM_F_ACK
+        return (self._seq, _NLMSGHDR.pack(_NLMSGHDR.size + len(payload), type, flags, self._seq, 0) + payload)
+
+    def _replies(self):
+        """ Yields: (sequence number, message type, payload) of received messages """
+        while True:
+            data = self._sock.recv(65536)
+            offset = 0
+            while offset + _NLMSGHDR.size <= len(data):
+                length, msg_type, _, msg_seq, _ = _NLMSGHDR.unpack_from(data, offset)
+                yield (msg_seq, msg_type, data[offset + _NLMSGHDR.size:offset + length])
+                offset += _align(length)
+
+    @staticmethod
+    def _error(cmd, body):
+        """ Returns: the NetlinkError of an NLMSG_ERROR payload, None for an acknowledgement """
+        error = -_NLMSGERR.unpack_from(body)[0]
+        if error:
+            return NetlinkError(error, '{0}: {1}'.format(cmd, os.strerror(error)))
+        return None
+
+    @vyos.trace.traced('netlink')
+    def request(self, cmd, type, flags, payload):
+        """
+        Send a request and wait for the acknowledgement.
+
+        Args:
+            cmd (str): what the request does, for tracing and error messages
+            type (int): message type, e.g. RTM_NEWLINK
+            flags (int): flags besides NLM_F_REQUEST and NLM_F_ACK
+            payload (bytes): the message, attributes included
+
+        Returns:
+            bytes: the payload of the reply, for RTM_GET requests
+        """
+        seq, message = self._message(type, flags, payload)
+        self._sock.send(message)
+        for msg_seq, msg_type, body in self._replies():
+            if msg_seq != seq:
+                continue
+            if msg_type == NLMSG_ERROR:
+                error = self._error(cmd, body)
+                if error is not None:
+                    raise error
+                return None
+            if msg_type == NLMSG_DONE:
+                return None
+            return body
+
+    @vyos.trace.traced('netlink')
+    def request_batch(self, cmd, requests):
+        """
+        Send requests without waiting for each acknowledgement, many in
+        one datagram. The kernel handles them in order, a failed request
+        doesn't stop the others.
+
+        Args:
+            cmd (str): what the requests do, for tracing
+            requests (list): Request tuples, of changes only
+
+        Returns:
+            list: NetlinkError of every request, None for those that succeeded
+        """
+        errors = [None] * len(requests)
+        for start in range(0, len(requests), BATCH_CHUNK):
+            chunk = {}
+            messages = []
+            for i in range(start, min(start + BATCH_CHUNK, len(requests))):
+                r = requests[i]
+                seq, message = self._message(r.type, r.flags, r.payload)
+                chunk[seq] = i
+                messages.append(message)
+            self._sock.send(b''.join(messages))
+            for msg_seq, msg_type, body in self._replies():
+                i = chunk.pop(msg_seq, None)
+                if i is not None and msg_type == NLMSG_ERROR:
+                    errors[i] = self._error(requests[i].cmd, body)
+                if not chunk:
+                    break
+        return errors
+
+
+def get_socket():
+    """ Returns: Netlink: the socket of this process, None if ip is to be used instead """
+    global _socket, _socket_pid
+    if os.environ.get('VYOS_IFCONFIG_BACKEND') == 'iproute2':
+        return None
+    with _lock:
+        if _socket_pid != os.getpid():
+            try:
+                _socket = Netlink()
+            except OSError:
+                # No netlink, e.g. in a restricted container
+                _socket = None
+            _socket_pid = os.getpid()
+        return _socket
+
+
+def _ifinfomsg(index=0, flags=0, change=0):
+    return _IFINFOMSG.pack(socket.AF_UNSPEC, 0, index, flags, change)
+
+def vlan_info(vlan_id, protocol=None, ingress_qos='', egress_qos=''):
+    """
+    Args:
+        vlan_id (int): VLAN ID
+        protocol (str): 802.1q or 802.1ad, the kernel default if None
+        ingress_qos (str): mapping as for ip, "from:to from:to"
+        egress_qos (str): as ingress_qos
+
+    Returns:
+        list: IFLA_INFO_DATA attributes of a VLAN link
+    """
+    data = [attr(IFLA_VLAN_ID, _u16(int(vlan_id)))]
+    if protocol:
+        if protocol.lower() not in VLAN_PROTOCOLS:
+            raise ValueError('Unknown VLAN protocol "{0}"'.format(protocol))
+        data.append(attr(IFLA_VLAN_PROTOCOL, _be16(VLAN_PROTOCOLS[protocol.lower()])))
+    for type, qos in [(IFLA_VLAN_INGRESS_QOS, ingress_qos), (IFLA_VLAN_EGRESS_QOS, egress_qos)]:
+        if qos:
+            mappings = []
+            for mapping in qos.split():
+                src, dst = mapping.split(':')
+                mappings.append(attr(IFLA_VLAN_QOS_MAPPING, _u32(int(src)) + _u32(int(dst))))
+            data.append(attr(type, mappings))
+    return data
+
+def vxlan_info(vni, group='', remote='', dev='', port=None):
+    """
+    Args:
+        vni (int): VXLAN network identifier
+        group (str): multicast group
+        remote (str): unicast remote, takes precedence over group
+        dev (str): underlay link
+        port (int): destination UDP port
+
+    Returns:
+        list: IFLA_INFO_DATA attributes of a VXLAN link
+    """
+    data = [attr(IFLA_VXLAN_ID, _u32(int(vni)))]
+    peer = remote or group
+    if peer:
+        address = ipaddress.ip_address(peer)
+        type = IFLA_VXLAN_GROUP if address.version == 4 else IFLA_VXLAN_GROUP6
+        data.append(attr(type, address.packed))
+    if dev:
+        data.append(attr(IFLA_VXLAN_LINK, _u32(ifindex(dev))))
+    if port:
+        data.append(attr(IFLA_VXLAN_PORT, _be16(int(port))))
+    return data
+
+def link_add_request(ifname, kind, link=None, info=None):
+    """
+    Create a link, as ``ip link add``.
+
+    Args:
+        ifname (str): name of the new link
+        kind (str): link kind, e.g. "dummy", "bridge", "vlan"
+        link (str): parent link, e.g. of a VLAN
+        info (list): kind specific attributes, from vlan_info or vxlan_info
+    """
+    attrs = [attr(IFLA_IFNAME, ifname)]
+    if link:
+        attrs.append(attr(IFLA_LINK, _u32(ifindex(link))))
+    linkinfo = [attr(IFLA_INFO_KIND, kind)]
+    if info:
+        linkinfo.append(attr(IFLA_INFO_DATA, info))
+    attrs.append(attr(IFLA_LINKINFO, linkinfo))
+    return Request('link add {0} type {1}'.format(ifname, kind), RTM_NEWLINK,
+                   NLM_F_CREATE | NLM_F_EXCL, _ifinfomsg() + b''.join(attrs))
+
+def link_add(ifname, kind, link=None, info=None):
+    get_socket().request(*link_add_request(ifname, kind, link, info))
+
+def link_del_request(ifname):
+    """ Delete a link, as ``ip link del`` """
+    return Request('link del {0}'.format(ifname), RTM_DELLINK, 0, _ifinfomsg(ifindex(ifname)))
+
+def link_del(ifname):
+    get_socket().request(*link_del_request(ifname))
+
+def link_set_request(ifname, state=None, mtu=None, address=None, master=None):
+    """
+    Change a link, as ``ip link set``.
+
+    Args:
+        state (str): "up" or "down"
+        mtu (int): MTU
+        address (str): MAC address
+        master (str): bridge or bond to enslave the link to, '' for none
+    """
+    flags = change = 0
+    if state is not None:
+        change = IFF_UP
+        flags = IFF_UP if state == 'up' else 0
+    attrs = []
+    if mtu is not None:
+        attrs.append(attr(IFLA_MTU, _u32(int(mtu))))
+    if address is not None:
+        attrs.append(attr(IFLA_ADDRESS, bytes(int(o, 16) for o in address.split(':'))))
+    if master is not None:
+        attrs.append(attr(IFLA_MASTER, _u32(ifindex(master) if master else 0)))
+    return Request('link set {0}'.format(ifname), RTM_NEWLINK, 0,
+                   _ifinfomsg(ifindex(ifname), flags, change) + b''.join(attrs))
+
+def link_set(ifname, state=None, mtu=None, address=None, master=None):
+    get_socket().request(*link_set_request(ifname, state, mtu, address, master))
+
+def link_get(ifname):
+    """
+    Returns:
+        dict: "flags", "operstate" as ip shows it, lower case, "mtu",
+        "address" and "alias", empty without one
+    """
+    body = get_socket().request('link show {0}'.format(ifname), RTM_GETLINK, 0,
+                                _ifinfomsg(ifindex(ifname)))
+    _, _, _, flags, _ = _IFINFOMSG.unpack_from(body)
+    attrs = parse_attrs(body[_IFINFOMSG.size:])
+    link = {'flags': flags}
+    if IFLA_OPERSTATE in attrs:
+        state = attrs[IFLA_OPERSTATE][0]
+        link['operstate'] = OPERSTATES[state] if state < len(OPERSTATES) else 'unknown'
+    if IFLA_MTU in attrs:
+        link['mtu'] = struct.unpack('=I', attrs[IFLA_MTU][:4])[0]
+    if IFLA_ADDRESS in attrs:
+        link['address'] = ':'.join('{0:02x}'.format(b) for b in attrs[IFLA_ADDRESS])
+    link['alias'] = attrs.get(IFLA_IFALIAS, b'').rstrip(b'\0').decode()
+    return link
+
+def _addr_request(cmd, type, flags, ifname, addr):
+    interface = ipaddress.ip_interface(addr)
+    family = socket.AF_INET if interface.version == 4 else socket.AF_INET6
+    packed = interface.ip.packed
+    payload = _IFADDRMSG.pack(family, interface.network.prefixlen, 0, 0, ifindex(ifname))
+    payload += attr(IFA_LOCAL, packed) + attr(IFA_ADDRESS, packed)
+    return Request('{0} {1} dev {2}'.format(cmd, addr, ifname), type, flags, payload)
+
+def addr_add_request(ifname, addr):
+    """ Add an address, e.g. "192.0.2.1/24", as ``ip addr add`` """
+    return _addr_request('addr add', RTM_NEWADDR, NLM_F_CREATE | NLM_F_EXCL, ifname, addr)
+
+def addr_add(ifname, addr):
+    get_socket().request(*addr_add_request(ifname, addr))
+
+def addr_del_request(ifname, addr):
+    """ Delete an address, as ``ip addr del`` """
+    return _addr_request('addr del', RTM_DELADDR, 0, ifname, addr)
+
+def addr_del(ifname, addr):
+    get_socket().request(*addr_del_request(ifname, addr))
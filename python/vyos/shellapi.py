@@ -0,0 +1,191 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Runs config backend commands (``cli-shell-api``, ``my_set`` etc.) through
+a long-lived shell instead of forking the Python process for every call.
+
+One shell is started per process and session environment, the first time
+a command is run with that environment, so ``vyos.config.Config`` and
+``vyos.configsession.ConfigSession`` objects that use the same session
+share it. Commands are written to the shell one per line, and their output
+is terminated by a line with a random marker and the exit code::
+
+    '/bin/cli-shell-api' 'exists' 'system' </dev/null; printf '\\n%s %d\\n' <marker> "$?"
+
+The shell still has to execute every command, but that is much cheaper than
+a fork of the Python interpreter, and there are no pipes to set up per call.
+
+If the shell cannot be started or dies before a command is sent, the command
+is run with ``subprocess`` instead. Setting the ``VYOS_CONFIG_BACKEND``
+environment variable to ``cli-shell-api`` disables the shell entirely.
+"""
+
+import os
+import shlex
+import threading
+import subprocess
+
+SHELL = '/bin/sh'
+
+_coprocesses = {}
+_coprocesses_lock = threading.Lock()
+
+# Commands run by this process, by name, for monitoring
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def _legacy():
+    return os.environ.get('VYOS_CONFIG_BACKEND') == 'cli-shell-api'
+
+def _popen(cmd, env, stderr):
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                         stderr=(subprocess.STDOUT if stderr else None), env=env)
+    out = p.stdout.read()
+    p.wait()
+    return (p.returncode, out)
+
+
+class ShellNotAvailable(Exception):
+    """ Raised when the shell is not running, the command was not sent """
+    pass
+
+
+class Coprocess(object):
+    """
+    A shell that runs commands read from a pipe, in a fixed environment.
+
+    Args:
+        env (dict): environment of the shell and the commands it runs,
+            the environment of the current process if None
+    """
+    def __init__(self, env=None):
+        self._marker = 'VYOS-SHELLAPI-{0}'.format(os.urandom(8).hex()).encode()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._proc = subprocess.Popen([SHELL], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      env=env, close_fds=True)
+
+    def alive(self):
+        # A shell inherited over fork() is shared with the parent process
+        return self._pid == os.getpid() and self._proc.poll() is None
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+        try:
+            self._proc.stdin.close()
+            self._proc.wait()
+        except OSError:
+            pass
+
+    def run(self, cmd, stderr=False):
+        """
+        Run a command and wait for it to finish.
+
+        Args:
+            cmd (str list): argv of the command
+            stderr (bool): include stderr in the output, otherwise it goes
+                to the stderr of the current process
+
+        Returns:
+            (int, bytes): exit code and output of the command
+
+        Raises:
+            ShellNotAvailable: if the command could not be sent to the shell
+        """
+        line = ' '.join(shlex.quote(arg) for arg in cmd) + ' </dev/null'
+        if stderr:
+            line += ' 2>&1'
+        line += "; printf '\\n%s %d\\n' {0} \"$?\"\n".format(self._marker.decode())
+
+        with self._lock:
+            try:
+                self._proc.stdin.write(line.encode())
+                self._proc.stdin.flush()
+            except OSError:
+                raise ShellNotAvailable()
+            return self._read_result()
+
+    def _read_result(self):
+        fd = self._proc.stdout.fileno()
+        marker = b'\n' + self._marker + b' '
+        buf = b''
+        pos = -1
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                # The shell died while running the command
+                return (127, buf)
+            searched = len(buf)
+            buf += chunk
+            if pos < 0:
+                # The marker may be split between reads
+                pos = buf.find(marker, max(0, searched - len(marker) + 1))
+            # Once found, wait for the rest of the exit code line
+            if pos >= 0 and buf.endswith(b'\n') and pos + len(marker) < len(buf):
+                code = buf[pos + len(marker):].strip()
+                return (int(code), buf[:pos])
+
+
+def _get_coprocess(env):
+    key = frozenset((env if env is not None else os.environ).items())
+    # The HTTP API runs commands from several threads
+    with _coprocesses_lock:
+        coproc = _coprocesses.get(key)
+        if coproc is None or not coproc.alive():
+            coproc = Coprocess(env=dict(env if env is not None else os.environ))
+            _coprocesses[key] = coproc
+        return coproc
+
+def run(cmd, env=None, stderr=False):
+    """
+    Run a config backend command in the shell for the given environment.
+
+    Args:
+        cmd (str list): argv of the command
+        env (dict): session environment, the environment of the current
+            process if None
+        stderr (bool): include stderr in the output
+
+    Returns:
+        (int, bytes): exit code and output of the command
+    """
+    name = os.path.basename(cmd[0])
+    with _counts_lock:
+        _counts[name] = _counts.get(name, 0) + 1
+
+    if _legacy():
+        return _popen(cmd, env, stderr)
+    try:
+        return _get_coprocess(env).run(cmd, stderr=stderr)
+    except (OSError, ShellNotAvailable):
+        return _popen(cmd, env, stderr)
+
+def command_counts():
+    """
+    Returns:
+        dict: the number of commands run by this process, by command name
+    """
+    with _counts_lock:
+        return dict(_counts)
+
+def close():
+    """ Stop all shells started by this process """
+    with _coprocesses_lock:
+        for coproc in _coprocesses.values():
+            coproc.close()
+        _coprocesses.clear()
@@ -0,0 +1,115 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compiled Jinja2 templates for config and op mode scripts.
+
+``get_template(source, **options)`` is a drop-in replacement for
+``jinja2.Template(source, **options)``. A template is compiled once per
+process, and the compiled code is loaded from a bytecode cache built at
+package build time by ``scripts/build-template-cache``, so most scripts
+never run the Jinja2 compiler at all.
+
+Templates are identified by a digest of their source and options. If a
+template is not in the cache, or was compiled by another Python version,
+it is compiled from source as usual.
+"""
+
+import os
+import hashlib
+
+import jinja2
+
+from vyos.defaults import directories
+
+CACHE_DIR = os.path.join(directories['data'], 'template-cache')
+
+# The bytecode cache, False if there is none
+_cache = None
+_environments = {}
+_templates = {}
+
+
+class _SourceLoader(jinja2.BaseLoader):
+    """ Loads templates from sources registered by their names """
+    def __init__(self):
+        self.sources = {}
+
+    def get_source(self, environment, name):
+        if name not in self.sources:
+            raise jinja2.TemplateNotFound(name)
+        # Sources never change, templates are always up to date
+        return (self.sources[name], None, lambda: True)
+
+
+class _ReadOnlyBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """ The cache is built with the package, it's not written at run time """
+    def dump_bytecode(self, bucket):
+        pass
+
+
+def template_name(source, options):
+    """ Returns: the name of a template in the cache """
+    key = repr(sorted(options.items())) + '\n' + source
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _environment(options, cache):
+    key = (id(cache), tuple(sorted(options.items())))
+    if key not in _environments:
+        _environments[key] = jinja2.Environment(loader=_SourceLoader(), bytecode_cache=cache,
+                                                auto_reload=False, cache_size=-1, **options)
+    return _environments[key]
+
+def _load(source, options, cache):
+    env = _environment(options, cache)
+    name = template_name(source, options)
+    env.loader.sources[name] = source
+    return env.get_template(name)
+
+def _default_cache():
+    global _cache
+    if _cache is None:
+        if os.path.isdir(CACHE_DIR):
+            _cache = _ReadOnlyBytecodeCache(CACHE_DIR)
+        else:
+            _cache = False
+    return _cache or None
+
+def get_template(source, **options):
+    """
+    Args:
+        source (str): template source
+        options: Jinja2 environment options, e.g. ``trim_blocks=True``
+
+    Returns:
+        jinja2.Template: the compiled template
+    """
+    key = (source, tuple(sorted(options.items())))
+    if key not in _templates:
+        _templates[key] = _load(source, options, _default_cache())
+    return _templates[key]
+
+def build_cache(templates, cache_dir):
+    """
+    Compile templates and write them to a bytecode cache.
+
+    Args:
+        templates (list): (source, options) pairs
+        cache_dir (str): cache directory, created if it doesn't exist
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache = jinja2.FileSystemBytecodeCache(cache_dir)
+    for source, options in templates:
+        _load(source, options, cache)
@@ -0,0 +1,304 @@
+# Copyright 2019 VyOS maintainers and contributors <maintainers@vyos.io>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Opt-in tracing of config backend calls and external commands.
+
+Tracing is enabled by creating a flag file, owned by root::
+
+    vyos@vyos# sudo touch /run/vyos.trace
+
+While it exists, every process that imports this module records config
+backend queries (``Config._run``), config session commands
+(``ConfigSession.__run_command``), netlink requests, ``os.system`` and all
+``subprocess`` commands, which includes ``Interface._cmd``, with their
+command name, start time and duration. Arguments are not recorded, they
+can hold values such as passwords and keys. Config backend calls are
+recorded with their operation and config path, but the path ends with
+"..." where the node index doesn't know it, which is where values of
+leaf nodes and comments start.
+
+At exit, the events are appended to a trace file for the commit the process
+belongs to, ``/run/vyos-trace/<commit>.json``, in the Chrome trace event
+format (it can be opened in chrome://tracing). Processes that do not run
+under a commit write to ``/run/vyos-trace/pid-<pid>.json`` instead. Only
+processes running as root write trace files, and only to a directory owned
+by root, without following symlinks.
+Use ``show system commit-trace`` to summarize them.
+"""
+
+import os
+import sys
+import stat
+import json
+import time
+import fcntl
+import atexit
+import functools
+import threading
+import subprocess
+
+import vyos.configindex
+
+TRACE_FLAG = '/run/vyos.trace'
+TRACE_DIR = '/run/vyos-trace'
+
+# Names of the processes that run conf_mode scripts during a commit
+COMMIT_PROCESSES = ['my_commit', 'vyatta-cfg-cmd-wrapper', 'vyos-boot-config-loader.py']
+
+# Event categories of config backend calls
+BACKEND_CATEGORIES = ['config', 'session']
+
+
+def _owned_by_root(path):
+    """ Returns: whether path exists, is not a symlink and is owned by root """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return not stat.S_ISLNK(st.st_mode) and st.st_uid == 0
+
+def flag_set():
+    """ Returns: whether the flag file enabling tracing is in place """
+    return _owned_by_root(TRACE_FLAG)
+
+_enabled = flag_set()
+_events = []
+
+# Process the current one runs a script for, see run_for()
+_caller = None
+
+
+def enabled():
+    return _enabled
+
+def _now():
+    return int(time.time() * 1000000)
+
+def _script():
+    return os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python3'
+
+def _name(cmd):
+    """ Returns: the name of a command, without its arguments """
+    if isinstance(cmd, (list, tuple)):
+        cmd = str(cmd[0]) if cmd else ''
+    words = str(cmd).split()
+    return os.path.basename(words[0]) if words else ''
+
+def _backend_name(cmd):
+    """
+    Returns: the operation and the config path of a config backend command,
+    e.g. "returnValue system host-name" or "my_set system name-server ..."
+    """
+    words = [str(w) for w in cmd]
+    op = os.path.basename(words[0]) if words else ''
+    args = [w for w in words[1:] if not w.startswith('--')]
+    if op == 'cli-shell-api' and args:
+        op, args = args[0], args[1:]
+
+    index = vyos.configindex.load()
+    path = []
+    for word in args:
+        entry = index.lookup(path + [word])
+        if entry is None:
+            break
+        path.append(word)
+        if entry['type'] == 'leaf':
+            break
+    if len(path) < len(args):
+        path.append('...')
+    return ' '.join([op] + path)
+
+def add_event(category, cmd, start, duration):
+    """
+    Record a completed call.
+
+    Args:
+        category (str): kind of call, e.g. "config" or "subprocess"
+        cmd (str or str list): the command, only its name is recorded,
+            and for config backend calls the config path without values
+        start (int): start time, in microseconds since the epoch
+        duration (int): wall time, in microseconds
+    """
+    if category in BACKEND_CATEGORIES:
+        name = _backend_name(cmd)
+    else:
+        name = _name(cmd)
+    _events.append({
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': start,
+        'dur': duration,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': {'script': _script()}
+    })
+
+def traced(category):
+    """
+    Decorator for functions and methods whose first argument (after self)
+    is the command they run. A no-op unless tracing is enabled.
+    """
+    def decorator(func):
+        if not _enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cmd = args[1] if len(args) > 1 else kwargs.get('cmd', '')
+            start = _now()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_event(category, cmd, start, _now() - start)
+        return wrapper
+    return decorator
+
+
+def run_for(pid):
+    """
+    Trace the current process as if it were process pid, for forked workers
+    that run scripts on behalf of other processes, e.g. vyos-configd. Their
+    events go to the trace of the commit that process runs under, and the
+    events inherited over the fork are dropped, the parent records them.
+    """
+    global _caller, _events
+    _caller = pid
+    _events = []
+
+def commit_process(pid=None):
+    """
+    Returns:
+        psutil.Process: the commit process that process pid (the current
+        process if None) runs under, None if there is none
+    """
+    try:
+        import psutil
+        proc = psutil.Process(pid).parent()
+        while proc is not None and proc.pid > 1:
+            if proc.name() in COMMIT_PROCESSES:
+                return proc
+            proc = proc.parent()
+    except Exception:
+        pass
+    return None
+
+def _commit_id():
+    """ ID of the commit the current process runs under, None if there is none """
+    proc = commit_process(_caller)
+    if proc is None:
+        return None
+    try:
+        return '{0}-{1}'.format(int(proc.create_time()), proc.pid)
+    except Exception:
+        return None
+
+def trace_file():
+    """ Returns: the trace file of the current process """
+    commit = _commit_id()
+    if commit is None:
+        commit = 'pid-{0}'.format(os.getpid())
+    return os.path.join(TRACE_DIR, commit + '.json')
+
+def flush():
+    """
+    Append the events recorded so far to the trace file.
+
+    Chrome accepts trace files in the JSON array format without the closing
+    bracket, so processes of the same commit can append to the file in turn.
+
+    Nothing is written by processes that do not run as root, if the
+    trace directory is not owned by root, or if the trace file is a symlink.
+    """
+    global _events
+    if not _events:
+        return
+    events, _events = _events, []
+
+    metadata = {'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                'args': {'name': _script()}}
+    data = ''.join(json.dumps(e) + ',\n' for e in [metadata] + events)
+
+    if os.geteuid() != 0:
+        return
+    try:
+        os.mkdir(TRACE_DIR, mode=0o755)
+    except FileExistsError:
+        pass
+    if not _owned_by_root(TRACE_DIR) or not os.path.isdir(TRACE_DIR):
+        return
+    try:
+        fd = os.open(trace_file(), os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_NOFOLLOW, 0o644)
+    except OSError:
+        # e.g. a symlink in place of the trace file
+        return
+    with os.fdopen(fd, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        if f.tell() == 0:
+            f.write('[\n')
+        f.write(data)
+
+def load(path):
+    """
+    Read a trace file written by flush()
+
+    Returns:
+        list: complete ("X") events
+    """
+    with open(path, 'r') as f:
+        data = f.read().strip()
+    if data.endswith(','):
+        data = data[:-1]
+    if not data.endswith(']'):
+        data += ']'
+    return [e for e in json.loads(data) if e.get('ph') == 'X']
+
+
+def _install():
+    _popen_init = subprocess.Popen.__init__
+    _popen_wait = subprocess.Popen.wait
+    _os_system = os.system
+
+    @functools.wraps(_popen_init)
+    def popen_init(self, args, *a, **kw):
+        self._vyos_trace = (args, _now())
+        _popen_init(self, args, *a, **kw)
+
+    @functools.wraps(_popen_wait)
+    def popen_wait(self, *a, **kw):
+        result = _popen_wait(self, *a, **kw)
+        trace = getattr(self, '_vyos_trace', None)
+        if trace is not None:
+            # call(), run(), check_output() etc. all end up here, once
+            self._vyos_trace = None
+            add_event('subprocess', trace[0], trace[1], _now() - trace[1])
+        return result
+
+    @functools.wraps(_os_system)
+    def system(command):
+        start = _now()
+        try:
+            return _os_system(command)
+        finally:
+            add_event('system', command, start, _now() - start)
+
+    subprocess.Popen.__init__ = popen_init
+    subprocess.Popen.wait = popen_wait
+    os.system = system
+    atexit.register(flush)
+
+if _enabled:
+    _install()
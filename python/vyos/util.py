@@ -15,9 +15,12 @@
 
 import os
 import re
+import json
 import getpass
 import grp
 import time
+import hashlib
+import tempfile
 import subprocess
 import sys
 
@@ -32,6 +35,111 @@ def read_file(path):
         data = f.read().strip()
     return data
 
+def file_digest(path):
+    """ SHA-256 digest of the contents of a file, None if it doesn't exist """
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def write_file_if_changed(path, data, mode=None):
+    """
+    Write data to a file, unless the file already has exactly that content.
+
+    The new content is written to a temporary file in the same directory
+    that then replaces the old file, so a daemon that reads the file while
+    it's being written never sees it partially written. The mode, owner and
+    group of the old file are kept, unless a mode is given.
+
+    Returns:
+        True if the file was written, False if it was up to date
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    if file_digest(path) == hashlib.sha256(data).hexdigest():
+        return False
+
+    try:
+        old = os.stat(path)
+    except FileNotFoundError:
+        old = None
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.' + os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp, mode)
+        elif old is not None:
+            os.chmod(tmp, old.st_mode & 0o7777)
+        else:
+            # mkstemp creates files readable only by the owner
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp, 0o666 & ~umask)
+        if old is not None and (old.st_uid, old.st_gid) != (os.getuid(), os.getgid()):
+            os.chown(tmp, old.st_uid, old.st_gid)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return True
+
+def service_is_active(service):
+    """ Checks if a systemd unit is active (running) """
+    return subprocess.call(['systemctl', 'is-active', '--quiet', service]) == 0
+
+# Digests of the files services read besides their generated config,
+# as they were when the services were last started or reloaded
+SERVICE_FILES_DIR = '/run/vyos-service-files'
+
+def update_service(service, changed, reload=False, files=None):
+    """
+    Start a service that is not running, or reload or restart it if its
+    config changed, and leave it alone otherwise.
+
+    Args:
+        service (str): systemd unit name
+        changed (bool): if its config files were written
+        reload (bool): if the daemon can apply config changes on reload,
+            without dropping clients
+        files (list): paths of other files the daemon reads, e.g. its
+            certificates and keys, which are not written by the caller.
+            The config counts as changed if any of them changed since the
+            service was last started, reloaded or restarted here.
+
+    Returns:
+        str: the action taken, "start", "reload" or "restart", None if nothing was done
+    """
+    digests = None
+    if files:
+        digests = dict((path, file_digest(path)) for path in files)
+        state = os.path.join(SERVICE_FILES_DIR, service + '.json')
+        try:
+            with open(state, 'r') as f:
+                changed = changed or json.load(f) != digests
+        except (OSError, ValueError):
+            changed = True
+
+    if not service_is_active(service):
+        action = 'start'
+    elif not changed:
+        return None
+    elif reload:
+        action = 'reload'
+    else:
+        action = 'restart'
+    subprocess.call(['sudo', 'systemctl', action, service])
+
+    if digests is not None:
+        os.makedirs(SERVICE_FILES_DIR, exist_ok=True)
+        write_file_if_changed(state, json.dumps(digests, sort_keys=True))
+    return action
+
 def colon_separated_to_dict(data_string, uniquekeys=False):
     """ Converts a string containing newline-separated entries
         of colon-separated key-value pairs into a dict.
@@ -46,65 +46,215 @@ def is_ipv6(addr):
     else:
         return False
 
-def is_intf_addr_assigned(intf, addr):
+def _prefixlen(addr_type, netmask):
     """
-    Verify if the given IPv4/IPv6 address is assigned to specific interface.
-    It can check both a single IP address (e.g. 192.0.2.1 or a assigned CIDR
-    address 192.0.2.1/24.
+    Prefix length of a netmask as netifaces shows it
+    """
+    if addr_type == netifaces.AF_INET6:
+        # Note that currently expanded netmasks are not supported. That means
+        # 2001:db00::0/24 is a valid argument while 2001:db00::0/ffff:ff00:: not.
+        # see https://docs.python.org/3/library/ipaddress.html
+        # netifaces may append the prefix length, "ffff:ffff::/32"
+        return bin(int(netmask.split('/')[0].replace(':', ''), 16)).count('1')
+    return ipaddress.IPv4Network('0.0.0.0/' + netmask).prefixlen
+
+
+class _Node(object):
+    """
+    Node of the prefix trie of an AddressSnapshot: the number of addresses,
+    and of primary addresses, in the prefix, and at the full length, the
+    interfaces with the address as [interface, prefix length, primary]
+    """
+    __slots__ = ['children', 'count', 'primary', 'entries']
+
+    def __init__(self):
+        self.children = [None, None]
+        self.count = 0
+        self.primary = 0
+        self.entries = []
+
+
+class AddressSnapshot(object):
     """
+    The IPv4 and IPv6 addresses of all interfaces, or of the given ones,
+    read once with netifaces and indexed in a binary prefix trie per address
+    family. Whether an address is assigned, or a subnet connected, is then
+    known after looking at as many nodes as the address, or the subnet's
+    prefix, has bits, whatever the number of interfaces and addresses.
+
+    The primary address of an interface is its first address of a family.
+
+    Example:
+    >>> from vyos.validate import AddressSnapshot
+    >>> addresses = AddressSnapshot()
+    >>> addresses.is_addr_assigned('127.0.0.1')
+    True
+    >>> addresses.is_subnet_connected('127.0.0.0/8', primary=True)
+    True
+    """
+    def __init__(self, interfaces=None):
+        self._roots = {4: _Node(), 6: _Node()}
+        # addresses by interface and IP version, in the order netifaces
+        # shows them
+        self._addrs = {}
+
+        if interfaces is None:
+            interfaces = netifaces.interfaces()
+
+        for intf in interfaces:
+            try:
+                addresses = netifaces.ifaddresses(intf)
+            except ValueError:
+                # no such interface, or gone already
+                continue
+
+            for addr_type in [netifaces.AF_INET, netifaces.AF_INET6]:
+                for ip in addresses.get(addr_type, []):
+                    # remove interface extension (e.g. %eth0) that gets thrown
+                    # on the end of _some_ addrs
+                    addr = ip['addr'].split('%')[0]
+                    self.add(intf, '{}/{}'.format(addr, _prefixlen(addr_type, ip['netmask'])))
+
+    def _find(self, ip, prefixlen, create=False):
+        """ Returns: _Node: the node of a prefix, None if there is none """
+        node = self._roots[ip.version]
+        value = int(ip)
+        for i in range(prefixlen):
+            bit = (value >> (ip.max_prefixlen - 1 - i)) & 1
+            if node.children[bit] is None:
+                if not create:
+                    return None
+                node.children[bit] = _Node()
+            node = node.children[bit]
+        return node
+
+    def _count(self, ip, count, primary):
+        node = self._roots[ip.version]
+        value = int(ip)
+        for i in range(ip.max_prefixlen + 1):
+            node.count += count
+            node.primary += primary
+            if i == ip.max_prefixlen:
+                break
+            bit = (value >> (ip.max_prefixlen - 1 - i)) & 1
+            child = node.children[bit]
+            if child.count + count == 0:
+                # nothing left in the prefix
+                node.children[bit] = None
+                break
+            node = child
+
+    def _insert(self, intf, interface, primary):
+        leaf = self._find(interface.ip, interface.max_prefixlen, create=True)
+        leaf.entries.append([intf, interface.network.prefixlen, primary])
+        self._count(interface.ip, 1, int(primary))
+
+    def _delete(self, intf, interface):
+        leaf = self._find(interface.ip, interface.max_prefixlen)
+        for entry in leaf.entries:
+            if entry[:2] == [intf, interface.network.prefixlen]:
+                leaf.entries.remove(entry)
+                self._count(interface.ip, -1, -int(entry[2]))
+                return
+
+    def add(self, intf, addr):
+        """
+        Add an address, e.g. "192.0.2.1/24", of an interface to the snapshot,
+        after assigning it
+        """
+        interface = ipaddress.ip_interface(addr)
+        addrs = self._addrs.setdefault(intf, {4: [], 6: []})[interface.version]
+        if interface in addrs:
+            return
+        addrs.append(interface)
+        self._insert(intf, interface, primary=len(addrs) == 1)
+
+    def remove(self, intf, addr):
+        """
+        Remove an address of an interface from the snapshot, after deleting it.
+        The next address of the interface becomes the primary one. The kernel
+        only does that with promote_secondaries set, by default deleting a
+        primary IPv4 address deletes the secondary addresses of its subnet
+        too, so take a new snapshot after deleting IPv4 addresses.
+        """
+        interface = ipaddress.ip_interface(addr)
+        addrs = self._addrs.get(intf, {4: [], 6: []})[interface.version]
+        if interface not in addrs:
+            return
+        self._delete(intf, interface)
+        if addrs.index(interface) == 0 and len(addrs) > 1:
+            self._delete(intf, addrs[1])
+            self._insert(intf, addrs[1], primary=True)
+        addrs.remove(interface)
 
-    # determine IP version (AF_INET or AF_INET6) depending on passed address
-    addr_type = netifaces.AF_INET
-    if is_ipv6(addr):
-        addr_type = netifaces.AF_INET6
+    def get_addr(self, intf):
+        """
+        Returns:
+            list: the addresses of an interface, e.g. "192.0.2.1/24", IPv4
+            addresses first
+        """
+        addrs = self._addrs.get(intf, {4: [], 6: []})
+        return [str(interface) for interface in addrs[4] + addrs[6]]
 
-    # check if the requested address type is configured at all
-    try:
-        netifaces.ifaddresses(intf)
-    except ValueError as e:
-        print(e)
+    def is_intf_addr_assigned(self, intf, addr):
+        """
+        Verify if the given IPv4/IPv6 address is assigned to specific interface.
+        It can check both a single IP address (e.g. 192.0.2.1 or a assigned CIDR
+        address 192.0.2.1/24.
+        """
+        return self._is_assigned(addr, intf)
+
+    def is_addr_assigned(self, addr):
+        """
+        Verify if the given IPv4/IPv6 address is assigned to any interface
+        """
+        return self._is_assigned(addr)
+
+    def _is_assigned(self, addr, intf=None):
+        prefixlen = None
+        if r'/' in addr:
+            interface = ipaddress.ip_interface(addr)
+            ip, prefixlen = interface.ip, interface.network.prefixlen
+        else:
+            ip = ipaddress.ip_address(addr)
+
+        leaf = self._find(ip, ip.max_prefixlen)
+        if leaf is None:
+            return False
+        for entry_intf, entry_prefixlen, _ in leaf.entries:
+            if intf in [None, entry_intf] and prefixlen in [None, entry_prefixlen]:
+                return True
         return False
 
-    if addr_type in netifaces.ifaddresses(intf).keys():
-        # Check every IP address on this interface for a match
-        for ip in netifaces.ifaddresses(intf)[addr_type]:
-            # Check if it matches to the address requested
-            # If passed address contains a '/' indicating a normalized IP
-            # address we have to take this into account, too
-            if r'/' in addr:
-                prefixlen = ''
-                if is_ipv6(addr):
-                     # Note that currently expanded netmasks are not supported. That means
-                     # 2001:db00::0/24 is a valid argument while 2001:db00::0/ffff:ff00:: not.
-                     # see https://docs.python.org/3/library/ipaddress.html
-                     bits =  bin( int(ip['netmask'].replace(':',''), 16) ).count('1')
-                     prefixlen = '/' + str(bits)
-
-                else:
-                     prefixlen = '/' + str(ipaddress.IPv4Network('0.0.0.0/' + ip['netmask']).prefixlen)
-
-                # construct temporary variable holding IPv6 address and netmask
-                # in CIDR notation
-                tmp = ip['addr'] + prefixlen
-                if addr == tmp:
-                    return True
-
-            elif ip['addr'] == addr:
-                    return True
-
-    return False
+    def is_subnet_connected(self, subnet, primary=False):
+        """
+        Verify is the given IPv4/IPv6 subnet is connected to any interface on
+        this system, see vyos.validate.is_subnet_connected.
+        """
+        network = ipaddress.ip_network(subnet)
+        node = self._find(network.network_address, network.prefixlen)
+        if node is None:
+            return False
+        return (node.primary if primary else node.count) > 0
 
-def is_addr_assigned(addr):
+
+def is_intf_addr_assigned(intf, addr):
     """
-    Verify if the given IPv4/IPv6 address is assigned to any interface
+    Verify if the given IPv4/IPv6 address is assigned to specific interface.
+    It can check both a single IP address (e.g. 192.0.2.1 or a assigned CIDR
+    address 192.0.2.1/24.
+
+    To check many addresses, use an AddressSnapshot.
     """
+    return AddressSnapshot([intf]).is_intf_addr_assigned(intf, addr)
 
-    for intf in netifaces.interfaces():
-        tmp = is_intf_addr_assigned(intf, addr)
-        if tmp == True:
-            return True
+def is_addr_assigned(addr):
+    """
+    Verify if the given IPv4/IPv6 address is assigned to any interface
 
-    return False
+    To check many addresses, use an AddressSnapshot.
+    """
+    return AddressSnapshot().is_addr_assigned(addr)
 
 def is_subnet_connected(subnet, primary=False):
     """
@@ -115,32 +265,8 @@ def is_subnet_connected(subnet, primary=False):
     interface, or in other words has a broadcast address configured. ISC DHCP
     for instance will complain if it should listen on non broadcast interfaces.
 
+    To check many subnets, use an AddressSnapshot.
+
     Return True/False
     """
-
-    # determine IP version (AF_INET or AF_INET6) depending on passed address
-    addr_type = netifaces.AF_INET
-    if is_ipv6(subnet):
-        addr_type = netifaces.AF_INET6
-
-    for interface in netifaces.interfaces():
-        # check if the requested address type is configured at all
-        if addr_type not in netifaces.ifaddresses(interface).keys():
-            continue
-
-        # An interface can have multiple addresses, but some software components
-        # only support the primary address :(
-        if primary:
-            ip = netifaces.ifaddresses(interface)[addr_type][0]['addr']
-            if ipaddress.ip_address(ip) in ipaddress.ip_network(subnet):
-                return True
-        else:
-            # Check every assigned IP address if it is connected to the subnet
-            # in question
-            for ip in netifaces.ifaddresses(interface)[addr_type]:
-                # remove interface extension (e.g. %eth0) that gets thrown on the end of _some_ addrs
-                addr = ip['addr'].split('%')[0]
-                if ipaddress.ip_address(addr) in ipaddress.ip_network(subnet):
-                    return True
-
-    return False
+    return AddressSnapshot().is_subnet_connected(subnet, primary)
@@ -20,13 +20,13 @@ import sys
 import os
 import re
 import subprocess
-import jinja2
 import socket
 import time
 import syslog as sl
 
 from vyos.config import Config
 from vyos import ConfigError
+from vyos.template import get_template
 
 pidfile = r'/var/run/accel_pptp.pid'
 pptp_cnf_dir = r'/etc/accel-ppp/pptp'
@@ -159,7 +159,7 @@ def chk_con():
 
 ### chap_secrets file if auth mode local
 def write_chap_secrets(c):
-  tmpl = jinja2.Template(chap_secrets_conf, trim_blocks=True)
+  tmpl = get_template(chap_secrets_conf, trim_blocks=True)
   chap_secrets_txt = tmpl.render(c)
   old_umask = os.umask(0o077)
   open(chap_secrets,'w').write(chap_secrets_txt)
@@ -324,7 +324,7 @@ def generate(c):
     else:
       c['thread_cnt'] = int(os.cpu_count()/2)
 
-  tmpl = jinja2.Template(pptp_config, trim_blocks=True)
+  tmpl = get_template(pptp_config, trim_blocks=True)
   config_text = tmpl.render(c)
   open(pptp_conf,'w').write(config_text)
 
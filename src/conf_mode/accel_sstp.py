@@ -20,13 +20,13 @@ import sys
 import os
 import re
 import subprocess
-import jinja2
 import socket
 import time
 import syslog as sl
 
 from vyos.config import Config
 from vyos import ConfigError
+from vyos.template import get_template
 
 pidfile = r'/var/run/accel_sstp.pid'
 sstp_cnf_dir = r'/etc/accel-ppp/sstp'
@@ -206,7 +206,7 @@ def chk_con():
 
 ### chap_secrets file if auth mode local
 def write_chap_secrets(c):
-  tmpl = jinja2.Template(chap_secrets_conf, trim_blocks=True)
+  tmpl = get_template(chap_secrets_conf, trim_blocks=True)
   chap_secrets_txt = tmpl.render(c)
   old_umask = os.umask(0o077)
   open(chap_secrets,'w').write(chap_secrets_txt)
@@ -431,7 +431,7 @@ def generate(c):
     else:
       c['thread_cnt'] = int(os.cpu_count()/2)
 
-  tmpl = jinja2.Template(sstp_config, trim_blocks=True)
+  tmpl = get_template(sstp_config, trim_blocks=True)
   config_text = tmpl.render(c)
   open(sstp_conf,'w').write(config_text)
 
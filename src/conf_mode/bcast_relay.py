@@ -19,10 +19,10 @@
 import sys
 import os
 import fnmatch
-import jinja2
 
 from vyos.config import Config
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/default/udp-broadcast-relay'
 
@@ -148,7 +148,7 @@ def generate(relay):
 
         # configuration filename contains instance id
         file = config_file + str(r['id'])
-        tmpl = jinja2.Template(config_tmpl)
+        tmpl = get_template(config_tmpl)
         config_text = tmpl.render(r)
         with open(file, 'w') as f:
             f.write(config_text)
@@ -18,10 +18,10 @@
 
 import sys
 import os
-import jinja2
 
 from vyos.config import Config
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/default/isc-dhcp-relay'
 
@@ -124,7 +124,7 @@ def generate(relay):
     if relay is None:
         return None
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render(relay)
     with open(config_file, 'w') as f:
         f.write(config_text)
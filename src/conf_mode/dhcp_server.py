@@ -16,7 +16,6 @@
 
 import sys
 import os
-import jinja2
 import socket
 import struct
 
@@ -24,7 +23,9 @@ import vyos.validate
 
 from ipaddress import ip_address, ip_network
 from vyos.config import Config
+from vyos.util import write_file_if_changed, update_service
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/dhcp/dhcpd.conf'
 lease_file = r'/config/dhcpd.leases'
@@ -666,6 +667,8 @@ def verify(dhcp):
     failover_names = []
     listen_ok = False
     subnets = []
+    # interface addresses, read once for all subnets
+    addresses = vyos.validate.AddressSnapshot()
 
     # A shared-network requires a subnet definition
     for network in dhcp['shared_network']:
@@ -775,7 +778,7 @@ def verify(dhcp):
             # There must be one subnet connected to a listen interface.
             # This only counts if the network itself is not disabled!
             if not network['disabled']:
-                if vyos.validate.is_subnet_connected(subnet['network'], primary=True):
+                if addresses.is_subnet_connected(subnet['network'], primary=True):
                     listen_ok = True
 
             # Subnets must be non overlapping
@@ -807,20 +810,21 @@ def generate(dhcp):
         print('Warning: DHCP server will be deactivated because it is disabled')
         return None
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render(dhcp)
 
     # Please see: https://phabricator.vyos.net/T1129 for quoting of the raw parameters
     # we can pass to ISC DHCPd
     config_text = config_text.replace("&quot;",'"')
 
-    with open(config_file, 'w') as f:
-        f.write(config_text)
+    changed = write_file_if_changed(config_file, config_text)
 
-    tmpl = jinja2.Template(daemon_tmpl)
+    tmpl = get_template(daemon_tmpl)
     config_text = tmpl.render(dhcp)
-    with open(daemon_config_file, 'w') as f:
-        f.write(config_text)
+    changed = write_file_if_changed(daemon_config_file, config_text) or changed
+
+    # Restarting dhcpd drops all requests in flight, only do it when needed
+    dhcp['config_changed'] = changed
 
     return None
 
@@ -837,7 +841,7 @@ def apply(dhcp):
         if not os.path.exists(lease_file):
             os.mknod(lease_file)
 
-        os.system('sudo systemctl restart isc-dhcp-server.service')
+        update_service('isc-dhcp-server.service', dhcp['config_changed'])
 
     return None
 
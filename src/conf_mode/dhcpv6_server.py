@@ -20,12 +20,12 @@ import sys
 import os
 import ipaddress
 
-import jinja2
-
 import vyos.validate
 
 from vyos.config import Config
+from vyos.util import write_file_if_changed, update_service
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/dhcp/dhcpdv6.conf'
 lease_file = r'/config/dhcpdv6.leases'
@@ -328,6 +328,8 @@ def verify(dhcpv6):
     # Inspect shared-network/subnet
     subnets = []
     listen_ok = False
+    # interface addresses, read once for all subnets
+    addresses = vyos.validate.AddressSnapshot()
 
     for network in dhcpv6['shared_network']:
         # A shared-network requires a subnet definition
@@ -408,7 +410,7 @@ def verify(dhcpv6):
 
         # There must be one subnet connected to a listen interface if network is not disabled.
         if not network['disabled']:
-            if vyos.validate.is_subnet_connected(subnet['network']):
+            if addresses.is_subnet_connected(subnet['network']):
                 listen_ok = True
 
         # DHCPv6 subnet must not overlap. ISC DHCP also complains about overlapping
@@ -436,15 +438,15 @@ def generate(dhcpv6):
         print('Warning: DHCPv6 server will be deactivated because it is disabled')
         return None
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render(dhcpv6)
-    with open(config_file, 'w') as f:
-        f.write(config_text)
+    changed = write_file_if_changed(config_file, config_text)
 
-    tmpl = jinja2.Template(daemon_tmpl)
+    tmpl = get_template(daemon_tmpl)
     config_text = tmpl.render(dhcpv6)
-    with open(daemon_config_file, 'w') as f:
-        f.write(config_text)
+    changed = write_file_if_changed(daemon_config_file, config_text) or changed
+
+    dhcpv6['config_changed'] = changed
 
     return None
 
@@ -461,7 +463,7 @@ def apply(dhcpv6):
         if not os.path.exists(lease_file):
             os.mknod(lease_file)
 
-        os.system('sudo systemctl restart isc-dhcpv6-server.service')
+        update_service('isc-dhcpv6-server.service', dhcpv6['config_changed'])
 
     return None
 
@@ -20,7 +20,6 @@ import sys
 import os
 
 import argparse
-import jinja2
 import netifaces
 
 import vyos.util
@@ -28,6 +27,7 @@ import vyos.hostsd_client
 
 from vyos.config import Config
 from vyos import ConfigError
+from vyos.template import get_template
 
 
 parser = argparse.ArgumentParser()
@@ -202,10 +202,9 @@ def generate(dns):
     if dns is None:
         return None
 
-    tmpl = jinja2.Template(config_tmpl, trim_blocks=True)
+    tmpl = get_template(config_tmpl, trim_blocks=True)
     config_text = tmpl.render(dns)
-    with open(config_file, 'w') as f:
-        f.write(config_text)
+    dns['config_changed'] = vyos.util.write_file_if_changed(config_file, config_text)
     return None
 
 def apply(dns):
@@ -215,7 +214,8 @@ def apply(dns):
         if os.path.isfile(config_file):
             os.unlink(config_file)
     else:
-        os.system("systemctl restart pdns-recursor")
+        # Restarting the recursor flushes its cache, only do it when needed
+        vyos.util.update_service('pdns-recursor.service', dns['config_changed'])
 
 if __name__ == '__main__':
     args = parser.parse_args()
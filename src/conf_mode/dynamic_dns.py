@@ -18,10 +18,10 @@
 
 import os
 import sys
-import jinja2
 
 from vyos.config import Config
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/ddclient.conf'
 cache_file = r'/var/cache/ddclient/ddclient.cache'
@@ -237,7 +237,7 @@ def generate(dyndns):
     if dyndns is None:
         return None
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
 
     config_text = tmpl.render(dyndns)
     with open(config_file, 'w') as f:
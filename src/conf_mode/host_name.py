@@ -135,13 +135,15 @@ def apply(config):
     try:
         client = vyos.hostsd_client.Client()
 
-        client.set_host_name(config['hostname'], config['domain_name'], config['domain_search'])
+        # Sent in one message, vyos-hostsd never has the tag deleted but not added again
+        with client.batch() as batch:
+            batch.set_host_name(config['hostname'], config['domain_name'], config['domain_search'])
 
-        client.delete_name_servers(tag)
-        client.add_name_servers(tag, config['nameserver'])
+            batch.delete_name_servers(tag)
+            batch.add_name_servers(tag, config['nameserver'])
 
-        client.delete_hosts(tag)
-        client.add_hosts(tag, config['static_host_mapping'])
+            batch.delete_hosts(tag)
+            batch.add_hosts(tag, config['static_host_mapping'])
     except vyos.hostsd_client.VyOSHostsdError as e:
         raise ConfigError(str(e))
 
@@ -53,6 +53,22 @@ def get_config():
         port = conf.return_value('port')
         http_api['port'] = port
 
+    # Server tuning, the server has defaults for what is not set
+    if conf.exists('commit-window'):
+        http_api['commit_window'] = int(conf.return_value('commit-window')) / 1000
+
+    if conf.exists('snapshot-max-age'):
+        http_api['snapshot_max_age'] = int(conf.return_value('snapshot-max-age')) / 1000
+
+    if conf.exists('keepalive-timeout'):
+        http_api['keepalive_timeout'] = int(conf.return_value('keepalive-timeout'))
+
+    for pool in ['read', 'commit']:
+        for option in ['workers', 'queue-depth', 'timeout']:
+            if conf.exists('pool {0} {1}'.format(pool, option)):
+                key = '{0}_{1}'.format(pool, option.replace('-', '_'))
+                http_api[key] = int(conf.return_value('pool {0} {1}'.format(pool, option)))
+
     if conf.exists('keys'):
         for name in conf.list_nodes('keys id'):
             if conf.exists('keys id {0} key'.format(name)):
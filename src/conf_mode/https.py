@@ -19,11 +19,11 @@
 import sys
 import os
 
-import jinja2
-
 import vyos.defaults
 from vyos.config import Config
+from vyos.util import write_file_if_changed, update_service
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = '/etc/nginx/sites-available/default'
 
@@ -162,16 +162,19 @@ def generate(https):
     if https is None:
         return None
 
-    tmpl = jinja2.Template(config_tmpl, trim_blocks=True)
+    tmpl = get_template(config_tmpl, trim_blocks=True)
     config_text = tmpl.render(https)
-    with open(config_file, 'w') as f:
-        f.write(config_text)
+    https['config_changed'] = write_file_if_changed(config_file, config_text)
 
     return None
 
 def apply(https):
     if https is not None:
-        os.system('sudo systemctl restart nginx.service')
+        # A regenerated certificate doesn't change the config text
+        files = []
+        if 'vyos_cert' in https:
+            files = [https['vyos_cert'][f] for f in ['conf', 'crt', 'key']]
+        update_service('nginx.service', https['config_changed'], reload=True, files=files)
     else:
         os.system('sudo systemctl stop nginx.service')
 
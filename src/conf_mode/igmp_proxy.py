@@ -18,10 +18,11 @@
 
 import sys
 import os
-import jinja2
 
 from vyos.config import Config
+from vyos.util import write_file_if_changed, update_service
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/igmpproxy.conf'
 
@@ -150,10 +151,9 @@ def generate(igmp_proxy):
         print('Warning: IGMP Proxy will be deactivated because it is disabled')
         return None
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render(igmp_proxy)
-    with open(config_file, 'w') as f:
-        f.write(config_text)
+    igmp_proxy['config_changed'] = write_file_if_changed(config_file, config_text)
 
     return None
 
@@ -164,7 +164,7 @@ def apply(igmp_proxy):
          if os.path.exists(config_file):
              os.unlink(config_file)
     else:
-        os.system('sudo systemctl restart igmpproxy.service')
+        update_service('igmpproxy.service', igmp_proxy['config_changed'])
 
     return None
 
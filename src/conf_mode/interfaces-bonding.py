@@ -20,8 +20,8 @@ from copy import deepcopy
 from sys import exit
 from netifaces import interfaces
 
-from vyos.ifconfig import BondIf, VLANIf
-from vyos.configdict import list_diff, vlan_to_dict
+from vyos.ifconfig import BondIf, VLANIf, PlannedVLAN
+from vyos.configdict import vlan_to_dict, vlan_changed, vlan_parent_changed
 from vyos.config import Config
 from vyos import ConfigError
 
@@ -52,7 +52,8 @@ default_config_data = {
     'vif_s': [],
     'vif_s_remove': [],
     'vif': [],
-    'vif_remove': []
+    'vif_remove': [],
+    'vlan_parent_changed': False
 }
 
 
@@ -78,10 +79,10 @@ def get_bond_mode(mode):
 def apply_vlan_config(vlan, config):
     """
     Generic function to apply a VLAN configuration from a dictionary
-    to a VLAN interface
+    to a VLAN interface, or to plan it on a VLAN interface of a VLANPlan
     """
 
-    if type(vlan) != type(VLANIf("lo")):
+    if not isinstance(vlan, (VLANIf, PlannedVLAN)):
         raise TypeError()
 
     # get DHCP config dictionary and update values
@@ -163,14 +164,18 @@ def get_config():
     # set new configuration level
     conf.set_level(cfg_base)
 
+    # changes between the effective and the proposed config
+    diff = conf.get_config_diff()
+
     # retrieve configured interface addresses
     if conf.exists('address'):
         bond['address'] = conf.return_values('address')
 
-    # get interface addresses (currently effective) - to determine which
-    # address is no longer valid and needs to be removed
-    eff_addr = conf.return_effective_values('address')
-    bond['address_remove'] = list_diff(eff_addr, bond['address'])
+    # get interface addresses which are no longer valid and need to be removed
+    bond['address_remove'] = diff.deleted(cfg_base + ' address')
+
+    # VLAN interfaces need to be configured again for changes of the parent
+    bond['vlan_parent_changed'] = vlan_parent_changed(diff, cfg_base)
 
     # ARP link monitoring frequency in milliseconds
     if conf.exists('arp-monitor interval'):
@@ -250,31 +255,25 @@ def get_config():
 
     # re-set configuration level to parse new nodes
     conf.set_level(cfg_base)
-    # get vif-s interfaces (currently effective) - to determine which vif-s
-    # interface is no longer present and needs to be removed
-    eff_intf = conf.list_effective_nodes('vif-s')
-    act_intf = conf.list_nodes('vif-s')
-    bond['vif_s_remove'] = list_diff(eff_intf, act_intf)
+    # get vif-s interfaces which are no longer present and need to be removed
+    bond['vif_s_remove'] = diff.deleted(cfg_base + ' vif-s')
 
     if conf.exists('vif-s'):
         for vif_s in conf.list_nodes('vif-s'):
             # set config level to vif-s interface
             conf.set_level(cfg_base + ' vif-s ' + vif_s)
-            bond['vif_s'].append(vlan_to_dict(conf))
+            bond['vif_s'].append(vlan_to_dict(conf, diff))
 
     # re-set configuration level to parse new nodes
     conf.set_level(cfg_base)
-    # Determine vif interfaces (currently effective) - to determine which
-    # vif interface is no longer present and needs to be removed
-    eff_intf = conf.list_effective_nodes('vif')
-    act_intf = conf.list_nodes('vif')
-    bond['vif_remove'] = list_diff(eff_intf, act_intf)
+    # Determine vif interfaces which are no longer present and need to be removed
+    bond['vif_remove'] = diff.deleted(cfg_base + ' vif')
 
     if conf.exists('vif'):
         for vif in conf.list_nodes('vif'):
             # set config level to vif interface
             conf.set_level(cfg_base + ' vif ' + vif)
-            bond['vif'].append(vlan_to_dict(conf))
+            bond['vif'].append(vlan_to_dict(conf, diff))
 
     return bond
 
@@ -382,38 +381,35 @@ def apply(bond):
         # delete interface
         b.remove()
     else:
-        # Some parameters can not be changed when the bond is up.
-        # Always disable the bond prior changing anything
-        b.set_state('down')
-
-        # The bonding mode can not be changed when there are interfaces enslaved
-        # to this bond, thus we will free all interfaces from the bond first!
-        for intf in b.get_slaves():
-            b.del_port(intf)
+        # Settings are only changed where the kernel has other values, so
+        # that committing an unchanged configuration doesn't bounce the bond
+        r = b.reconciler()
 
         # ARP link monitoring frequency, reset miimon when arp-montior is inactive
         # this is done inside BondIf automatically
-        b.set_arp_interval(bond['arp_mon_intvl'])
+        r.set_arp_interval(bond['arp_mon_intvl'])
 
         # ARP monitor targets need to be synchronized between sysfs and CLI.
         # Unfortunately an address can't be send twice to sysfs as this will
         # result in the following exception:  OSError: [Errno 22] Invalid argument.
         #
-        # We remove ALL adresses prior adding new ones, this will remove addresses
-        # added manually by the user too - but as we are limited to 16 adresses
-        # from the kernel side this looks valid to me. We won't run into an error
-        # when a user added manual adresses which would result in having more
-        # then 16 adresses in total.
+        # We remove adresses no longer configured prior adding new ones, this
+        # will remove addresses added manually by the user too - but as we are
+        # limited to 16 adresses from the kernel side this looks valid to me.
+        # We won't run into an error when a user added manual adresses which
+        # would result in having more then 16 adresses in total.
         arp_tgt_addr = list(map(str, b.get_arp_ip_target().split()))
         for addr in arp_tgt_addr:
-            b.set_arp_ip_target('-' + addr)
+            if addr not in bond['arp_mon_tgt']:
+                r.set_arp_ip_target('-' + addr)
 
         # Add configured ARP target addresses
         for addr in bond['arp_mon_tgt']:
-            b.set_arp_ip_target('+' + addr)
+            if addr not in arp_tgt_addr:
+                r.set_arp_ip_target('+' + addr)
 
         # update interface description used e.g. within SNMP
-        b.set_alias(bond['description'])
+        r.set_alias(bond['description'])
 
         # get DHCP config dictionary and update values
         opt = b.get_dhcp_options()
@@ -443,54 +439,79 @@ def apply(bond):
         b.set_dhcpv6_options(opt)
 
         # ignore link state changes
-        b.set_link_detect(bond['disable_link_detect'])
+        r.set_link_detect(bond['disable_link_detect'])
         # Bonding transmit hash policy
-        b.set_hash_policy(bond['hash_policy'])
+        r.set_hash_policy(bond['hash_policy'])
         # configure ARP cache timeout in milliseconds
-        b.set_arp_cache_tmo(bond['ip_arp_cache_tmo'])
+        r.set_arp_cache_tmo(bond['ip_arp_cache_tmo'])
         # Enable proxy-arp on this interface
-        b.set_proxy_arp(bond['ip_proxy_arp'])
+        r.set_proxy_arp(bond['ip_proxy_arp'])
         # Enable private VLAN proxy ARP on this interface
-        b.set_proxy_arp_pvlan(bond['ip_proxy_arp_pvlan'])
+        r.set_proxy_arp_pvlan(bond['ip_proxy_arp_pvlan'])
 
         # Change interface MAC address
         if bond['mac']:
-            b.set_mac(bond['mac'])
+            r.set_mac(bond['mac'])
 
         # Bonding policy
-        b.set_mode(bond['mode'])
+        r.set_mode(bond['mode'])
         # Maximum Transmission Unit (MTU)
-        b.set_mtu(bond['mtu'])
+        r.set_mtu(bond['mtu'])
 
         # Primary device interface
         if bond['primary']:
-            b.set_primary(bond['primary'])
-
-        # Add (enslave) interfaces to bond
+            r.set_primary(bond['primary'])
+
+        # The bonding mode can not be changed when the bond is up or there are
+        # interfaces enslaved to this bond, thus we disable the bond and free
+        # all interfaces from the bond first - only when the mode changes
+        slaves = b.get_slaves()
+        if 'mode' in [setting for setting, _, _ in r.changes()]:
+            b.set_state('down')
+            for intf in slaves:
+                b.del_port(intf)
+            slaves = []
+            r.refresh()
+
+        # Free interfaces no longer part of the bond, add (enslave) new ones
+        for intf in slaves:
+            if intf not in bond['member']:
+                r.del_port(intf)
         for intf in bond['member']:
-            b.add_port(intf)
+            if intf not in slaves:
+                r.add_port(intf)
 
-        # As the bond interface is always disabled first when changing
-        # parameters we will only re-enable the interface if it is not
-        # administratively disabled
-        if not bond['disable']:
-            b.set_state('up')
+        # Enable/Disable interface, after a mode change the bond is disabled
+        # and is only re-enabled if it is not administratively disabled
+        if bond['disable']:
+            r.set_state('down')
+        else:
+            r.set_state('up')
 
         # Configure interface address(es)
         # - not longer required addresses get removed first
         # - newly addresses will be added second
         for addr in bond['address_remove']:
-            b.del_addr(addr)
+            r.del_addr(addr)
         for addr in bond['address']:
-            b.add_addr(addr)
+            r.add_addr(addr)
+
+        r.apply()
+
+        # All VLAN interfaces are changed at once, in a few batches
+        plan = b.plan()
 
         # remove no longer required service VLAN interfaces (vif-s)
         for vif_s in bond['vif_s_remove']:
-            b.del_vlan(vif_s)
+            plan.del_vlan(vif_s)
 
         # create service VLAN interfaces (vif-s)
         for vif_s in bond['vif_s']:
-            s_vlan = b.add_vlan(vif_s['id'], ethertype=vif_s['ethertype'])
+            # VLAN interfaces untouched by this commit are left alone
+            if not vlan_changed(bond['intf'], vif_s, bond['vlan_parent_changed']):
+                continue
+
+            s_vlan = plan.add_vlan(vif_s['id'], ethertype=vif_s['ethertype'])
             apply_vlan_config(s_vlan, vif_s)
 
             # remove no longer required client VLAN interfaces (vif-c)
@@ -506,13 +527,20 @@ def apply(bond):
 
         # remove no longer required VLAN interfaces (vif)
         for vif in bond['vif_remove']:
-            b.del_vlan(vif)
+            plan.del_vlan(vif)
 
         # create VLAN interfaces (vif)
         for vif in bond['vif']:
-            vlan = b.add_vlan(vif['id'])
+            if not vlan_changed(bond['intf'], vif, bond['vlan_parent_changed']):
+                continue
+
+            vlan = plan.add_vlan(vif['id'])
             apply_vlan_config(vlan, vif)
 
+        errors = plan.commit()
+        if errors:
+            raise ConfigError('\n'.join(error for _, error in errors))
+
     return None
 
 if __name__ == '__main__':
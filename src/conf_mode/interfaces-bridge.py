@@ -212,24 +212,26 @@ def apply(bridge):
         # delete interface
         br.remove()
     else:
-        # enable interface
-        br.set_state('up')
+        # Settings are only changed where the kernel has other values, so
+        # that committing an unchanged configuration doesn't bounce the link
+        r = br.reconciler()
+
         # set ageing time
-        br.set_ageing_time(bridge['aging'])
+        r.set_ageing_time(bridge['aging'])
         # set bridge forward delay
-        br.set_forward_delay(bridge['forwarding_delay'])
+        r.set_forward_delay(bridge['forwarding_delay'])
         # set hello time
-        br.set_hello_time(bridge['hello_time'])
+        r.set_hello_time(bridge['hello_time'])
         # set max message age
-        br.set_max_age(bridge['max_age'])
+        r.set_max_age(bridge['max_age'])
         # set bridge priority
-        br.set_priority(bridge['priority'])
+        r.set_priority(bridge['priority'])
         # turn stp on/off
-        br.set_stp(bridge['stp'])
+        r.set_stp(bridge['stp'])
         # enable or disable IGMP querier
-        br.set_multicast_querier(bridge['igmp_querier'])
+        r.set_multicast_querier(bridge['igmp_querier'])
         # update interface description used e.g. within SNMP
-        br.set_alias(bridge['description'])
+        r.set_alias(bridge['description'])
 
         # get DHCP config dictionary and update values
         opt = br.get_dhcp_options()
@@ -260,31 +262,35 @@ def apply(bridge):
 
         # Change interface MAC address
         if bridge['mac']:
-            br.set_mac(bridge['mac'])
+            r.set_mac(bridge['mac'])
 
         # remove interface from bridge
         for intf in bridge['member_remove']:
-            br.del_port( intf['name'] )
+            r.del_port( intf['name'] )
 
         # add interfaces to bridge
         for member in bridge['member']:
-            br.add_port(member['name'])
+            r.add_port(member['name'])
 
         # up/down interface
         if bridge['disable']:
-            br.set_state('down')
+            r.set_state('down')
+        else:
+            r.set_state('up')
 
         # Configure interface address(es)
         # - not longer required addresses get removed first
         # - newly addresses will be added second
         for addr in bridge['address_remove']:
-            br.del_addr(addr)
+            r.del_addr(addr)
         for addr in bridge['address']:
-            br.add_addr(addr)
+            r.add_addr(addr)
+
+        r.apply()
 
         # configure additional bridge member options
         for member in bridge['member']:
-            i = STPIf(member['name'])
+            i = STPIf(member['name']).reconciler()
             # configure ARP cache timeout
             i.set_arp_cache_tmo(bridge['arp_cache_tmo'])
             # ignore link state changes
@@ -293,6 +299,7 @@ def apply(bridge):
             i.set_path_cost(member['cost'])
             # set bridge port path priority
             i.set_path_priority(member['priority'])
+            i.apply()
 
     return None
 
@@ -84,22 +84,27 @@ def apply(dummy):
     if dummy['deleted']:
         d.remove()
     else:
+        # Settings are only changed where the kernel has other values
+        r = d.reconciler()
+
         # update interface description used e.g. within SNMP
-        d.set_alias(dummy['description'])
+        r.set_alias(dummy['description'])
 
         # Configure interface address(es)
         # - not longer required addresses get removed first
         # - newly addresses will be added second
         for addr in dummy['address_remove']:
-            d.del_addr(addr)
+            r.del_addr(addr)
         for addr in dummy['address']:
-            d.add_addr(addr)
+            r.add_addr(addr)
 
         # disable interface on demand
         if dummy['disable']:
-            d.set_state('down')
+            r.set_state('down')
         else:
-            d.set_state('up')
+            r.set_state('up')
+
+        r.apply()
 
     return None
 
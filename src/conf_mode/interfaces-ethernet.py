@@ -19,8 +19,8 @@ import os
 from copy import deepcopy
 from sys import exit
 
-from vyos.ifconfig import EthernetIf, VLANIf
-from vyos.configdict import list_diff, vlan_to_dict
+from vyos.ifconfig import EthernetIf, VLANIf, PlannedVLAN
+from vyos.configdict import vlan_to_dict, vlan_changed, vlan_parent_changed
 from vyos.config import Config
 from vyos import ConfigError
 
@@ -54,17 +54,18 @@ default_config_data = {
     'vif_s': [],
     'vif_s_remove': [],
     'vif': [],
-    'vif_remove': []
+    'vif_remove': [],
+    'vlan_parent_changed': False
 }
 
 
 def apply_vlan_config(vlan, config):
     """
     Generic function to apply a VLAN configuration from a dictionary
-    to a VLAN interface
+    to a VLAN interface, or to plan it on a VLAN interface of a VLANPlan
     """
 
-    if type(vlan) != type(VLANIf("lo")):
+    if not isinstance(vlan, (VLANIf, PlannedVLAN)):
         raise TypeError()
 
     # get DHCP config dictionary and update values
@@ -141,14 +142,18 @@ def get_config():
     # set new configuration level
     conf.set_level(cfg_base)
 
+    # changes between the effective and the proposed config
+    diff = conf.get_config_diff()
+
     # retrieve configured interface addresses
     if conf.exists('address'):
         eth['address'] = conf.return_values('address')
 
-    # get interface addresses (currently effective) - to determine which
-    # address is no longer valid and needs to be removed
-    eff_addr = conf.return_effective_values('address')
-    eth['address_remove'] = list_diff(eff_addr, eth['address'])
+    # get interface addresses which are no longer valid and need to be removed
+    eth['address_remove'] = diff.deleted(cfg_base + ' address')
+
+    # VLAN interfaces need to be configured again for changes of the parent
+    eth['vlan_parent_changed'] = vlan_parent_changed(diff, cfg_base)
 
     # retrieve interface description
     if conf.exists('description'):
@@ -240,31 +245,25 @@ def get_config():
 
     # re-set configuration level to parse new nodes
     conf.set_level(cfg_base)
-    # get vif-s interfaces (currently effective) - to determine which vif-s
-    # interface is no longer present and needs to be removed
-    eff_intf = conf.list_effective_nodes('vif-s')
-    act_intf = conf.list_nodes('vif-s')
-    eth['vif_s_remove'] = list_diff(eff_intf, act_intf)
+    # get vif-s interfaces which are no longer present and need to be removed
+    eth['vif_s_remove'] = diff.deleted(cfg_base + ' vif-s')
 
     if conf.exists('vif-s'):
         for vif_s in conf.list_nodes('vif-s'):
             # set config level to vif-s interface
             conf.set_level(cfg_base + ' vif-s ' + vif_s)
-            eth['vif_s'].append(vlan_to_dict(conf))
+            eth['vif_s'].append(vlan_to_dict(conf, diff))
 
     # re-set configuration level to parse new nodes
     conf.set_level(cfg_base)
-    # Determine vif interfaces (currently effective) - to determine which
-    # vif interface is no longer present and needs to be removed
-    eff_intf = conf.list_effective_nodes('vif')
-    act_intf = conf.list_nodes('vif')
-    eth['vif_remove'] = list_diff(eff_intf, act_intf)
+    # Determine vif interfaces which are no longer present and need to be removed
+    eth['vif_remove'] = diff.deleted(cfg_base + ' vif')
 
     if conf.exists('vif'):
         for vif in conf.list_nodes('vif'):
             # set config level to vif interface
             conf.set_level(cfg_base + ' vif ' + vif)
-            eth['vif'].append(vlan_to_dict(conf))
+            eth['vif'].append(vlan_to_dict(conf, diff))
 
     return eth
 
@@ -317,8 +316,12 @@ def apply(eth):
         # delete interface
         e.remove()
     else:
+        # Settings are only changed where the kernel has other values, so
+        # that committing an unchanged configuration doesn't bounce the link
+        r = e.reconciler()
+
         # update interface description used e.g. within SNMP
-        e.set_alias(eth['description'])
+        r.set_alias(eth['description'])
 
         # get DHCP config dictionary and update values
         opt = e.get_dhcp_options()
@@ -348,65 +351,74 @@ def apply(eth):
         e.set_dhcpv6_options(opt)
 
         # ignore link state changes
-        e.set_link_detect(eth['disable_link_detect'])
+        r.set_link_detect(eth['disable_link_detect'])
         # disable ethernet flow control (pause frames)
-        e.set_flow_control(eth['flow_control'])
+        r.set_flow_control(eth['flow_control'])
         # configure ARP cache timeout in milliseconds
-        e.set_arp_cache_tmo(eth['ip_arp_cache_tmo'])
+        r.set_arp_cache_tmo(eth['ip_arp_cache_tmo'])
         # Enable proxy-arp on this interface
-        e.set_proxy_arp(eth['ip_proxy_arp'])
+        r.set_proxy_arp(eth['ip_proxy_arp'])
         # Enable private VLAN proxy ARP on this interface
-        e.set_proxy_arp_pvlan(eth['ip_proxy_arp_pvlan'])
+        r.set_proxy_arp_pvlan(eth['ip_proxy_arp_pvlan'])
 
         # Change interface MAC address - re-set to real hardware address (hw-id)
         # if custom mac is removed
         if eth['mac']:
-            e.set_mac(eth['mac'])
+            r.set_mac(eth['mac'])
         else:
-            e.set_mac(eth['hw_id'])
+            r.set_mac(eth['hw_id'])
 
         # Maximum Transmission Unit (MTU)
-        e.set_mtu(eth['mtu'])
+        r.set_mtu(eth['mtu'])
 
         # GRO (generic receive offload)
-        e.set_gro(eth['offload_gro'])
+        r.set_gro(eth['offload_gro'])
 
         # GSO (generic segmentation offload)
-        e.set_gso(eth['offload_gso'])
+        r.set_gso(eth['offload_gso'])
 
         # scatter-gather option
-        e.set_sg(eth['offload_sg'])
+        r.set_sg(eth['offload_sg'])
 
         # TSO (TCP segmentation offloading)
-        e.set_tso(eth['offload_tso'])
+        r.set_tso(eth['offload_tso'])
 
         # UDP fragmentation offloading
-        e.set_ufo(eth['offload_ufo'])
+        r.set_ufo(eth['offload_ufo'])
 
         # Set physical interface speed and duplex
-        e.set_speed_duplex(eth['speed'], eth['duplex'])
+        r.set_speed_duplex(eth['speed'], eth['duplex'])
 
         # Enable/Disable interface
         if eth['disable']:
-            e.set_state('down')
+            r.set_state('down')
         else:
-            e.set_state('up')
+            r.set_state('up')
 
         # Configure interface address(es)
         # - not longer required addresses get removed first
         # - newly addresses will be added second
         for addr in eth['address_remove']:
-            e.del_addr(addr)
+            r.del_addr(addr)
         for addr in eth['address']:
-            e.add_addr(addr)
+            r.add_addr(addr)
+
+        r.apply()
+
+        # All VLAN interfaces are changed at once, in a few batches
+        plan = e.plan()
 
         # remove no longer required service VLAN interfaces (vif-s)
         for vif_s in eth['vif_s_remove']:
-            e.del_vlan(vif_s)
+            plan.del_vlan(vif_s)
 
         # create service VLAN interfaces (vif-s)
         for vif_s in eth['vif_s']:
-            s_vlan = e.add_vlan(vif_s['id'], ethertype=vif_s['ethertype'])
+            # VLAN interfaces untouched by this commit are left alone
+            if not vlan_changed(eth['intf'], vif_s, eth['vlan_parent_changed']):
+                continue
+
+            s_vlan = plan.add_vlan(vif_s['id'], ethertype=vif_s['ethertype'])
             apply_vlan_config(s_vlan, vif_s)
 
             # remove no longer required client VLAN interfaces (vif-c)
@@ -422,23 +434,27 @@ def apply(eth):
 
         # remove no longer required VLAN interfaces (vif)
         for vif in eth['vif_remove']:
-            e.del_vlan(vif)
+            plan.del_vlan(vif)
 
         # create VLAN interfaces (vif)
         for vif in eth['vif']:
+            if not vlan_changed(eth['intf'], vif, eth['vlan_parent_changed']):
+                continue
+
             # QoS priority mapping can only be set during interface creation
             # so we delete the interface first if required.
             if vif['egress_qos_changed'] or vif['ingress_qos_changed']:
-                try:
-                    # on system bootup the above condition is true but the interface
-                    # does not exists, which throws an exception, but that's legal
-                    e.del_vlan(vif['id'])
-                except:
-                    pass
-
-            vlan = e.add_vlan(vif['id'], ingress_qos=vif['ingress_qos'], egress_qos=vif['egress_qos'])
+                # on system bootup the above condition is true but the interface
+                # does not exists, the plan skips it then
+                plan.del_vlan(vif['id'])
+
+            vlan = plan.add_vlan(vif['id'], ingress_qos=vif['ingress_qos'], egress_qos=vif['egress_qos'])
             apply_vlan_config(vlan, vif)
 
+        errors = plan.commit()
+        if errors:
+            raise ConfigError('\n'.join(error for _, error in errors))
+
     return None
 
 if __name__ == '__main__':
@@ -76,16 +76,21 @@ def apply(loopback):
     if loopback['deleted']:
         l.remove()
     else:
+        # Settings are only changed where the kernel has other values
+        r = l.reconciler()
+
         # update interface description used e.g. within SNMP
-        l.set_alias(loopback['description'])
+        r.set_alias(loopback['description'])
 
         # Configure interface address(es)
         # - not longer required addresses get removed first
         # - newly addresses will be added second
         for addr in loopback['address_remove']:
-            l.del_addr(addr)
+            r.del_addr(addr)
         for addr in loopback['address']:
-            l.add_addr(addr)
+            r.add_addr(addr)
+
+        r.apply()
 
     return None
 
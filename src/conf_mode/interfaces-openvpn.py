@@ -17,7 +17,6 @@
 import os
 import re
 
-from jinja2 import Template
 from copy import deepcopy
 from sys import exit
 from stat import S_IRUSR,S_IRWXU,S_IRGRP,S_IXGRP,S_IROTH,S_IXOTH
@@ -33,6 +32,7 @@ from vyos import ConfigError
 from vyos.config import Config
 from vyos.ifconfig import Interface
 from vyos.validate import is_addr_assigned
+from vyos.template import get_template
 
 user = 'openvpn'
 group = 'openvpn'
@@ -851,13 +851,13 @@ def generate(openvpn):
     # Generate client specific configuration
     for client in openvpn['client']:
         client_file = directory + '/ccd/' + interface + '/' + client['name']
-        tmpl = Template(client_tmpl)
+        tmpl = get_template(client_tmpl)
         client_text = tmpl.render(client)
         with open(client_file, 'w') as f:
             f.write(client_text)
         os.chown(client_file, uid, gid)
 
-    tmpl = Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render(openvpn)
 
     # we need to support quoting of raw parameters from OpenVPN CLI
@@ -25,7 +25,6 @@ from netifaces import interfaces
 
 from vyos import ConfigError
 from vyos.config import Config
-from vyos.configdict import list_diff
 from vyos.ifconfig import WireGuardIf
 
 kdir = r'/config/auth/wireguard'
@@ -92,8 +91,8 @@ def get_config():
             wg['addr'] = c.return_values('address')
 
         # determine addresses which need to be removed
-        eff_addr = c.return_effective_values('address')
-        wg['addr_remove'] = list_diff(eff_addr, wg['addr'])
+        diff = c.get_config_diff()
+        wg['addr_remove'] = diff.deleted('interfaces wireguard {} address'.format(ifname))
 
         # ifalias description
         if c.exists('description'):
@@ -121,8 +120,7 @@ def get_config():
                 kdir, c.return_value('private-key'))
 
         # peer removal, wg identifies peers by its pubkey
-        peer_eff = c.list_effective_nodes('peer')
-        peer_rem = list_diff(peer_eff, c.list_nodes('peer'))
+        peer_rem = diff.deleted('interfaces wireguard {} peer'.format(ifname))
         for p in peer_rem:
             wg['peer_remove'].append(
                 c.return_effective_value('peer {} pubkey'.format(p)))
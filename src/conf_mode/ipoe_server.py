@@ -22,11 +22,11 @@ import re
 import time
 import socket
 import subprocess
-import jinja2
 import syslog as sl
 
 from vyos.config import Config
 from vyos import ConfigError
+from vyos.template import get_template
 
 ipoe_cnf_dir = r'/etc/accel-ppp/ipoe'
 ipoe_cnf = ipoe_cnf_dir + r'/ipoe.config'
@@ -225,7 +225,7 @@ def accel_cmd(cmd=''):
 ### chap_secrets file if auth mode local
 def gen_chap_secrets(c):
   
-  tmpl = jinja2.Template(chap_secrets_conf, trim_blocks=True)
+  tmpl = get_template(chap_secrets_conf, trim_blocks=True)
   chap_secrets_txt = tmpl.render(c)
   old_umask = os.umask(0o077)
   open(chap_secrets,'w').write(chap_secrets_txt)
@@ -360,7 +360,7 @@ def generate(c):
   if c['auth']['mech'] == 'local':
     gen_chap_secrets(c)
 
-  tmpl = jinja2.Template(ipoe_config, trim_blocks=True)
+  tmpl = get_template(ipoe_config, trim_blocks=True)
   config_text = tmpl.render(c)
   open(ipoe_cnf,'w').write(config_text)
   return c
@@ -26,6 +26,7 @@ import vyos.config
 import vyos.defaults
 
 from vyos import ConfigError
+from vyos.template import get_template
 
 
 ra_conn_name = "remote-access"
@@ -145,7 +146,7 @@ def get_config():
 
 ### ipsec secret l2tp
 def write_ipsec_secrets(c):
-  tmpl = jinja2.Template(l2pt_ipsec_secrets_conf, trim_blocks=True)
+  tmpl = get_template(l2pt_ipsec_secrets_conf, trim_blocks=True)
   l2pt_ipsec_secrets_txt = tmpl.render(c)
   old_umask = os.umask(0o077)
   open(ipsec_secrets_flie,'w').write(l2pt_ipsec_secrets_txt)
@@ -154,7 +155,7 @@ def write_ipsec_secrets(c):
 
 ### ipsec remote access connection config
 def write_ipsec_ra_conn(c):
-  tmpl = jinja2.Template(l2tp_ipsec_ra_conn_conf, trim_blocks=True)
+  tmpl = get_template(l2tp_ipsec_ra_conn_conf, trim_blocks=True)
   ipsec_ra_conn_txt = tmpl.render(c)
   old_umask = os.umask(0o077)
   open(ipsec_ra_conn_file,'w').write(ipsec_ra_conn_txt)
@@ -168,7 +169,7 @@ def remove_confs(delim_begin, delim_end, conf_file):
 
 ### Append "include /path/to/ra_conn" to ipsec conf file
 def append_ipsec_conf(c):
-    tmpl = jinja2.Template(l2pt_ipsec_conf, trim_blocks=True)
+    tmpl = get_template(l2pt_ipsec_conf, trim_blocks=True)
     l2pt_ipsec_conf_txt = tmpl.render(c)
     old_umask = os.umask(0o077)
     open(ipsec_conf_flie,'a').write(l2pt_ipsec_conf_txt)
@@ -18,11 +18,12 @@
 
 import sys
 import os
-import jinja2
 import netifaces
 
 from vyos.config import Config
+from vyos.util import write_file_if_changed, update_service
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/default/mdns-repeater'
 
@@ -83,10 +84,9 @@ def generate(mdns):
         print('Warning: mDNS repeater will be deactivated because it is disabled')
         return None
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render(mdns)
-    with open(config_file, 'w') as f:
-        f.write(config_text)
+    mdns['config_changed'] = write_file_if_changed(config_file, config_text)
 
     return None
 
@@ -96,7 +96,7 @@ def apply(mdns):
         if os.path.exists(config_file):
             os.unlink(config_file)
     else:
-        os.system('sudo systemctl restart mdns-repeater')
+        update_service('mdns-repeater.service', mdns['config_changed'])
 
     return None
 
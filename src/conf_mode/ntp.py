@@ -19,12 +19,13 @@
 import sys
 import os
 
-import jinja2
 import ipaddress
 import copy
 
 from vyos.config import Config
+from vyos.util import write_file_if_changed, update_service
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/ntp.conf'
 
@@ -143,16 +144,15 @@ def generate(ntp):
     if ntp is None:
         return None
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render(ntp)
-    with open(config_file, 'w') as f:
-        f.write(config_text)
+    ntp['config_changed'] = write_file_if_changed(config_file, config_text)
 
     return None
 
 def apply(ntp):
     if ntp is not None:
-        os.system('sudo systemctl restart ntp.service')
+        update_service('ntp.service', ntp['config_changed'])
     else:
         # NTP support is removed in the commit
         os.system('sudo systemctl stop ntp.service')
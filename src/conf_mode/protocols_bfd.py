@@ -16,13 +16,13 @@
 #
 
 import sys
-import jinja2
 import copy
 import os
 import vyos.validate
 
 from vyos import ConfigError
 from vyos.config import Config
+from vyos.template import get_template
 
 config_file = r'/tmp/bfd.frr'
 
@@ -209,7 +209,7 @@ def apply(bfd):
     if bfd is None:
         return None
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render(bfd)
     with open(config_file, 'w') as f:
         f.write(config_text)
@@ -23,22 +23,27 @@ import stat
 import pwd
 import time
 
-import jinja2
 import random
 import binascii
+import hashlib
+import json
 import re
 
 import vyos.version
 import vyos.validate
 
 from vyos.config import Config
+from vyos.util import read_file, service_is_active
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file_client = r'/etc/snmp/snmp.conf'
 config_file_daemon = r'/etc/snmp/snmpd.conf'
 config_file_access = r'/usr/share/snmp/snmpd.conf'
 config_file_user   = r'/var/lib/snmp/snmpd.conf'
 config_file_init   = r'/etc/default/snmpd'
+# Digest of the config snmpd was last started with
+config_digest_file = r'/run/snmpd-vyos.digest'
 
 # SNMP OIDs used to mark auth/priv type
 OIDs = {
@@ -255,6 +260,13 @@ def rmfile(file):
     if os.path.isfile(file):
         os.unlink(file)
 
+def config_digest(snmp):
+    # snmpd rewrites its user database, and the internal user gets
+    # new random credentials on every commit, so the generated files
+    # can't be compared with the old ones, the config is compared instead
+    data = {k: v for k, v in snmp.items() if k not in ['vyos_user', 'vyos_user_pass', 'config_changed']}
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
 def get_config():
     snmp = default_config_data
     conf = Config()
@@ -617,6 +629,7 @@ def verify(snmp):
                 if not os.path.isfile('/config/snmp/tls/certs/' + snmp['v3_tsm_key']):
                     raise ConfigError('TSM key must be fingerprint or filename in "/config/snmp/tls/certs/" folder')
 
+    addresses = vyos.validate.AddressSnapshot()
     for listen in snmp['listen_address']:
         addr = listen[0]
         port = listen[1]
@@ -630,7 +643,7 @@ def verify(snmp):
 
         # We only wan't to configure addresses that exist on the system.
         # Hint the user if they don't exist
-        if vyos.validate.is_addr_assigned(addr):
+        if addresses.is_addr_assigned(addr):
             snmp['listen_on'].append(listen)
         else:
             print('WARNING: SNMP listen address {0} not configured!'.format(addr))
@@ -744,6 +757,14 @@ def verify(snmp):
     return None
 
 def generate(snmp):
+    if snmp is not None:
+        snmp['config_changed'] = True
+        if os.path.exists(config_digest_file) and service_is_active('snmpd.service'):
+            # Restarting snmpd takes long and drops all queries in flight
+            snmp['config_changed'] = (read_file(config_digest_file) != config_digest(snmp))
+        if not snmp['config_changed']:
+            return None
+
     #
     # As we are manipulating the snmpd user database we have to stop it first!
     # This is even save if service is going to be removed
@@ -757,31 +778,31 @@ def generate(snmp):
         return None
 
     # Write client config file
-    tmpl = jinja2.Template(client_config_tmpl)
+    tmpl = get_template(client_config_tmpl)
     config_text = tmpl.render(snmp)
     with open(config_file_client, 'w') as f:
         f.write(config_text)
 
     # Write server config file
-    tmpl = jinja2.Template(daemon_config_tmpl)
+    tmpl = get_template(daemon_config_tmpl)
     config_text = tmpl.render(snmp)
     with open(config_file_daemon, 'w') as f:
         f.write(config_text)
 
     # Write access rights config file
-    tmpl = jinja2.Template(access_config_tmpl)
+    tmpl = get_template(access_config_tmpl)
     config_text = tmpl.render(snmp)
     with open(config_file_access, 'w') as f:
         f.write(config_text)
 
     # Write access rights config file
-    tmpl = jinja2.Template(user_config_tmpl)
+    tmpl = get_template(user_config_tmpl)
     config_text = tmpl.render(snmp)
     with open(config_file_user, 'w') as f:
         f.write(config_text)
 
     # Write init config file
-    tmpl = jinja2.Template(init_config_tmpl)
+    tmpl = get_template(init_config_tmpl)
     config_text = tmpl.render(snmp)
     with open(config_file_init, 'w') as f:
         f.write(config_text)
@@ -789,7 +810,9 @@ def generate(snmp):
     return None
 
 def apply(snmp):
-    if snmp is not None:
+    if snmp is None:
+        rmfile(config_digest_file)
+    elif snmp['config_changed']:
 
         nonvolatiledir = '/config/snmp/tls'
         volatiledir = '/etc/snmp/tls'
@@ -867,6 +890,9 @@ def apply(snmp):
         # Enable AgentX in FRR
         os.system('vtysh -c "configure terminal" -c "agentx" >/dev/null')
 
+        with open(config_digest_file, 'w') as f:
+            f.write(config_digest(snmp))
+
     return None
 
 if __name__ == '__main__':
@@ -19,10 +19,10 @@
 import sys
 import os
 
-import jinja2
-
 from vyos.config import Config
+from vyos.util import write_file_if_changed, update_service
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/ssh/sshd_config'
 
@@ -255,15 +255,15 @@ def generate(ssh):
     if ssh is None:
         return None
 
-    tmpl = jinja2.Template(config_tmpl, trim_blocks=True)
+    tmpl = get_template(config_tmpl, trim_blocks=True)
     config_text = tmpl.render(ssh)
-    with open(config_file, 'w') as f:
-        f.write(config_text)
+    ssh['config_changed'] = write_file_if_changed(config_file, config_text)
     return None
 
 def apply(ssh):
     if ssh is not None and 'port' in ssh.keys():
-        os.system("sudo systemctl restart ssh.service")
+        # sshd re-executes itself on reload, existing sessions are kept
+        update_service('ssh.service', ssh['config_changed'], reload=True)
     else:
         # SSH access is removed in the commit
         os.system("sudo systemctl stop ssh.service")
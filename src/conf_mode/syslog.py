@@ -19,10 +19,11 @@
 import sys
 import os
 import re
-import jinja2
 
 from vyos.config import Config
+from vyos.util import write_file_if_changed, update_service
 from vyos import ConfigError
+from vyos.template import get_template
 
 # config templates
 
@@ -245,17 +246,17 @@ def generate(c):
     if c == None:
         return None
 
-    tmpl = jinja2.Template(configs, trim_blocks=True)
+    tmpl = get_template(configs, trim_blocks=True)
     config_text = tmpl.render(c)
-    with open('/etc/rsyslog.d/vyos-rsyslog.conf', 'w') as f:
-        f.write(config_text)
 
     # eventually write for each file its own logrotate file, since size is
     # defined it shouldn't matter
-    tmpl = jinja2.Template(logrotate_configs, trim_blocks=True)
-    config_text = tmpl.render(c)
-    with open('/etc/logrotate.d/vyos-rsyslog', 'w') as f:
-        f.write(config_text)
+    tmpl = get_template(logrotate_configs, trim_blocks=True)
+    logrotate_text = tmpl.render(c)
+
+    c['config_changed'] = write_file_if_changed('/etc/rsyslog.d/vyos-rsyslog.conf', config_text)
+    # logrotate reads its config on every run, rsyslog doesn't need a restart for it
+    write_file_if_changed('/etc/logrotate.d/vyos-rsyslog', logrotate_text)
 
 
 def verify(c):
@@ -303,10 +304,7 @@ def apply(c):
         os.system("sudo systemctl stop syslog.socket")
         os.system("sudo systemctl stop rsyslog")
     else:
-        if not os.path.exists('/var/run/rsyslogd.pid'):
-            os.system("sudo systemctl start rsyslog >/dev/null")
-        else:
-            os.system("sudo systemctl restart rsyslog >/dev/null")
+        update_service('rsyslog.service', c['config_changed'] if c else True)
 
 
 if __name__ == '__main__':
@@ -23,11 +23,11 @@ import pwd
 import copy
 import glob
 
-import jinja2
 import vyos.validate
 
 from vyos.config import Config
 from vyos import ConfigError
+from vyos.template import get_template
 
 config_file = r'/etc/default/tftpd'
 
@@ -79,8 +79,9 @@ def verify(tftpd):
     if not tftpd['listen']:
         raise ConfigError('TFTP server listen address must be configured!')
 
+    addresses = vyos.validate.AddressSnapshot()
     for addr in tftpd['listen']:
-        if not vyos.validate.is_addr_assigned(addr):
+        if not addresses.is_addr_assigned(addr):
             print('WARNING: TFTP server listen address {0} not assigned to any interface!'.format(addr))
 
     return None
@@ -103,7 +104,7 @@ def generate(tftpd):
         else:
             config['listen'] = ["[" + listen + "]" + tftpd['port'] + " -6"]
 
-        tmpl = jinja2.Template(config_tmpl)
+        tmpl = get_template(config_tmpl)
         config_text = tmpl.render(config)
         file = config_file + str(idx)
         with open(file, 'w') as f:
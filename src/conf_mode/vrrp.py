@@ -20,12 +20,12 @@ import sys
 import subprocess
 import ipaddress
 
-import jinja2
 
 import vyos.config
 import vyos.keepalived
 
 from vyos import ConfigError
+from vyos.template import get_template
 
 
 config_file = "/etc/keepalived/keepalived.conf"
@@ -302,7 +302,7 @@ def generate(data):
     # Filter out disabled groups
     vrrp_groups = list(filter(lambda x: x["disable"] != True, vrrp_groups))
 
-    tmpl = jinja2.Template(config_tmpl)
+    tmpl = get_template(config_tmpl)
     config_text = tmpl.render({"groups": vrrp_groups, "sync_groups": sync_groups})
     
     with open(config_file, 'w') as f:
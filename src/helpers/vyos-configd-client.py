@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Usage: vyos-configd-client.py <script> [args...]
+#
+# Runs a conf_mode script in vyos-configd, with the stdin, stdout, stderr,
+# environment and working directory of this process, and exits with its
+# exit code. Scripts that are not written in Python, or any script when
+# vyos-configd is not running, are executed directly.
+#
+# This script is run for every config node that has an owner, so it
+# must not import anything heavy.
+
+import os
+import sys
+import json
+import array
+import socket
+
+SOCKET_PATH = os.environ.get('VYOS_CONFIGD_SOCKET', "/run/vyos-configd.sock")
+
+
+def is_python(script):
+    try:
+        with open(script, 'rb') as f:
+            return b'python' in f.readline()
+    except OSError:
+        return False
+
+def run_directly(argv):
+    # Owners may also be commands in $PATH, e.g. "sudo script.py"
+    os.execvp(argv[0], argv)
+
+def run_in_configd(argv):
+    """
+    Returns:
+        int: exit code of the script, None if configd did not run it
+    """
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        return None
+
+    umask = os.umask(0)
+    os.umask(umask)
+    request = {
+        'argv': argv,
+        'env': dict(os.environ),
+        'cwd': os.getcwd(),
+        'umask': umask,
+        # For the trace of the commit this process runs under
+        'pid': os.getpid()
+    }
+    data = (json.dumps(request) + '\n').encode()
+    fds = array.array('i', [0, 1, 2])
+    try:
+        sent = sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+        # A script that already ran is answered as soon as the request is
+        # complete, sending nothing more would then fail with EPIPE
+        if sent < len(data):
+            sock.sendall(data[sent:])
+    except OSError:
+        return None
+
+    response = b''
+    while not response.endswith(b'\n'):
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        response += chunk
+
+    if not response:
+        # The script may have been (partially) executed, it's not safe to run it again
+        print("vyos-configd exited while running {0}".format(argv[0]), file=sys.stderr)
+        return 1
+
+    result = json.loads(response.decode())
+    if result.get('fallback'):
+        return None
+    return result['exit']
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: {0} <script> [args...]".format(sys.argv[0]), file=sys.stderr)
+        sys.exit(1)
+
+    argv = sys.argv[1:]
+    if not is_python(argv[0]):
+        run_directly(argv)
+
+    code = run_in_configd(argv)
+    if code is None:
+        run_directly(argv)
+    sys.exit(code)
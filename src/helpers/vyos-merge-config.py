@@ -17,13 +17,14 @@
 
 import sys
 import os
-import subprocess
+import shlex
 import tempfile
 import vyos.defaults
 import vyos.remote
 import vyos.migrator
 from vyos.config import Config
-from vyos.configtree import ConfigTree
+from vyos.configtree import ConfigTree, ConfigTreeError
+from vyos.configsession import apply_batch
 
 
 if (len(sys.argv) < 2):
@@ -101,13 +102,22 @@ if (len(sys.argv) > 2):
 if path:
     add_cmds = [ cmd for cmd in add_cmds if path in cmd ]
 
-for cmd in add_cmds:
-    cmd = "/opt/vyatta/sbin/my_" + cmd
-
+def command_to_op(cmd):
+    """ Split a "set path value" command into an (op, path, value) tuple """
+    parts = shlex.split(cmd)
+    op, path = parts[0], parts[1:]
     try:
-        subprocess.check_call(cmd, shell=True)
-    except subprocess.CalledProcessError as err:
-        print("Called process error: {}.".format(err))
+        if len(path) > 1 and path[-1] in merge_config_tree.return_values(path[:-1]):
+            return (op, path[:-1], path[-1])
+    except ConfigTreeError:
+        # Not a leaf node
+        pass
+    return (op, path, '')
+
+# Apply all commands to the session in one go
+errors = apply_batch([command_to_op(cmd) for cmd in add_cmds])
+for i, msg in errors:
+    print("Failed to apply \"{0}\": {1}".format(add_cmds[i], msg))
 
 if effective_config.session_changed():
     print("Merge complete. Use 'commit' to make changes effective.")
@@ -16,11 +16,11 @@
 
 import os
 import argparse
-import jinja2
 import sys
 import time
 
 from vyos.config import Config
+from vyos.template import get_template
 
 cache_file = r'/var/cache/ddclient/ddclient.cache'
 
@@ -79,7 +79,7 @@ def show_status():
 
             data['hosts'].append(outp)
 
-    tmpl = jinja2.Template(OUT_TMPL_SRC)
+    tmpl = get_template(OUT_TMPL_SRC)
     print(tmpl.render(data))
 
 
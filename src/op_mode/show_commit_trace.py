@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Summarizes the trace files written by vyos.trace
+
+import os
+import sys
+import time
+import argparse
+
+from tabulate import tabulate
+
+import vyos.trace
+
+
+def trace_files(trace_dir):
+    """ Returns: trace files, oldest first """
+    try:
+        files = [os.path.join(trace_dir, f) for f in os.listdir(trace_dir) if f.endswith('.json')]
+    except FileNotFoundError:
+        return []
+    return sorted(files, key=os.path.getmtime)
+
+def slowest_calls(events, top, backend=False):
+    """
+    Commands with the most total wall time, calls of the same command are added up.
+    With backend set, config backend calls, by operation and config path.
+    """
+    commands = {}
+    for e in events:
+        if (e['cat'] in vyos.trace.BACKEND_CATEGORIES) != backend:
+            continue
+        key = (e['cat'], e['name'])
+        count, total, longest = commands.get(key, (0, 0, 0))
+        commands[key] = (count + 1, total + e['dur'], max(longest, e['dur']))
+    rows = sorted(commands.items(), key=lambda c: c[1][1], reverse=True)[:top]
+    return [[cat, name, count, '{0:.1f}'.format(total / 1000), '{0:.1f}'.format(longest / 1000)]
+            for (cat, name), (count, total, longest) in rows]
+
+def busiest_scripts(events, top):
+    """ Scripts that issue the most config backend queries """
+    scripts = {}
+    for e in events:
+        script = e['args']['script']
+        queries, query_time, commands, command_time = scripts.get(script, (0, 0, 0, 0))
+        if e['cat'] in vyos.trace.BACKEND_CATEGORIES:
+            queries += 1
+            query_time += e['dur']
+        else:
+            commands += 1
+            command_time += e['dur']
+        scripts[script] = (queries, query_time, commands, command_time)
+    rows = sorted(scripts.items(), key=lambda s: (s[1][0], s[1][1]), reverse=True)[:top]
+    return [[script, queries, '{0:.1f}'.format(query_time / 1000), commands, '{0:.1f}'.format(command_time / 1000)]
+            for script, (queries, query_time, commands, command_time) in rows]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--list', action='store_true', help='List available traces')
+    parser.add_argument('--trace', type=str, help='Trace to summarize, the latest one by default')
+    parser.add_argument('--top', type=int, default=10, help='Number of entries to show')
+    parser.add_argument('--dir', type=str, default=vyos.trace.TRACE_DIR, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    files = trace_files(args.dir)
+    if not files:
+        print("No traces found. Tracing is enabled by creating {0}".format(vyos.trace.TRACE_FLAG))
+        sys.exit(0)
+
+    if args.list:
+        rows = [[os.path.basename(f)[:-len('.json')], time.ctime(os.path.getmtime(f))] for f in reversed(files)]
+        print(tabulate(rows, ['Trace', 'Last written']))
+        sys.exit(0)
+
+    if args.trace:
+        path = os.path.join(args.dir, os.path.basename(args.trace) + '.json')
+        if path not in files:
+            print("Trace {0} not found".format(args.trace))
+            sys.exit(1)
+    else:
+        path = files[-1]
+
+    events = vyos.trace.load(path)
+    scripts = set(e['args']['script'] for e in events)
+    queries = len([e for e in events if e['cat'] in vyos.trace.BACKEND_CATEGORIES])
+    print("Trace {0}: {1} calls, {2} config backend queries, {3} scripts".format(
+          os.path.basename(path)[:-len('.json')], len(events), queries, len(scripts)))
+    print("Chrome trace file: {0}\n".format(path))
+
+    print(tabulate(slowest_calls(events, args.top, backend=True),
+                   ['Type', 'Config path', 'Calls', 'Total ms', 'Max ms']))
+    print()
+    print(tabulate(slowest_calls(events, args.top),
+                   ['Type', 'Command', 'Calls', 'Total ms', 'Max ms']))
+    print()
+    print(tabulate(busiest_scripts(events, args.top),
+                   ['Script', 'Queries', 'Query ms', 'Commands', 'Command ms']))
@@ -20,12 +20,12 @@
 #    Used by the "run show ip multicast" command tree.
 
 import sys
-import jinja2
 import argparse
 import ipaddress
 import socket
 
 import vyos.config
+from vyos.template import get_template
 
 # Output Template for "show ip multicast interface" command
 #
@@ -224,14 +224,14 @@ if __name__ == '__main__':
     if args.interface:
         data = do_mr_vif()
         if data:
-            tmpl = jinja2.Template(vif_out_tmpl)
+            tmpl = get_template(vif_out_tmpl)
             print(tmpl.render(data))
 
         sys.exit(0)
     elif args.mfc:
         data = do_mr_mfc()
         if data:
-            tmpl = jinja2.Template(mfc_out_tmpl)
+            tmpl = get_template(mfc_out_tmpl)
             print(tmpl.render(data))
 
         sys.exit(0)
@@ -15,11 +15,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import jinja2
 import argparse
 
 from sys import exit
 from vyos.config import Config
+from vyos.template import get_template
 
 outp_tmpl = """
 {% if clients %}
@@ -169,6 +169,6 @@ if __name__ == '__main__':
                 if len(remote_host) >= 1:
                     client['remote'] = str(remote_host[0]) + ':' + remote_port
 
-        tmpl = jinja2.Template(outp_tmpl)
+        tmpl = get_template(outp_tmpl)
         print(tmpl.render(data))
 
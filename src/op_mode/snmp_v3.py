@@ -20,10 +20,10 @@
 #    Used by the "run show snmp v3" commands.
 
 import sys
-import jinja2
 import argparse
 
 from vyos.config import Config
+from vyos.template import get_template
 
 parser = argparse.ArgumentParser(description='Retrieve SNMP v3 information')
 parser.add_argument('--all',   action="store_true", help='Show all available information')
@@ -149,29 +149,29 @@ if __name__ == '__main__':
     print(data)
     if args.all:
          # Special case, print all templates !
-         tmpl = jinja2.Template(GROUP_OUTP_TMPL_SRC)
+         tmpl = get_template(GROUP_OUTP_TMPL_SRC)
          print(tmpl.render(data))
-         tmpl = jinja2.Template(TRAPTGT_OUTP_TMPL_SRC)
+         tmpl = get_template(TRAPTGT_OUTP_TMPL_SRC)
          print(tmpl.render(data))
-         tmpl = jinja2.Template(USER_OUTP_TMPL_SRC)
+         tmpl = get_template(USER_OUTP_TMPL_SRC)
          print(tmpl.render(data))
-         tmpl = jinja2.Template(VIEW_OUTP_TMPL_SRC)
+         tmpl = get_template(VIEW_OUTP_TMPL_SRC)
          print(tmpl.render(data))
 
     elif args.group:
-         tmpl = jinja2.Template(GROUP_OUTP_TMPL_SRC)
+         tmpl = get_template(GROUP_OUTP_TMPL_SRC)
          print(tmpl.render(data))
 
     elif args.trap:
-         tmpl = jinja2.Template(TRAPTGT_OUTP_TMPL_SRC)
+         tmpl = get_template(TRAPTGT_OUTP_TMPL_SRC)
          print(tmpl.render(data))
 
     elif args.user:
-         tmpl = jinja2.Template(USER_OUTP_TMPL_SRC)
+         tmpl = get_template(USER_OUTP_TMPL_SRC)
          print(tmpl.render(data))
 
     elif args.view:
-         tmpl = jinja2.Template(VIEW_OUTP_TMPL_SRC)
+         tmpl = get_template(VIEW_OUTP_TMPL_SRC)
          print(tmpl.render(data))
 
     else:
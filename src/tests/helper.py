@@ -19,9 +19,35 @@
 import sys
 import importlib.util
 
+import vyos.config
+
 
 def prepare_module(file_path='', module_name=''):
     spec = importlib.util.spec_from_file_location(module_name, file_path)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
     sys.modules[module_name] = module
+
+
+class FakeConfig(vyos.config.Config):
+    """
+    A config object that loads its snapshot from config strings
+    instead of cli-shell-api, and fails on any other backend call
+    """
+    def __init__(self, running, proposed, node_index=None):
+        super().__init__(snapshot=True)
+        self.running = running
+        self.proposed = proposed
+        self.calls = []
+        if node_index is not None:
+            self._node_index = node_index
+
+    def _run(self, cmd):
+        self.calls.append(cmd[1:])
+        if '--show-active-only' in cmd:
+            return self.running
+        elif '--show-working-only' in cmd:
+            return self.proposed
+        elif cmd[1] == 'inSession':
+            return ''
+        raise AssertionError("Unexpected backend call {0}".format(cmd))
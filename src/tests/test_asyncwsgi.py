@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import time
+import socket
+import asyncio
+import threading
+import unittest
+import http.client
+from unittest import TestCase
+
+from vyos.asyncwsgi import AsyncWSGIServer, WorkerPool
+
+
+def app(environ, start_response):
+    path = environ['PATH_INFO']
+    if path.startswith('/sleep/'):
+        time.sleep(float(path.split('/')[2]))
+    if path == '/stream':
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return ('line {0}\n'.format(i).encode() for i in range(1000))
+    if path == '/fail':
+        raise ValueError("Broken")
+
+    body = environ['wsgi.input'].read()
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'path=' + path.encode() + b' body=' + body]
+
+
+class TestAsyncWSGIServer(TestCase):
+    def setUp(self):
+        self.read_pool = WorkerPool('read', workers=2, queue_depth=1, timeout=1)
+        self.commit_pool = WorkerPool('commit', workers=1, queue_depth=0, timeout=5)
+        def select_pool(environ):
+            if environ['PATH_INFO'].startswith('/sleep/'):
+                return self.commit_pool
+            return None
+        self.server = AsyncWSGIServer(app, '127.0.0.1', 0, [self.read_pool, self.commit_pool],
+                                      select_pool=select_pool, keepalive_timeout=5)
+
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.server.start())
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.run_until_complete(self.server.stop())
+        self.loop.close()
+
+    def connection(self):
+        return http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=10)
+
+    def request(self, conn, method, path, body=None):
+        conn.request(method, path, body=body)
+        resp = conn.getresponse()
+        return resp.status, resp.read(), resp
+
+    def test_keepalive(self):
+        conn = self.connection()
+        status, body, _ = self.request(conn, 'POST', '/retrieve', body=b'key=foo')
+        self.assertEqual((status, body), (200, b'path=/retrieve body=key=foo'))
+        sock = conn.sock
+        status, body, _ = self.request(conn, 'GET', '/retrieve')
+        self.assertEqual((status, body), (200, b'path=/retrieve body='))
+        # Same connection
+        self.assertIs(conn.sock, sock)
+        conn.close()
+
+    def test_http10(self):
+        sock = socket.create_connection(('127.0.0.1', self.server.port))
+        sock.sendall(b'GET /test HTTP/1.0\r\n\r\n')
+        data = b''
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        sock.close()
+        self.assertTrue(data.startswith(b'HTTP/1.1 200 OK\r\n'))
+        self.assertIn(b'Connection: close\r\n', data)
+        self.assertTrue(data.endswith(b'path=/test body='))
+
+    def test_chunked_request(self):
+        sock = socket.create_connection(('127.0.0.1', self.server.port))
+        sock.sendall(b'POST /test HTTP/1.1\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n'
+                     b'3\r\nfoo\r\n3\r\nbar\r\n0\r\n\r\n')
+        data = sock.makefile('rb').read()
+        sock.close()
+        self.assertTrue(data.endswith(b'body=foobar'))
+
+    def test_stream(self):
+        conn = self.connection()
+        status, body, resp = self.request(conn, 'GET', '/stream')
+        self.assertEqual(status, 200)
+        self.assertEqual(resp.getheader('Transfer-Encoding'), 'chunked')
+        self.assertEqual(body.splitlines()[-1], b'line 999')
+        # The connection is still usable
+        status, body, _ = self.request(conn, 'GET', '/test')
+        self.assertEqual(body, b'path=/test body=')
+        conn.close()
+
+    def test_error(self):
+        conn = self.connection()
+        status, _, _ = self.request(conn, 'GET', '/fail')
+        self.assertEqual(status, 500)
+        conn.close()
+
+    def test_separate_pools(self):
+        # A slow request in the commit pool doesn't hold up reads
+        slow = threading.Thread(target=lambda: self.request(self.connection(), 'GET', '/sleep/1'))
+        slow.start()
+        time.sleep(0.1)
+        start = time.time()
+        status, _, _ = self.request(self.connection(), 'GET', '/test')
+        self.assertEqual(status, 200)
+        self.assertLess(time.time() - start, 0.5)
+
+        # The commit pool has one worker and no queue
+        status, _, resp = self.request(self.connection(), 'GET', '/sleep/0')
+        self.assertEqual(status, 503)
+        self.assertEqual(resp.getheader('Retry-After'), '1')
+        self.assertEqual(self.commit_pool.rejected, 1)
+        slow.join()
+
+    def test_timeout(self):
+        self.commit_pool.timeout = 0.2
+        status, _, _ = self.request(self.connection(), 'GET', '/sleep/0.5')
+        self.assertEqual(status, 504)
+        self.assertEqual(self.commit_pool.timeouts, 1)
+        # The request is still running and counted
+        self.assertEqual(self.commit_pool.pending, 1)
+        time.sleep(0.5)
+        self.assertEqual(self.commit_pool.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import time
+import threading
+import unittest
+from unittest import TestCase
+
+from vyos.configsession import ConfigSessionError
+from vyos.commitcoalescer import CommitCoalescer
+from vyos.metrics import Histogram
+
+
+class FakeSession(object):
+    """
+    Keeps set paths in a working and a running set. Operations on paths
+    that contain "invalid" fail, commits of paths that contain "broken" fail.
+    """
+    def __init__(self):
+        self.working = set()
+        self.running = set()
+        self.commits = []
+
+    def apply_batch(self, ops):
+        errors = []
+        for i, (op, path, value) in enumerate(ops):
+            cfg_path = " ".join(path + [value]).strip()
+            if 'invalid' in cfg_path:
+                errors.append((i, "Configuration path: [{0}] is not valid".format(cfg_path)))
+            elif op == 'set':
+                self.working.add(cfg_path)
+            else:
+                self.working.discard(cfg_path)
+        return errors
+
+    def commit(self):
+        if any('broken' in p for p in self.working):
+            raise ConfigSessionError("Commit failed")
+        self.commits.append(self.working - self.running)
+        self.running = set(self.working)
+
+    def discard(self):
+        self.working = set(self.running)
+
+
+class TestCommitCoalescer(TestCase):
+    def setUp(self):
+        self.session = FakeSession()
+        self.coalescer = CommitCoalescer(self.session, window=0.1)
+
+    def submit_all(self, requests):
+        results = [None] * len(requests)
+        def run(i):
+            results[i] = self.coalescer.submit(*requests[i])
+        threads = []
+        for i in range(len(requests)):
+            threads.append(threading.Thread(target=run, args=(i,)))
+            threads[-1].start()
+            # Keep the order of arrival
+            time.sleep(0.01)
+        for t in threads:
+            t.join()
+        return results
+
+    def test_single(self):
+        self.assertEqual(self.coalescer.submit([('set', ['system', 'host-name'], 'vyos')]), [])
+        self.assertEqual(self.session.running, {'system host-name vyos'})
+
+    def test_group(self):
+        requests = [([('set', ['service', 'ssh', 'port'], str(22 + i))],) for i in range(5)]
+        results = self.submit_all(requests)
+        self.assertEqual(results, [[]] * 5)
+        self.assertEqual(len(self.session.commits), 1)
+        self.assertEqual(len(self.session.running), 5)
+
+    def test_invalid_op(self):
+        results = self.submit_all([
+            ([('set', ['system', 'host-name'], 'vyos')],),
+            ([('set', ['system', 'ntp'], ''), ('set', ['system', 'invalid'], '')],),
+            ([('set', ['system', 'domain-name'], 'example.com')],),
+        ])
+        self.assertEqual(results[0], [])
+        self.assertEqual(results[1], [(1, "Configuration path: [system invalid] is not valid")])
+        self.assertEqual(results[2], [])
+        # Valid operations of a failed request are not committed either
+        self.assertEqual(self.session.running, {'system host-name vyos', 'system domain-name example.com'})
+        self.assertEqual(len(self.session.commits), 1)
+
+    def test_check(self):
+        def check():
+            raise ConfigSessionError("Cannot delete [system ntp]: path/value does not exist")
+        results = self.submit_all([
+            ([('delete', ['system', 'ntp'], '')], check),
+            ([('set', ['system', 'host-name'], 'vyos')],),
+        ])
+        self.assertEqual(results[0], [(None, "Cannot delete [system ntp]: path/value does not exist")])
+        self.assertEqual(results[1], [])
+
+    def test_bisect(self):
+        requests = [([('set', ['interfaces', 'dummy', 'dum{0}'.format(i)], '')],) for i in range(6)]
+        requests[4] = ([('set', ['interfaces', 'dummy', 'broken'], '')],)
+        results = self.submit_all(requests)
+        self.assertEqual(results[4], [(None, "Commit failed")])
+        self.assertEqual([r for i, r in enumerate(results) if i != 4], [[]] * 5)
+        self.assertEqual(len(self.session.running), 5)
+        # 0-5, 3-5, 4-5 and 4
+        self.assertEqual(self.coalescer.failed_commits, 4)
+
+    def test_on_commit(self):
+        seen = []
+        self.coalescer.on_commit = lambda: seen.append(set(self.session.running))
+        self.coalescer.submit([('set', ['system', 'host-name'], 'vyos')])
+        self.coalescer.submit([('set', ['system', 'invalid'], '')])
+        # Called once the commit is done, and only after successful ones
+        self.assertEqual(seen, [{'system host-name vyos'}])
+
+    def test_metrics(self):
+        self.coalescer.lock_wait = Histogram('lock_wait_seconds', 'Lock wait')
+        self.coalescer.commit_duration = Histogram('commit_duration_seconds', 'Commit duration')
+        self.submit_all([([('set', ['interfaces', 'dummy', 'broken'], '')],),
+                         ([('set', ['interfaces', 'dummy', 'dum0'], '')],)])
+        self.assertIn('lock_wait_seconds_count 1', self.coalescer.lock_wait.render())
+        # The group and both halves
+        self.assertIn('commit_duration_seconds_count 3', self.coalescer.commit_duration.render())
+
+    def test_exception(self):
+        def commit():
+            raise OSError("No space left on device")
+        self.session.commit = commit
+        with self.assertRaises(OSError):
+            self.coalescer.submit([('set', ['system', 'host-name'], 'vyos')])
+        self.assertEqual(self.session.working, set())
+        # The next request is not stuck
+        self.session.commit = lambda: None
+        self.assertEqual(self.coalescer.submit([('set', ['system', 'host-name'], 'vyos')]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest import TestCase
+
+import vyos.configindex
+from vyos.commitplan import Task, CommitRun, find_tasks, build_graph
+from vyos.configdiff import ConfigDiff
+from vyos.configsnapshot import ConfigSnapshot
+
+
+running_config = """
+interfaces {
+    ethernet eth0 {
+        address 192.0.2.1/24
+    }
+}
+service {
+    ssh {
+        port 22
+    }
+}
+"""
+
+proposed_config = """
+interfaces {
+    ethernet eth0 {
+        address 192.0.2.2/24
+    }
+    ethernet eth1 {
+        address 198.51.100.1/24
+    }
+}
+service {
+    https {
+        api {
+            keys {
+                id test {
+                    key test
+                }
+            }
+        }
+    }
+    snmp {
+        community public {
+        }
+    }
+}
+system {
+    ntp {
+        server 0.pool.ntp.org
+    }
+}
+"""
+
+
+
+class TestCommitPlan(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.index_file = tempfile.mkstemp()
+        os.close(fd)
+        subprocess.check_call(['scripts/build-config-index', cls.index_file,
+                               'interface-definitions/interfaces-ethernet.xml',
+                               'interface-definitions/ntp.xml',
+                               'interface-definitions/ssh.xml',
+                               'interface-definitions/snmp.xml',
+                               'interface-definitions/https.xml'])
+        cls.index = vyos.configindex.load(cls.index_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.unlink(cls.index_file)
+
+    def setUp(self):
+        self.conf_dir = tempfile.mkdtemp()
+        # Declared dependencies, as in http-api.py
+        with open(os.path.join(self.conf_dir, 'http-api.py'), 'w') as f:
+            f.write("dependencies = [\n    'https.py',\n]\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.conf_dir)
+
+    def tasks(self):
+        diff = ConfigDiff(ConfigSnapshot(running_config), ConfigSnapshot(proposed_config))
+        return find_tasks(self.index, diff, conf_dir=self.conf_dir)
+
+    def test_find_tasks(self):
+        tasks = self.tasks()
+        self.assertEqual([(t.script, t.tag_value) for t in tasks],
+                         [('interfaces-ethernet.py', 'eth0'), ('interfaces-ethernet.py', 'eth1'),
+                          ('ntp.py', None), ('ssh.py', None), ('snmp.py', None),
+                          ('https.py', None), ('http-api.py', None)])
+        self.assertEqual(tasks[0].priority, 318)
+        self.assertEqual(tasks[1].env({})['VYOS_TAGNODE_VALUE'], 'eth1')
+        self.assertNotIn('VYOS_TAGNODE_VALUE', tasks[2].env({'VYOS_TAGNODE_VALUE': 'eth1'}))
+
+    def test_build_graph(self):
+        graph = build_graph(self.tasks())
+        # Interfaces are always committed one by one
+        self.assertEqual(graph[1], {0})
+        # ntp, ssh and snmp only wait for the interfaces
+        self.assertEqual(graph[2], {0, 1})
+        self.assertEqual(graph[3], {0, 1})
+        self.assertEqual(graph[4], {0, 1})
+        # https is a parent of api, which also depends on it
+        self.assertEqual(graph[6], {0, 1, 5})
+
+    def test_sudo_owner(self):
+        task = Task('sudo ${vyos_conf_scripts_dir}/ssh.py', ['service', 'ssh'], 500,
+                    conf_dir=self.conf_dir)
+        self.assertEqual(task.argv, ['sudo', os.path.join(self.conf_dir, 'ssh.py')])
+        self.assertEqual(task.script, 'ssh.py')
+
+    def test_commit_run(self):
+        run = CommitRun(self.tasks(), jobs=3)
+        # Nothing starts before the interfaces are done
+        self.assertEqual(run.prefetch(), [])
+        run.request(0)
+        self.assertTrue(run.ready(0))
+        run.start(0)
+        run.finish(0)
+        run.request(1)
+        run.start(1)
+        self.assertEqual(run.prefetch(), [])
+        run.finish(1)
+
+        # ntp is asked for, ssh and snmp start with it, https waits for a job
+        run.request(2)
+        run.start(2)
+        self.assertEqual(run.prefetch(), [3, 4])
+        run.start(3)
+        run.start(4)
+        self.assertEqual(run.prefetch(), [])
+        run.finish(4)
+        self.assertEqual(run.prefetch(), [5])
+        run.start(5)
+        # api waits for https
+        run.finish(5)
+        self.assertEqual(run.prefetch(), [6])
+
+    def test_commit_run_skipped(self):
+        run = CommitRun(self.tasks(), jobs=4)
+        # The commit engine ran the interface scripts without vyos-configd
+        run.request(2)
+        self.assertEqual(run.done, {0, 1})
+        self.assertTrue(run.ready(2))
+        run.start(2)
+        self.assertEqual(run.prefetch(), [3, 4, 5])
+
+    def test_commit_run_serial(self):
+        run = CommitRun(self.tasks(), jobs=1)
+        run.request(2)
+        run.start(2)
+        self.assertEqual(run.prefetch(), [])
+        run.finish(2)
+        self.assertEqual(run.prefetch(), [3])
+
+    def test_match(self):
+        run = CommitRun(self.tasks())
+        script = os.path.join(self.conf_dir, 'interfaces-ethernet.py')
+        self.assertEqual(run.match([script], 'eth1'), 1)
+        self.assertIsNone(run.match([script], None))
+        self.assertIsNone(run.match([script, 'extra'], 'eth1'))
+        run.request(1)
+        self.assertIsNone(run.match([script], 'eth1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import unittest
+from unittest import TestCase
+
+from vyos.configdiff import ConfigDiff
+from vyos.configsnapshot import ConfigSnapshot
+try:
+    from src.tests.helper import FakeConfig
+except ModuleNotFoundError:  # for unittest.main()
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+    from src.tests.helper import FakeConfig
+
+
+running_config = """
+interfaces {
+    ethernet eth0 {
+        address 192.0.2.1/24
+        address 192.0.2.2/24
+        vif 10 {
+            address 198.51.100.1/24
+        }
+        vif 20 {
+            description "VLAN twenty"
+        }
+        vif 30 {
+        }
+    }
+    wireguard wg0 {
+        peer red {
+            pubkey abc
+        }
+        peer blue {
+            pubkey def
+        }
+    }
+}
+system {
+    host-name vyos
+}
+"""
+
+proposed_config = """
+interfaces {
+    ethernet eth0 {
+        address 192.0.2.1/24
+        address 192.0.2.3/24
+        vif 10 {
+            address 198.51.100.1/24
+        }
+        vif 20 {
+            description "VLAN 20"
+        }
+        vif 40 {
+        }
+    }
+    wireguard wg0 {
+        peer blue {
+            pubkey def
+        }
+    }
+}
+system {
+    host-name vyos
+}
+"""
+
+
+class TestConfigDiff(TestCase):
+    def setUp(self):
+        self.diff = ConfigDiff(ConfigSnapshot(running_config), ConfigSnapshot(proposed_config))
+
+    def test_added_deleted(self):
+        self.assertEqual(self.diff.added('interfaces ethernet eth0 vif'), ['40'])
+        self.assertEqual(self.diff.deleted('interfaces ethernet eth0 vif'), ['30'])
+        self.assertEqual(self.diff.added('interfaces ethernet eth0 address'), ['192.0.2.3/24'])
+        self.assertEqual(self.diff.deleted('interfaces ethernet eth0 address'), ['192.0.2.2/24'])
+        self.assertEqual(self.diff.deleted('interfaces wireguard wg0 peer'), ['red'])
+        self.assertEqual(self.diff.added('interfaces wireguard wg0 peer'), [])
+
+    def test_changed(self):
+        self.assertEqual(self.diff.changed('interfaces ethernet eth0 vif'), ['20'])
+        self.assertEqual(self.diff.unchanged('interfaces ethernet eth0 vif'), ['10'])
+        self.assertEqual(self.diff.changed('interfaces'), ['ethernet', 'wireguard'])
+
+    def test_is_changed(self):
+        self.assertTrue(self.diff.is_changed(''))
+        self.assertTrue(self.diff.is_changed('interfaces ethernet eth0 vif 20 description'))
+        self.assertFalse(self.diff.is_changed('interfaces ethernet eth0 vif 10'))
+        self.assertFalse(self.diff.is_changed('system'))
+        # Nodes under added or deleted nodes
+        self.assertTrue(self.diff.is_changed('interfaces ethernet eth0 vif 40'))
+        self.assertTrue(self.diff.is_changed('interfaces wireguard wg0 peer red pubkey'))
+        self.assertFalse(self.diff.is_changed('interfaces ethernet eth0 vif 40 address'))
+        self.assertFalse(self.diff.is_changed('interfaces wireguard wg0 peer red description'))
+        # Nodes that exist in neither config
+        self.assertFalse(self.diff.is_changed('interfaces ethernet eth1'))
+        self.assertEqual(self.diff.deleted('interfaces ethernet eth1 vif'), [])
+
+    def test_node_deleted(self):
+        diff = ConfigDiff(ConfigSnapshot(running_config), ConfigSnapshot(''))
+        self.assertEqual(diff.deleted('interfaces ethernet eth0 vif'), ['10', '20', '30'])
+        self.assertEqual(diff.added('interfaces ethernet eth0 vif'), [])
+
+    def test_config_diff_from_config(self):
+        config = FakeConfig(running_config, proposed_config)
+        diff = config.get_config_diff()
+        self.assertIs(config.get_config_diff(), diff)
+        self.assertEqual(diff.deleted('interfaces ethernet eth0 vif'), ['30'])
+        show_calls = [c for c in config.calls if c[-1] == 'showConfig']
+        self.assertEqual(len(show_calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
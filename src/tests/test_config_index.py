@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import tempfile
+import unittest
+import subprocess
+from unittest import TestCase
+
+import vyos.configindex
+
+
+class TestConfigIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.index_file = tempfile.mkstemp()
+        os.close(fd)
+        subprocess.check_call(['scripts/build-config-index', cls.index_file,
+                               'interface-definitions/interfaces-ethernet.xml',
+                               'interface-definitions/ntp.xml'])
+        cls.index = vyos.configindex.load(cls.index_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.unlink(cls.index_file)
+
+    def test_tag_node(self):
+        self.assertTrue(self.index.is_tag(['interfaces', 'ethernet']))
+        self.assertEqual(self.index.priority(['interfaces', 'ethernet']), 318)
+        self.assertEqual(self.index.owner(['interfaces', 'ethernet']),
+                         '${vyos_conf_scripts_dir}/interfaces-ethernet.py')
+        self.assertIsNone(self.index.owner(['interfaces', 'ethernet', 'eth0', 'mtu']))
+        # Tag values are neither tag nor leaf nodes
+        self.assertFalse(self.index.is_tag(['interfaces', 'ethernet', 'eth0']))
+        self.assertFalse(self.index.is_leaf(['interfaces', 'ethernet', 'eth0']))
+
+    def test_leaf_nodes(self):
+        self.assertTrue(self.index.is_multi(['interfaces', 'ethernet', 'eth0', 'address']))
+        self.assertTrue(self.index.is_leaf(['interfaces', 'ethernet', 'eth0', 'vif-s', '10', 'vif-c', '20', 'mtu']))
+        self.assertFalse(self.index.is_multi(['interfaces', 'ethernet', 'eth0', 'mtu']))
+        self.assertTrue(self.index.is_valueless(['system', 'ntp', 'server', 'foo', 'prefer']))
+
+    def test_merged_definitions(self):
+        # "system" is defined in ntp.xml, "interfaces" in interfaces-ethernet.xml
+        self.assertFalse(self.index.is_tag(['system']))
+        self.assertFalse(self.index.is_leaf(['interfaces']))
+
+    def test_unknown(self):
+        self.assertIsNone(self.index.lookup(['interfaces', 'ethernet', 'eth0', 'firewall']))
+        self.assertIsNone(self.index.is_multi(['interfaces', 'ethernet', 'eth0', 'mtu', '1500']))
+        self.assertIsNone(self.index.is_tag(['no-such-node']))
+
+
+if __name__ == '__main__':
+    unittest.main()
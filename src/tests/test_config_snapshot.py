@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import unittest
+from unittest import TestCase
+
+import vyos.config
+from vyos.configsnapshot import ConfigSnapshot, ConfigSnapshotError
+
+
+class TestConfigSnapshot(TestCase):
+    def setUp(self):
+        with open('tests/data/config.valid', 'r') as f:
+            self.config = ConfigSnapshot(f.read())
+
+    def test_top_level_leaf(self):
+        self.assertTrue(self.config.exists(["top-level-leaf-node"]))
+        self.assertEqual(self.config.return_value(["top-level-leaf-node"]), "foo")
+
+    def test_valueless(self):
+        self.assertTrue(self.config.exists(["top-level-valueless-node"]))
+        self.assertEqual(self.config.return_values(["top-level-valueless-node"]), [])
+        self.assertIsNone(self.config.return_value(["top-level-valueless-node"]))
+
+    def test_tag_node(self):
+        # Child order must be preserved
+        self.assertEqual(self.config.list_nodes(["top-level-tag-node"]), ["foo", "bar"])
+        self.assertEqual(self.config.return_value(["top-level-tag-node", "bar", "top-level-tag-node-child"]), "another-value")
+
+    def test_multi_node(self):
+        path = ["normal-node", "normal-node-child", "multi-node"]
+        self.assertEqual(self.config.return_values(path), ["value1", "value1"])
+        self.assertTrue(self.config.exists(path + ["value1"]))
+        self.assertFalse(self.config.exists(path + ["value2"]))
+
+    def test_quoted_value(self):
+        self.assertEqual(self.config.return_value(["normal-node", "option-with-quoted-value"]), "some-value")
+
+    def test_missing(self):
+        self.assertFalse(self.config.exists(["no-such-node"]))
+        self.assertIsNone(self.config.return_values(["no-such-node"]))
+        self.assertIsNone(self.config.list_nodes(["normal-node", "no-such-node"]))
+
+    def test_childless_tag_nodes(self):
+        with open('tests/data/config.boot.default', 'r') as f:
+            config = ConfigSnapshot(f.read())
+        self.assertEqual(config.list_nodes(["system", "ntp", "server"]),
+                         ["0.pool.ntp.org", "1.pool.ntp.org", "2.pool.ntp.org"])
+        self.assertTrue(config.exists(["system", "ntp", "server", "1.pool.ntp.org"]))
+        self.assertEqual(config.return_value(["system", "login", "user", "vyos", "authentication", "plaintext-password"]), "")
+
+    def test_unbalanced(self):
+        with self.assertRaises(ConfigSnapshotError):
+            ConfigSnapshot("system {\n host-name vyos\n")
+
+
+class TestConfigSnapshotBackend(TestCase):
+    """ Checks that a snapshot config calls the backend only to load the snapshot """
+
+    running = "interfaces {\n ethernet eth0 {\n address 192.0.2.1/24\n }\n}\n"
+    proposed = "interfaces {\n ethernet eth0 {\n address 192.0.2.1/24\n address 2001:db8::1/64\n }\n ethernet eth1 {\n }\n}\n"
+
+    def setUp(self):
+        self.calls = []
+        test = self
+
+        class FakeConfig(vyos.config.Config):
+            def _run(self, cmd):
+                test.calls.append(cmd[1:])
+                if '--show-active-only' in cmd:
+                    return test.running
+                elif '--show-working-only' in cmd:
+                    return test.proposed
+                elif cmd[1] in ('inSession', 'isMulti', 'isTag', 'isLeaf'):
+                    if cmd[1] == 'isTag' and cmd[-1] != 'ethernet':
+                        raise vyos.config.VyOSError()
+                    if cmd[1] == 'isMulti' and cmd[-1] != 'address':
+                        raise vyos.config.VyOSError()
+                    return ''
+                raise AssertionError("Unexpected backend call {0}".format(cmd))
+
+        self.config = FakeConfig(snapshot=True)
+
+    def test_queries(self):
+        self.config.set_level('interfaces ethernet')
+        self.assertEqual(self.config.list_nodes(''), ['eth0', 'eth1'])
+        self.assertEqual(self.config.list_effective_nodes(''), ['eth0'])
+        self.assertTrue(self.config.exists('eth1'))
+        self.assertFalse(self.config.exists_effective('eth1'))
+        self.assertEqual(self.config.return_values('eth0 address'), ['192.0.2.1/24', '2001:db8::1/64'])
+        self.assertEqual(self.config.return_effective_values('eth0 address'), ['192.0.2.1/24'])
+
+        data_calls = [c for c in self.calls if c[0] not in ('isMulti', 'isTag', 'isLeaf')]
+        self.assertEqual(len(data_calls), 3)
+
+
+class TestConfigSubtreeBackend(TestCase):
+    """ Checks that a config without a snapshot reads only the subtrees it is asked for """
+
+    proposed = {
+        ('interfaces', 'ethernet', 'eth0'): "address 192.0.2.1/24\nvif 10 {\n}\n",
+        ('interfaces', 'ethernet', 'eth0', 'vif', '10'): "",
+    }
+
+    def setUp(self):
+        self.calls = []
+        test = self
+
+        class FakeConfig(vyos.config.Config):
+            def _run(self, cmd):
+                test.calls.append(cmd[1:])
+                if 'showConfig' in cmd:
+                    test.assertIn('--show-working-only', cmd)
+                    path = tuple(cmd[cmd.index('showConfig') + 1:])
+                    if path not in test.proposed:
+                        raise vyos.config.VyOSError()
+                    return test.proposed[path]
+                elif cmd[1] == 'inSession':
+                    return ''
+                elif cmd[1] == 'isLeaf':
+                    if cmd[-1] != 'address':
+                        raise vyos.config.VyOSError()
+                    return ''
+                raise AssertionError("Unexpected backend call {0}".format(cmd))
+
+        self.config = FakeConfig(snapshot=False)
+
+    def test_get_config_dict(self):
+        self.config.set_level('interfaces ethernet eth0')
+        self.assertEqual(self.config.get_config_dict()['vif'], {'10': {}})
+        self.assertEqual(self.config.get_config_dict('vif 10'), {})
+        self.assertEqual(self.config.get_config_dict('vif 20'), {})
+        self.assertEqual(self.config.get_config_dict('address'), '192.0.2.1/24')
+
+        # one showConfig of the node itself (or of its parent for a leaf node)
+        # per call, and a single check whether this is a config session
+        shows = [c[c.index('showConfig') + 1:] for c in self.calls if 'showConfig' in c]
+        self.assertEqual(shows, [['interfaces', 'ethernet', 'eth0'],
+                                 ['interfaces', 'ethernet', 'eth0', 'vif', '10'],
+                                 ['interfaces', 'ethernet', 'eth0', 'vif', '20'],
+                                 ['interfaces', 'ethernet', 'eth0']])
+        self.assertEqual([c for c in self.calls if c[0] == 'inSession'], [['inSession']])
+
+
+if __name__ == '__main__':
+    unittest.main()
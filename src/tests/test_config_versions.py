@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import time
+import unittest
+from unittest import TestCase
+
+import vyos.configindex
+from vyos.config import VyOSError
+from vyos.configversions import ConfigVersions
+try:
+    from src.tests.helper import FakeConfig
+except ModuleNotFoundError:  # for unittest.main()
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+    from src.tests.helper import FakeConfig
+
+
+config_v1 = """
+system {
+    host-name vyos
+    name-server 192.0.2.1
+    name-server 192.0.2.2
+}
+"""
+
+config_v2 = """
+system {
+    host-name router
+    name-server 192.0.2.1
+}
+"""
+
+node_index = vyos.configindex.NodeIndex({
+    'system': {'type': 'node', 'children': {
+        'host-name': {'type': 'leaf'},
+        'name-server': {'type': 'leaf', 'multi': True}}}})
+
+
+class ShowConfig(FakeConfig):
+    """ Also answers showConfig, and counts backend calls """
+    def _run(self, cmd):
+        if cmd[1] == 'showConfig':
+            self.calls.append(cmd[1:])
+            return "host-name {0}\n".format(self.running.split()[3])
+        return super()._run(cmd)
+
+
+class TestConfigVersions(TestCase):
+    def setUp(self):
+        self.running = config_v1
+        self.loads = 0
+        self.versions = ConfigVersions(max_age=60, config_class=self.make_config)
+
+    def make_config(self):
+        self.loads += 1
+        return ShowConfig(self.running, self.running, node_index=node_index)
+
+    def test_queries(self):
+        config = self.versions.current().config
+        self.assertEqual(config.return_value('system host-name'), 'vyos')
+        self.assertEqual(config.return_values('system name-server'), ['192.0.2.1', '192.0.2.2'])
+        self.assertTrue(config.exists('system name-server 192.0.2.2'))
+        with self.assertRaises(VyOSError):
+            config.return_value('system name-server')
+        # All from the snapshot loaded once
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(len(config.calls), 3)
+
+    def test_generation(self):
+        v1 = self.versions.current()
+        self.assertEqual(v1.generation, 1)
+        self.assertIs(self.versions.current(), v1)
+
+        # Reloaded, but not changed
+        self.assertEqual(self.versions.refresh().generation, 1)
+
+        self.running = config_v2
+        v2 = self.versions.refresh()
+        self.assertEqual(v2.generation, 2)
+        self.assertEqual(v2.config.return_value('system host-name'), 'router')
+        # Old versions are never modified
+        self.assertEqual(v1.config.return_value('system host-name'), 'vyos')
+
+    def test_max_age(self):
+        self.versions.max_age = 0.05
+        v1 = self.versions.current()
+        self.running = config_v2
+        self.assertIs(self.versions.current(), v1)
+        time.sleep(0.1)
+        self.assertEqual(self.versions.current().generation, 2)
+
+    def test_show_config(self):
+        version = self.versions.current()
+        self.assertEqual(version.show_config(['system']), "host-name vyos\n")
+        self.assertEqual(version.show_config(['system']), "host-name vyos\n")
+        self.assertEqual(len([c for c in version.config.calls if c[0] == 'showConfig']), 1)
+        # Still valid for an unchanged config
+        self.assertEqual(self.versions.refresh().show_config(['system']), "host-name vyos\n")
+        self.assertEqual(len([c for c in version.config.calls if c[0] == 'showConfig']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest import TestCase
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
+configd = os.path.join(base_dir, 'src/services/vyos-configd')
+client = os.path.join(base_dir, 'src/helpers/vyos-configd-client.py')
+
+test_script = """#!/usr/bin/env python3
+import os
+import sys
+
+if __name__ == '__main__':
+    print("pid", os.getpid())
+    print("cwd", os.getcwd())
+    print("tag", os.environ.get('VYOS_TAGNODE_VALUE'))
+    print("args", " ".join(sys.argv[1:]))
+    print("error", file=sys.stderr)
+    if sys.argv[1:] == ['raise']:
+        raise ValueError("failed")
+    elif sys.argv[1:] == ['message']:
+        sys.exit("Config error")
+    elif sys.argv[1:] and sys.argv[1].isdigit():
+        sys.exit(int(sys.argv[1]))
+"""
+
+
+class TestConfigd(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.tmp_dir, 'configd.sock')
+        cls.script = os.path.join(cls.tmp_dir, 'test-script.py')
+        with open(cls.script, 'w') as f:
+            f.write(test_script)
+        os.chmod(cls.script, 0o755)
+
+        env = dict(os.environ, PYTHONPATH=os.path.join(base_dir, 'python'))
+        cls.server = subprocess.Popen([sys.executable, configd, '--socket', cls.socket_path],
+                                      stdout=subprocess.PIPE, env=env)
+        # Wait until it's ready
+        cls.server.stdout.readline()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+        cls.server.stdout.close()
+        shutil.rmtree(cls.tmp_dir)
+
+    def run_client(self, args, socket_path=None):
+        env = dict(os.environ, VYOS_CONFIGD_SOCKET=(socket_path or self.socket_path),
+                   VYOS_TAGNODE_VALUE='eth0')
+        p = subprocess.run([sys.executable, client, self.script] + args, cwd=self.tmp_dir, env=env,
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return (p.returncode, p.stdout.decode(), p.stderr.decode())
+
+    def test_run(self):
+        code, out, err = self.run_client(['a', 'b'])
+        self.assertEqual(code, 0, err)
+        lines = out.splitlines()
+        self.assertEqual(lines[1:], ["cwd " + self.tmp_dir, "tag eth0", "args a b"])
+        self.assertEqual(err, "error\n")
+        # Run in a child of vyos-configd
+        self.assertNotEqual(lines[0], "pid {0}".format(self.server.pid))
+
+    def test_exit_codes(self):
+        self.assertEqual(self.run_client(['3'])[0], 3)
+
+        code, out, err = self.run_client(['message'])
+        self.assertEqual(code, 1)
+        self.assertEqual(err, "error\nConfig error\n")
+
+        code, out, err = self.run_client(['raise'])
+        self.assertEqual(code, 1)
+        self.assertIn("ValueError: failed", err)
+
+    def test_fallback(self):
+        code, out, err = self.run_client(['3'], socket_path=os.path.join(self.tmp_dir, 'missing.sock'))
+        self.assertEqual(code, 3)
+        self.assertIn("args 3", out)
+
+
+# Starts vyos-configd with tracing enabled, writing to a directory of the
+# test, and with the test process standing in for the commit process
+traced_configd = """
+import sys
+import runpy
+import psutil
+import vyos.trace
+
+trace_dir, test_pid, configd = sys.argv[1:4]
+vyos.trace.TRACE_FLAG = trace_dir + '/vyos.trace'
+vyos.trace.TRACE_DIR = trace_dir
+vyos.trace.COMMIT_PROCESSES = [psutil.Process(int(test_pid)).name()]
+vyos.trace._enabled = True
+vyos.trace._install()
+
+sys.argv = [configd] + sys.argv[4:]
+runpy.run_path(configd, run_name='__main__')
+"""
+
+traced_script = """#!/usr/bin/env python3
+import subprocess
+
+if __name__ == '__main__':
+    subprocess.run(['true'])
+"""
+
+
+@unittest.skipUnless(os.geteuid() == 0, 'trace files are only written by root')
+class TestConfigdTrace(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'configd.sock')
+        self.script = os.path.join(self.tmp_dir, 'traced-script.py')
+        with open(self.script, 'w') as f:
+            f.write(traced_script)
+        os.chmod(self.script, 0o755)
+        open(os.path.join(self.tmp_dir, 'vyos.trace'), 'w').close()
+
+        env = dict(os.environ, PYTHONPATH=os.path.join(base_dir, 'python'))
+        self.server = subprocess.Popen([sys.executable, '-c', traced_configd, self.tmp_dir, str(os.getpid()),
+                                        configd, '--socket', self.socket_path],
+                                       stdout=subprocess.PIPE, env=env)
+        self.server.stdout.readline()
+
+    def tearDown(self):
+        self.server.terminate()
+        self.server.wait()
+        self.server.stdout.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_commit_trace(self):
+        import psutil
+        env = dict(os.environ, VYOS_CONFIGD_SOCKET=self.socket_path)
+        p = subprocess.run([sys.executable, client, self.script], env=env, stderr=subprocess.PIPE)
+        self.assertEqual(p.returncode, 0, p.stderr)
+
+        # The trace file of the commit the client runs under, not of the
+        # vyos-configd child that ran the script
+        commit = '{0}-{1}'.format(int(psutil.Process().create_time()), os.getpid())
+        self.assertIn(commit + '.json', os.listdir(self.tmp_dir))
+        with open(os.path.join(self.tmp_dir, commit + '.json')) as f:
+            events = json.loads(f.read().rstrip().rstrip(',') + ']')
+        self.assertIn({'name': 'true', 'cat': 'subprocess', 'script': 'traced-script.py'},
+                      [{'name': e['name'], 'cat': e['cat'], 'script': e['args']['script']}
+                       for e in events if e['ph'] == 'X'])
+
+
+# Starts vyos-configd with the test process standing in for the commit
+# process, and a fixed plan for its commits
+planned_configd = """
+import sys
+import json
+import types
+import psutil
+import importlib.machinery
+import vyos.trace
+from vyos.commitplan import Task
+
+test_pid, conf_dir, tasks, configd, socket_path = sys.argv[1:6]
+vyos.trace.COMMIT_PROCESSES = [psutil.Process(int(test_pid)).name()]
+
+loader = importlib.machinery.SourceFileLoader('vyos_configd', configd)
+module = types.ModuleType(loader.name)
+loader.exec_module(module)
+module.plan = lambda request: [Task(*t, conf_dir=conf_dir) for t in json.loads(tasks)]
+module.main(socket_path)
+"""
+
+# Logs its start and end, and fails for "fail"
+stub_script = """#!/usr/bin/env python3
+import os
+import sys
+import time
+
+name = (os.path.basename(sys.argv[0]) + ' ' + os.environ.get('VYOS_TAGNODE_VALUE', '')).strip()
+with open('{log}', 'a') as f:
+    f.write('start ' + name + '\\n')
+time.sleep(0.3)
+with open('{log}', 'a') as f:
+    f.write('end ' + name + '\\n')
+print('output of ' + name)
+print('errors of ' + name, file=sys.stderr)
+if sys.argv[1:] == ['fail']:
+    sys.exit(1)
+"""
+
+
+class TestConfigdCommit(TestCase):
+    # (owner, path, priority, tag value) in the order of the commit
+    tasks = [
+        ('${vyos_conf_scripts_dir}/interfaces-ethernet.py', ['interfaces', 'ethernet'], 318, 'eth0'),
+        ('${vyos_conf_scripts_dir}/ntp.py', ['system', 'ntp'], 400, None),
+        ('${vyos_conf_scripts_dir}/ssh.py fail', ['service', 'ssh'], 500, None),
+        ('${vyos_conf_scripts_dir}/snmp.py', ['service', 'snmp'], 900, None),
+        ('${vyos_conf_scripts_dir}/https.py', ['service', 'https'], 1001, None),
+        ('${vyos_conf_scripts_dir}/http-api.py', ['service', 'https', 'api'], 1002, None),
+    ]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'configd.sock')
+        self.log = os.path.join(self.tmp_dir, 'log')
+        for name in ['interfaces-ethernet.py', 'ntp.py', 'ssh.py', 'snmp.py', 'https.py', 'http-api.py']:
+            path = os.path.join(self.tmp_dir, name)
+            with open(path, 'w') as f:
+                f.write(stub_script.format(log=self.log))
+            os.chmod(path, 0o755)
+
+        env = dict(os.environ, PYTHONPATH=os.path.join(base_dir, 'python'))
+        self.server = subprocess.Popen([sys.executable, '-c', planned_configd, str(os.getpid()), self.tmp_dir,
+                                        json.dumps(self.tasks), configd, self.socket_path],
+                                       stdout=subprocess.PIPE, env=env)
+        self.server.stdout.readline()
+
+    def tearDown(self):
+        self.server.terminate()
+        self.server.wait()
+        self.server.stdout.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_commit(self):
+        # Runs the scripts one by one, as the commit engine does
+        results = []
+        for owner, path, priority, tag_value in self.tasks:
+            env = dict(os.environ, VYOS_CONFIGD_SOCKET=self.socket_path)
+            env.pop('VYOS_TAGNODE_VALUE', None)
+            if tag_value:
+                env['VYOS_TAGNODE_VALUE'] = tag_value
+            argv = owner.replace('${vyos_conf_scripts_dir}', self.tmp_dir).split()
+            p = subprocess.run([sys.executable, client] + argv, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            results.append((p.returncode, p.stdout.decode(), p.stderr.decode()))
+
+        self.assertEqual(results, [
+            (0, 'output of interfaces-ethernet.py eth0\n', 'errors of interfaces-ethernet.py eth0\n'),
+            (0, 'output of ntp.py\n', 'errors of ntp.py\n'),
+            (1, 'output of ssh.py\n', 'errors of ssh.py\n'),
+            (0, 'output of snmp.py\n', 'errors of snmp.py\n'),
+            (0, 'output of https.py\n', 'errors of https.py\n'),
+            (0, 'output of http-api.py\n', 'errors of http-api.py\n')])
+
+        with open(self.log) as f:
+            log = f.read().splitlines()
+        self.assertEqual(len(log), 12)
+        self.assertLess(log.index('end interfaces-ethernet.py eth0'), log.index('start ntp.py'))
+        # ssh, snmp and https started with ntp, before they were asked for
+        for name in ['ssh.py', 'snmp.py', 'https.py']:
+            self.assertLess(log.index('start ' + name), log.index('end ntp.py'))
+        # The API waits for https
+        self.assertLess(log.index('end https.py'), log.index('start http-api.py'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import tempfile
+import unittest
+import subprocess
+from unittest import TestCase, mock
+
+import vyos.configindex
+from vyos.configdict import retrieve_config, vlan_to_dict, vlan_changed, vlan_parent_changed
+try:
+    from src.tests.helper import FakeConfig
+except ModuleNotFoundError:  # for unittest.main()
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+    from src.tests.helper import FakeConfig
+
+
+running_config = """
+interfaces {
+    ethernet eth0 {
+        address 192.0.2.1/24
+        vif 10 {
+            address 198.51.100.1/24
+            address 198.51.100.2/24
+        }
+        vif-s 100 {
+            vif-c 200 {
+            }
+            vif-c 201 {
+            }
+        }
+    }
+}
+"""
+
+proposed_config = """
+interfaces {
+    ethernet eth0 {
+        address 192.0.2.1/24
+        vif 10 {
+            address 198.51.100.1/24
+            description "VLAN ten"
+            disable
+            mtu 1400
+        }
+        vif-s 100 {
+            ethertype 0x8100
+            vif-c 200 {
+                address 203.0.113.1/24
+            }
+        }
+    }
+}
+"""
+
+
+class TestConfigDict(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.index_file = tempfile.mkstemp()
+        os.close(fd)
+        subprocess.check_call(['scripts/build-config-index', cls.index_file,
+                               'interface-definitions/interfaces-ethernet.xml'])
+        cls.index = vyos.configindex.load(cls.index_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.unlink(cls.index_file)
+
+    def setUp(self):
+        self.config = FakeConfig(running_config, proposed_config, self.index)
+
+    def test_get_config_dict(self):
+        eth0 = self.config.get_config_dict('interfaces ethernet eth0')
+        # Multi nodes are lists even if they have one value
+        self.assertEqual(eth0['address'], ['192.0.2.1/24'])
+        self.assertEqual(eth0['vif']['10']['description'], 'VLAN ten')
+        self.assertEqual(eth0['vif']['10']['disable'], {})
+        self.assertEqual(list(eth0['vif-s']['100']['vif-c'].keys()), ['200'])
+
+        eth0 = self.config.get_config_dict('interfaces ethernet eth0', effective=True)
+        self.assertEqual(list(eth0['vif-s']['100']['vif-c'].keys()), ['200', '201'])
+
+        self.assertEqual(self.config.get_config_dict('interfaces ethernet eth1'), {})
+
+    def test_single_backend_load(self):
+        for i in range(3):
+            self.config.get_config_dict('interfaces')
+            self.config.get_config_dict('interfaces', effective=True)
+        show_calls = [c for c in self.config.calls if c[-1] == 'showConfig']
+        self.assertEqual(len(show_calls), 2)
+
+    def test_vlan_to_dict(self):
+        self.config.set_level('interfaces ethernet eth0 vif 10')
+        vlan = vlan_to_dict(self.config)
+        self.assertEqual(vlan['id'], '10')
+        self.assertEqual(vlan['address'], ['198.51.100.1/24'])
+        self.assertEqual(vlan['address_remove'], ['198.51.100.2/24'])
+        self.assertEqual(vlan['description'], 'VLAN ten')
+        self.assertTrue(vlan['disable'])
+        self.assertEqual(vlan['mtu'], 1400)
+        self.assertTrue(vlan['changed'])
+        # QoS maps are unset in both configs, the interface is not recreated
+        self.assertFalse(vlan['egress_qos_changed'])
+        self.assertFalse(vlan['ingress_qos_changed'])
+        self.assertNotIn('vif_c', vlan)
+
+    def test_vlan_to_dict_vif_s(self):
+        self.config.set_level('interfaces ethernet eth0 vif-s 100')
+        vlan = vlan_to_dict(self.config)
+        self.assertEqual(vlan['ethertype'], '802.1q')
+        self.assertEqual(vlan['vif_c_remove'], ['201'])
+        self.assertEqual(len(vlan['vif_c']), 1)
+        self.assertEqual(vlan['vif_c'][0]['id'], '200')
+        self.assertEqual(vlan['vif_c'][0]['address'], ['203.0.113.1/24'])
+
+    def test_vlan_changed(self):
+        running = """
+interfaces {
+    ethernet eth0 {
+        mtu 1500
+        vif 10 {
+        }
+        vif-s 100 {
+            vif-c 200 {
+            }
+        }
+    }
+}
+"""
+        config = FakeConfig(running, running.replace('mtu 1500', 'mtu 9000'), self.index)
+        diff = config.get_config_diff()
+        self.assertTrue(vlan_parent_changed(diff, 'interfaces ethernet eth0'))
+        self.assertFalse(vlan_parent_changed(self.config.get_config_diff(), 'interfaces ethernet eth0'))
+
+        config.set_level('interfaces ethernet eth0 vif-s 100')
+        vif_s = vlan_to_dict(config)
+        self.assertFalse(vif_s['changed'])
+        links = set(['eth0.100', 'eth0.100.200'])
+        with mock.patch('os.path.exists', lambda path: os.path.basename(path) in links):
+            self.assertFalse(vlan_changed('eth0', vif_s))
+            self.assertTrue(vlan_changed('eth0', vif_s, parent_changed=True))
+            # a missing vif-c interface is created again
+            links.remove('eth0.100.200')
+            self.assertTrue(vlan_changed('eth0', vif_s))
+
+    def test_retrieve_config(self):
+        path_hash = {
+            'address': (['address'], list),
+            'vifs': (['vif'], dict, {
+                'description': (['description'], str),
+                'mtu': (['mtu'], str),
+                'disabled': (['disable'], bool),
+            })
+        }
+        eth0 = retrieve_config(path_hash, ['interfaces', 'ethernet', 'eth0'], self.config)
+        self.assertEqual(eth0['address'], ['192.0.2.1/24'])
+        self.assertEqual(eth0['vifs'], {'10': {'description': 'VLAN ten', 'mtu': '1400', 'disabled': True}})
+
+
+if __name__ == '__main__':
+    unittest.main()
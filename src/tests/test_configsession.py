@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import TestCase
+
+import vyos.shellapi
+import vyos.configsession
+
+
+# Stands in for my_set, my_delete and my_comment: logs the command,
+# and fails for paths that contain "invalid"
+fake_command = """#!/bin/sh
+echo "$(basename $0) $*" >> {log}
+case "$*" in
+    *invalid*) echo "Configuration path: [$*] is not valid"; exit 1;;
+esac
+"""
+
+# Stands in for cli-shell-api: keeps the working config in a file, and like
+# the real one in a session with pending changes, marks added lines with "+"
+# in a plain showConfig
+fake_shell_api = """#!/bin/sh
+case "$*" in
+    loadFile*) cp "$2" {working};;
+    *--show-working-only*showConfig*) cat {working};;
+    showConfig*) sed 's/^/+/' {working};;
+    *) exit 1;;
+esac
+"""
+
+libvyosconfig = os.path.exists('/usr/lib/libvyosconfig.so.0')
+
+
+class TestApplyBatch(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log = os.path.join(self.tmp_dir, 'log')
+        self._saved = (vyos.configsession.SET, vyos.configsession.DELETE, vyos.configsession.COMMENT)
+        for name in ['SET', 'DELETE', 'COMMENT']:
+            path = os.path.join(self.tmp_dir, name.lower())
+            with open(path, 'w') as f:
+                f.write(fake_command.format(log=self.log))
+            os.chmod(path, 0o755)
+            setattr(vyos.configsession, name, path)
+
+    def tearDown(self):
+        vyos.configsession.SET, vyos.configsession.DELETE, vyos.configsession.COMMENT = self._saved
+        vyos.shellapi.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _log(self):
+        with open(self.log) as f:
+            return f.read().splitlines()
+
+    def test_small_batch(self):
+        errors = vyos.configsession.apply_batch([
+            ('set', ['system', 'host-name'], 'vyos'),
+            ('set', ['system', 'invalid'], None),
+            ('delete', ['system', 'name-server'], '192.0.2.1'),
+            ('comment', ['system'], 'a "comment"'),
+            ('rename', ['system'], 'x')
+        ])
+        self.assertEqual(self._log(), ['set system host-name vyos', 'set system invalid',
+                                       'delete system name-server 192.0.2.1',
+                                       'comment system a "comment"'])
+        self.assertEqual(errors, [(1, 'Configuration path: [system invalid] is not valid'),
+                                  (4, '"rename" is not a valid operation')])
+
+    def test_no_errors(self):
+        self.assertEqual(vyos.configsession.apply_batch([('set', ['system', 'host-name'], 'vyos')]), [])
+
+    @unittest.skipUnless(libvyosconfig, 'needs libvyosconfig')
+    def test_large_batch(self):
+        working = os.path.join(self.tmp_dir, 'working')
+        with open(working, 'w') as f:
+            f.write('system {\n    host-name vyos\n    time-zone UTC\n}\n')
+        shell_api = os.path.join(self.tmp_dir, 'cli-shell-api')
+        with open(shell_api, 'w') as f:
+            f.write(fake_shell_api.format(working=working))
+        os.chmod(shell_api, 0o755)
+
+        saved = (vyos.configsession.SHOW_WORKING_CONFIG, vyos.configsession.LOAD_CONFIG)
+        vyos.configsession.SHOW_WORKING_CONFIG = [shell_api, '--show-working-only', '--show-ignore-edit', 'showConfig']
+        vyos.configsession.LOAD_CONFIG = [shell_api, 'loadFile']
+        try:
+            ops = [('set', ['service', 'ssh', 'port'], '22'),
+                   ('set', ['service', 'ssh', 'listen-address'], '192.0.2.1'),
+                   ('set', ['system', 'domain-name'], 'example.com'),
+                   ('set', ['system', 'host-name'], 'router'),
+                   ('set', ['system', 'login', 'banner', 'pre-login'], 'hello'),
+                   ('set', ['system', 'ipv6', 'disable-forwarding'], None),
+                   ('set', ['system', 'options', 'reboot-on-panic'], 'true'),
+                   ('set', ['system', 'ntp', 'allow-clients'], None),
+                   ('delete', ['system', 'time-zone'], None)]
+            self.assertGreater(len(ops), vyos.configsession.BATCH_THRESHOLD)
+            errors = vyos.configsession.apply_batch(ops)
+        finally:
+            vyos.configsession.SHOW_WORKING_CONFIG, vyos.configsession.LOAD_CONFIG = saved
+
+        self.assertEqual(errors, [])
+        # all of it was done by the load, nothing had to be redone on its own
+        self.assertFalse(os.path.exists(self.log))
+        with open(working) as f:
+            config = f.read()
+        self.assertNotIn('+', config)
+        self.assertIn('host-name router', config)
+        self.assertIn('domain-name example.com', config)
+        self.assertNotIn('time-zone', config)
+
+
+if __name__ == '__main__':
+    unittest.main()
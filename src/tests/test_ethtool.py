@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import sys
+import errno
+import struct
+import unittest
+from unittest import TestCase, mock
+
+try:
+    import vyos.ethtool
+except ModuleNotFoundError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../python'))
+    import vyos.ethtool
+
+import vyos.ifconfig
+from vyos.ethtool import (
+    DUPLEX_FULL, ETHTOOL_GGRO, ETHTOOL_GPAUSEPARAM, ETHTOOL_GSET, ETHTOOL_GTSO,
+    ETHTOOL_GUFO, ETHTOOL_SGRO, ETHTOOL_SPAUSEPARAM, ETHTOOL_SSET, EthtoolCmd, FEATURES,
+    get_feature, get_link, get_pause, set_feature, set_link, set_pause)
+
+# 1000baseT/Full, 100baseT/Full, autonegotiation, twisted pair, pause
+SUPPORTED = (1 << 5) | (1 << 3) | (1 << 6) | (1 << 7) | (1 << 13)
+
+
+class FakeDevice(object):
+    """
+    The driver of an interface as SIOCETHTOOL requests see it, replacing
+    vyos.ethtool._ioctl. The commands of the requests are recorded.
+    """
+    def __init__(self):
+        self.features = {'gro': 1, 'gso': 1, 'sg': 1, 'tso': 0}
+        self.pause = (0, 0, 0)
+        self.link = EthtoolCmd(cmd=0, supported=SUPPORTED, advertising=(1 << 5) | (1 << 13),
+                               speed=1000, duplex=DUPLEX_FULL, port=0, phy_address=0,
+                               transceiver=0, autoneg=1, mdio_support=0, maxtxpkt=0,
+                               maxrxpkt=0, speed_hi=0, eth_tp_mdix=0, eth_tp_mdix_ctrl=0,
+                               lp_advertising=0)
+        self.unsupported = set()
+        self.invalid = set()
+        self.requests = []
+
+    def ioctl(self, ifname, data):
+        cmd, = struct.unpack_from('=I', data)
+        self.requests.append(cmd)
+        if cmd in self.unsupported:
+            raise OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP))
+        if cmd in self.invalid:
+            raise OSError(errno.EINVAL, os.strerror(errno.EINVAL))
+
+        for feature, (get, set) in FEATURES.items():
+            if feature not in self.features:
+                continue
+            if cmd == get:
+                return struct.pack('=II', cmd, self.features[feature])
+            if cmd == set:
+                self.features[feature] = struct.unpack_from('=I', data, 4)[0]
+                return data
+
+        if cmd == ETHTOOL_GPAUSEPARAM:
+            return struct.pack('=IIII', cmd, *self.pause)
+        if cmd == ETHTOOL_SPAUSEPARAM:
+            self.pause = struct.unpack_from('=III', data, 4)
+            return data
+        if cmd == ETHTOOL_GSET:
+            return struct.pack('=IIIHBBBBBBIIHBBI8x', *self.link._replace(cmd=cmd))
+        if cmd == ETHTOOL_SSET:
+            self.link = EthtoolCmd._make(struct.unpack('=IIIHBBBBBBIIHBBI8x', data))
+            return data
+        raise OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP))
+
+
+class FakeEthernetIf(vyos.ifconfig.EthernetIf):
+    """ EthernetIf on lo, which has no driver to ask for its name """
+    def get_driver_name(self):
+        return 'e1000e'
+
+
+class EthtoolTestCase(TestCase):
+    def setUp(self):
+        self.device = FakeDevice()
+        patcher = mock.patch('vyos.ethtool._ioctl', self.device.ioctl)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestEthtool(EthtoolTestCase):
+    def test_feature(self):
+        self.assertTrue(get_feature('eth0', 'gro'))
+        set_feature('eth0', 'gro', False)
+        self.assertFalse(get_feature('eth0', 'gro'))
+        self.assertEqual(self.device.requests, [ETHTOOL_GGRO, ETHTOOL_SGRO, ETHTOOL_GGRO])
+
+        # UFO is gone from the kernel, it is off
+        self.assertFalse(get_feature('eth0', 'ufo'))
+        self.device.unsupported.add(ETHTOOL_GTSO)
+        with self.assertRaises(OSError) as e:
+            get_feature('eth0', 'tso')
+        self.assertEqual(e.exception.errno, errno.EOPNOTSUPP)
+
+    def test_pause(self):
+        self.assertEqual(get_pause('eth0'), {'autoneg': False, 'rx': False, 'tx': False})
+        set_pause('eth0', True, True, False)
+        self.assertEqual(get_pause('eth0'), {'autoneg': True, 'rx': True, 'tx': False})
+
+    def test_link(self):
+        self.assertEqual(get_link('eth0'), {'speed': 1000, 'duplex': 'full', 'autoneg': True})
+
+        set_link('eth0', 100000, 'half')
+        self.assertEqual(get_link('eth0'), {'speed': 100000, 'duplex': 'half', 'autoneg': False})
+        self.assertEqual((self.device.link.speed, self.device.link.speed_hi), (100000 & 0xffff, 1))
+
+        # all supported link modes are advertised, with the pause frames as they were
+        set_link('eth0')
+        self.assertEqual(get_link('eth0')['autoneg'], True)
+        self.assertEqual(self.device.link.advertising, (1 << 5) | (1 << 3) | (1 << 13))
+
+        self.device.link = self.device.link._replace(speed=0xffff, speed_hi=0xffff, duplex=0xff)
+        self.assertEqual(get_link('eth0'), {'speed': None, 'duplex': None, 'autoneg': True})
+
+
+class TestEthernetIf(EthtoolTestCase):
+    def test_unchanged(self):
+        e = FakeEthernetIf('lo')
+        e.set_gro('on')
+        e.set_tso('off')
+        e.set_ufo('off')
+        e.set_flow_control('off')
+        e.set_speed_duplex('auto', 'auto')
+        self.assertEqual(self.device.requests, [ETHTOOL_GGRO, ETHTOOL_GTSO, ETHTOOL_GUFO,
+                                                ETHTOOL_GPAUSEPARAM, ETHTOOL_GSET])
+
+    def test_changed(self):
+        e = FakeEthernetIf('lo')
+        e.set_gso('off')
+        e.set_flow_control('on')
+        e.set_speed_duplex('1000', 'full')
+        self.assertEqual(self.device.features['gso'], 0)
+        self.assertEqual(self.device.pause, (1, 1, 1))
+        self.assertEqual(get_link('lo'), {'speed': 1000, 'duplex': 'full', 'autoneg': False})
+        self.assertIn(ETHTOOL_SSET, self.device.requests)
+
+        with self.assertRaises(ValueError):
+            e.set_sg('yes')
+
+    def test_errors(self):
+        e = FakeEthernetIf('lo')
+        # what the driver doesn't support is skipped, as it was with ethtool
+        e.set_ufo('on')
+        self.device.unsupported.add(ETHTOOL_SPAUSEPARAM)
+        e.set_flow_control('on')
+        # as are settings the NIC can't do
+        self.device.invalid.update([ETHTOOL_SPAUSEPARAM, ETHTOOL_SSET])
+        self.device.unsupported.clear()
+        e.set_flow_control('on')
+        e.set_speed_duplex('100', 'half')
+
+        with mock.patch('vyos.ethtool._ioctl', side_effect=OSError(errno.EPERM, 'Operation not permitted')):
+            with self.assertRaises(OSError):
+                e.set_gro('off')
+
+    def test_settings(self):
+        self.device.pause = (1, 0, 1)
+        settings = FakeEthernetIf('lo').get_settings()
+        self.assertEqual([settings[f] for f in ['gro', 'gso', 'sg', 'tso', 'ufo']],
+                         ['on', 'on', 'on', 'off', 'off'])
+        self.assertEqual((settings['speed_duplex'], settings['flow_control']), ('auto', None))
+
+        self.device.link = self.device.link._replace(autoneg=0)
+        self.device.unsupported.add(ETHTOOL_GPAUSEPARAM)
+        settings = FakeEthernetIf('lo').get_settings()
+        self.assertEqual((settings['speed_duplex'], settings['flow_control']), ('1000/full', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
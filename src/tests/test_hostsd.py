@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import json
+import time
+import types
+import shutil
+import tempfile
+import threading
+import unittest
+import importlib.machinery
+from unittest import TestCase
+
+import zmq
+
+try:
+    import vyos.hostsd_client
+except ModuleNotFoundError:
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../python'))
+    import vyos.hostsd_client
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
+
+
+def load_hostsd():
+    loader = importlib.machinery.SourceFileLoader('vyos_hostsd',
+        os.path.join(base_dir, 'src/services/vyos-hostsd'))
+    module = types.ModuleType(loader.name)
+    loader.exec_module(module)
+    module.debug = False
+    return module
+
+
+def add_hosts(tag, *hosts):
+    data = [{'host': h, 'address': a, 'aliases': []} for h, a in hosts]
+    return json.dumps({'type': 'hosts', 'op': 'add', 'tag': tag, 'data': data})
+
+def delete_hosts(tag):
+    return json.dumps({'type': 'hosts', 'op': 'delete', 'tag': tag})
+
+
+class TestHostsd(TestCase):
+    def setUp(self):
+        self.hostsd = load_hostsd()
+        self.dir = tempfile.mkdtemp()
+        self.hostsd.RESOLV_CONF_FILE = os.path.join(self.dir, 'resolv.conf')
+        self.hostsd.HOSTS_FILE = os.path.join(self.dir, 'hosts')
+        self.hostsd.STATE_FILE = os.path.join(self.dir, 'hostsd.state')
+        self.hostsd.JOURNAL_FILE = os.path.join(self.dir, 'hostsd.journal')
+
+        # Count actual writes
+        self.writes = []
+        write_file_if_changed = self.hostsd.write_file_if_changed
+        def counting_write(path, data):
+            changed = write_file_if_changed(path, data)
+            if changed:
+                self.writes.append(os.path.basename(path))
+            return changed
+        self.hostsd.write_file_if_changed = counting_write
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_handle_message(self):
+        self.assertEqual(self.hostsd.handle_message(add_hosts('dhcp-eth0', ('foo', '192.0.2.1'))), (None, True))
+        msg = json.dumps({'type': 'name_servers', 'op': 'get', 'tag': 'dhcp-eth0'})
+        self.assertEqual(self.hostsd.handle_message(msg), ([], False))
+        # Nothing is written until asked to
+        self.assertEqual(self.writes, [])
+
+    def test_write_files(self):
+        state = self.hostsd.STATE
+        self.hostsd.handle_message(add_hosts('dhcp-eth0', ('foo', '192.0.2.1')))
+        self.hostsd.write_files(state)
+        self.assertEqual(sorted(self.writes), ['hosts', 'resolv.conf'])
+        self.assertIn('192.0.2.1\tfoo', self.read(self.hostsd.HOSTS_FILE))
+
+        # Only the files that have changed are written
+        self.writes.clear()
+        self.hostsd.handle_message(add_hosts('dhcp-eth0', ('bar', '192.0.2.2')))
+        self.hostsd.write_files(state)
+        self.assertEqual(self.writes, ['hosts'])
+
+        self.writes.clear()
+        self.hostsd.write_files(state)
+        self.assertEqual(self.writes, [])
+        self.assertEqual([f for f in os.listdir(self.dir) if f.startswith('.')], [])
+
+    def test_journal(self):
+        hostsd = self.hostsd
+        journal = hostsd.Journal(hostsd.JOURNAL_FILE)
+        for msg in [add_hosts('dhcp-eth0', ('foo', '192.0.2.1')), add_hosts('static', ('bar', '192.0.2.2'))]:
+            hostsd.handle_message(msg)
+            journal.append(msg)
+        journal.flush()
+        hostsd.save_state(hostsd.STATE)
+        # A change made after the state file was written, torn by a crash
+        msg = json.dumps({'type': 'hosts', 'op': 'delete', 'tag': 'dhcp-eth0'}, indent=4)
+        hostsd.handle_message(msg)
+        journal.append(msg)
+        journal.append(delete_hosts('static')[:20])
+        journal.close()
+        self.assertEqual(len(self.read(hostsd.JOURNAL_FILE).splitlines()), 4)
+
+        # Replaying entries already in the state file changes nothing
+        hostsd = load_hostsd()
+        state, entries = hostsd.load_state(self.hostsd.STATE_FILE, self.hostsd.JOURNAL_FILE)
+        self.assertEqual(entries, 3)
+        self.assertEqual(list(state['hosts']), ['bar'])
+        self.assertEqual(hostsd.STATE, state)
+
+    def test_journal_compact(self):
+        hostsd = self.hostsd
+        journal = hostsd.Journal(hostsd.JOURNAL_FILE, fsync='never')
+        msg = add_hosts('dhcp-eth0', ('foo', '192.0.2.1'))
+        hostsd.handle_message(msg)
+        journal.append(msg)
+        journal.compact(hostsd.STATE)
+        self.assertEqual(journal.entries, 0)
+        self.assertEqual(self.read(hostsd.JOURNAL_FILE), '')
+
+        # Appends go to the start of the emptied journal
+        msg = add_hosts('dhcp-eth0', ('bar', '192.0.2.2'))
+        hostsd.handle_message(msg)
+        journal.append(msg)
+        journal.flush()
+        self.assertEqual(self.read(hostsd.JOURNAL_FILE), msg + '\n')
+
+        state, entries = load_hostsd().load_state(hostsd.STATE_FILE, hostsd.JOURNAL_FILE)
+        self.assertEqual(entries, 1)
+        self.assertEqual(list(state['hosts']), ['foo', 'bar'])
+
+    def test_journal_fsync_interval(self):
+        journal = self.hostsd.Journal(self.hostsd.JOURNAL_FILE, fsync='interval', fsync_interval=10)
+        self.assertIsNone(journal.sync_due())
+        start = time.monotonic()
+        journal.append(delete_hosts('static'))
+        journal.flush()
+        self.assertGreater(journal.sync_due(), start)
+        journal.sync()
+        self.assertIsNone(journal.sync_due())
+        self.assertRaises(ValueError, self.hostsd.Journal, self.hostsd.JOURNAL_FILE, fsync='sometimes')
+
+    def test_batch(self):
+        msgs = [
+            json.loads(add_hosts('dhcp-eth0', ('foo', '192.0.2.1'))),
+            {'type': 'name_servers', 'op': 'add', 'tag': 'dhcp-eth0', 'data': ['192.0.2.53']},
+            {'type': 'name_servers', 'op': 'get', 'tag': 'dhcp-eth0'},
+            json.loads(delete_hosts('static'))
+        ]
+        result = self.hostsd.handle_message(json.dumps({'op': 'batch', 'data': msgs}))
+        self.assertEqual(result, ([None, None, ['192.0.2.53'], None], True))
+        self.assertEqual(list(self.hostsd.STATE['hosts']), ['foo'])
+
+        # Nothing is applied if any message is invalid
+        msgs = [json.loads(delete_hosts('dhcp-eth0')), {'type': 'hosts', 'op': 'add', 'tag': 'x', 'data': [{}]}]
+        with self.assertRaisesRegex(ValueError, 'Message 1 of the batch: Missing required option "host"'):
+            self.hostsd.handle_message(json.dumps({'op': 'batch', 'data': msgs}))
+        self.assertEqual(list(self.hostsd.STATE['hosts']), ['foo'])
+
+        msgs = [json.loads(delete_hosts('dhcp-eth0')),
+                {'type': 'name_servers', 'op': 'add', 'tag': 'x', 'data': [['192.0.2.53']]}]
+        with self.assertRaisesRegex(ValueError, 'Message 1 of the batch: Name server entry is not a string'):
+            self.hostsd.handle_message(json.dumps({'op': 'batch', 'data': msgs}))
+        msgs[1] = {'type': 'hosts', 'op': 'add', 'tag': 'x',
+                   'data': [{'host': {}, 'address': '192.0.2.1', 'aliases': []}]}
+        with self.assertRaisesRegex(ValueError, 'Message 1 of the batch: Host name is not a string'):
+            self.hostsd.handle_message(json.dumps({'op': 'batch', 'data': msgs}))
+        self.assertEqual(list(self.hostsd.STATE['hosts']), ['foo'])
+
+        self.assertEqual(self.hostsd.handle_message(json.dumps({'op': 'batch', 'data': []})), ([], False))
+        self.assertRaises(ValueError, self.hostsd.handle_message, json.dumps({'op': 'batch', 'data': {}}))
+
+    def test_tagged_entries(self):
+        entries = self.hostsd.TaggedEntries()
+        entries.add('foo', {'tag': 'dhcp-eth0', 'address': '192.0.2.1'})
+        entries.add('bar', {'tag': 'dhcp-eth0', 'address': '192.0.2.2'})
+        entries.add('baz', {'tag': 'static', 'address': '192.0.2.3'})
+        # Moved to another tag, but keeps its place
+        entries.add('foo', {'tag': 'static', 'address': '192.0.2.4'})
+        self.assertEqual(list(entries), ['foo', 'bar', 'baz'])
+        self.assertEqual(entries.keys('static'), ['baz', 'foo'])
+
+        entries.delete_tag('dhcp-eth0')
+        self.assertEqual(list(entries), ['foo', 'baz'])
+        self.assertEqual(entries.keys('dhcp-eth0'), [])
+        entries.delete_tag('static')
+        self.assertEqual(len(entries), 0)
+        self.assertEqual(entries.tags, {})
+
+    def test_state_file_format(self):
+        # As written by earlier versions
+        data = {
+            'name_servers': {'192.0.2.53': {'tag': 'dhcp-eth0'}},
+            'hosts': {'foo': {'tag': 'static', 'address': '192.0.2.1', 'aliases': ['bar']}},
+            'host_name': 'router',
+            'domain_name': 'example.com',
+            'search_domains': []
+        }
+        state = self.hostsd.state_from_dict(json.loads(json.dumps(data)))
+        self.assertEqual(self.hostsd.get_name_servers(state, 'dhcp-eth0'), ['192.0.2.53'])
+        self.hostsd.save_state(state)
+        self.assertEqual(json.loads(self.read(self.hostsd.STATE_FILE)), data)
+
+    def test_serve(self):
+        context = zmq.Context()
+        server = context.socket(zmq.ROUTER)
+        port = server.bind_to_random_port('tcp://127.0.0.1')
+        journal = self.hostsd.Journal(self.hostsd.JOURNAL_FILE)
+        thread = threading.Thread(target=self.hostsd.serve, args=(server, journal, 0.2, 5), daemon=True)
+        thread.start()
+
+        clients = []
+        for i in range(10):
+            client = context.socket(zmq.REQ)
+            client.connect('tcp://127.0.0.1:{0}'.format(port))
+            clients.append(client)
+
+        start = time.monotonic()
+        for i, client in enumerate(clients):
+            client.send(add_hosts('dhcp-{0}'.format(i), ('host{0}'.format(i), '192.0.2.{0}'.format(i + 1))).encode())
+        for client in clients:
+            self.assertEqual(json.loads(client.recv()), {'data': None})
+        # Replies come after the changes are written, all at once
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertIn('192.0.2.10\thost9', self.read(self.hostsd.HOSTS_FILE))
+        # The journal got too long and was compacted
+        self.assertEqual(sorted(self.writes), ['hosts', 'hostsd.state', 'resolv.conf'])
+        self.assertEqual(journal.entries, 0)
+        self.assertEqual(len(json.loads(self.read(self.hostsd.STATE_FILE))['hosts']), 10)
+
+        # Errors and queries are answered right away
+        start = time.monotonic()
+        clients[0].send(json.dumps({'type': 'hosts', 'op': 'frobnicate', 'tag': 'foo'}).encode())
+        self.assertEqual(json.loads(clients[0].recv()), {'error': 'Unknown operation frobnicate'})
+        self.assertLess(time.monotonic() - start, 0.2)
+
+        for client in clients:
+            client.close(linger=0)
+
+    def test_client(self):
+        context = zmq.Context()
+        server = context.socket(zmq.ROUTER)
+        socket_path = 'ipc://' + os.path.join(self.dir, 'hostsd.sock')
+        server.bind(socket_path)
+        journal = self.hostsd.Journal(self.hostsd.JOURNAL_FILE)
+        thread = threading.Thread(target=self.hostsd.serve, args=(server, journal, 0.01), daemon=True)
+        thread.start()
+
+        hostsd_client = vyos.hostsd_client
+        socket_path_orig = hostsd_client.SOCKET_PATH
+        hostsd_client.SOCKET_PATH = socket_path
+        hostsd_client._disconnect()
+        try:
+            client = hostsd_client.Client()
+            with client.batch() as batch:
+                batch.add_name_servers('static', ['192.0.2.53'])
+                for i in range(100):
+                    batch.add_hosts('dhcp-{0}'.format(i), [{'host': 'host{0}'.format(i),
+                        'address': '192.0.2.{0}'.format(i + 1), 'aliases': []}])
+                batch.get_name_servers('static')
+            self.assertEqual(batch.results[-1], ['192.0.2.53'])
+            self.assertEqual(len(self.hostsd.STATE['hosts']), 100)
+            # Changes of the batch are journaled and written together
+            self.assertEqual(len(self.read(self.hostsd.JOURNAL_FILE).splitlines()), 1)
+            self.assertEqual(sorted(self.writes), ['hosts', 'resolv.conf'])
+
+            # Clients share the connection
+            self.assertEqual(hostsd_client.Client().get_name_servers('static'), ['192.0.2.53'])
+            self.assertIs(hostsd_client._socket, hostsd_client._connect())
+
+            with self.assertRaisesRegex(hostsd_client.VyOSHostsdError, 'Unknown operation frobnicate'):
+                client.send_batch([{'type': 'hosts', 'op': 'frobnicate'}])
+        finally:
+            hostsd_client._disconnect()
+            hostsd_client.SOCKET_PATH = socket_path_orig
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import io
+import os
+import json
+import types
+import unittest
+import urllib.parse
+import importlib.machinery
+from unittest import TestCase
+
+import vyos.configindex
+from vyos.configversions import ConfigVersions
+
+try:
+    from src.tests.helper import FakeConfig
+except ModuleNotFoundError:  # for unittest.main()
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+    from src.tests.helper import FakeConfig
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
+
+loader = importlib.machinery.SourceFileLoader('vyos_http_api_server',
+    os.path.join(base_dir, 'src/services/vyos-http-api-server'))
+server = types.ModuleType(loader.name)
+loader.exec_module(server)
+
+
+running_config = """
+system {
+    host-name vyos
+    name-server 192.0.2.1
+    name-server 192.0.2.2
+}
+"""
+
+node_index = vyos.configindex.NodeIndex({
+    'system': {'type': 'node', 'children': {
+        'host-name': {'type': 'leaf'},
+        'name-server': {'type': 'leaf', 'multi': True}}}})
+
+
+class ShowConfig(FakeConfig):
+    def _run(self, cmd):
+        if cmd[1] == 'showConfig':
+            return self.show_config_output
+        return super()._run(cmd)
+
+
+class TestHTTPAPIRetrieve(TestCase):
+    def setUp(self):
+        self.show_config_output = "host-name vyos\n"
+        def make_config():
+            config = ShowConfig(running_config, running_config, node_index=node_index)
+            config.show_config_output = self.show_config_output
+            return config
+        server.app.config['vyos_keys'] = [{'id': 'test', 'key': 'test'}]
+        server.app.config['vyos_versions'] = ConfigVersions(max_age=60, config_class=make_config)
+
+    def retrieve(self, data, headers={}):
+        body = urllib.parse.urlencode({'key': 'test', 'data': json.dumps(data)}).encode()
+        return self.request('POST', '/retrieve', body, headers)
+
+    def request(self, method, path, body=b'', headers={}):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }
+        for name, value in headers.items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        response = []
+        def start_response(status, headers, exc_info=None):
+            response[:] = [status, dict((k.lower(), v) for k, v in headers)]
+        result = server.app(environ, start_response)
+        chunks = list(result)
+        status, headers = response
+        return int(status.split()[0]), headers, chunks
+
+    def test_single(self):
+        status, headers, chunks = self.retrieve({'op': 'returnValues', 'path': ['system', 'name-server']})
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(b''.join(chunks)),
+                         {'success': True, 'data': ['192.0.2.1', '192.0.2.2'], 'error': None})
+        self.assertIn('etag', headers)
+
+    def test_invalid_op(self):
+        status, _, chunks = self.retrieve({'op': 'returnEverything', 'path': ['system']})
+        self.assertEqual(status, 400)
+        self.assertEqual(json.loads(b''.join(chunks))['error'], "\"returnEverything\" is not a valid operation")
+
+    def test_etag(self):
+        _, headers, _ = self.retrieve({'op': 'exists', 'path': ['system']})
+        etag = headers['etag']
+        # a POST with a matching If-None-Match, RFC 7232 section 3.2
+        status, headers, chunks = self.retrieve({'op': 'exists', 'path': ['system']},
+                                                headers={'If-None-Match': etag})
+        self.assertEqual(status, 412)
+        self.assertEqual(b''.join(chunks), b'')
+
+        # the same query, polled with GET
+        query = '/retrieve?' + urllib.parse.urlencode({'data': json.dumps({'op': 'exists', 'path': ['system']})})
+        auth = {'Authorization': 'Bearer test'}
+        status, headers, chunks = self.request('GET', query, headers=auth)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['etag'], etag)
+        self.assertEqual(json.loads(b''.join(chunks))['data'], True)
+        status, headers, chunks = self.request('GET', query, headers=dict(auth, **{'If-None-Match': etag}))
+        self.assertEqual(status, 304)
+        self.assertEqual(headers['etag'], etag)
+        self.assertEqual(b''.join(chunks), b'')
+        status, _, _ = self.request('HEAD', query, headers=dict(auth, **{'If-None-Match': etag}))
+        self.assertEqual(status, 304)
+        status, _, _ = self.request('GET', query + '&key=test', headers={'If-None-Match': etag})
+        self.assertEqual(status, 401)
+
+        # ETags are per query
+        status, headers, _ = self.retrieve({'op': 'exists', 'path': ['system', 'host-name']},
+                                           headers={'If-None-Match': etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers['etag'], etag)
+        status, _, _ = self.retrieve({'op': 'showConfig', 'path': ['system'], 'configFormat': 'json'},
+                                     headers={'If-None-Match': etag})
+        self.assertEqual(status, 200)
+
+        for header in ['"0-1"', '*']:
+            status, _, _ = self.retrieve({'op': 'exists', 'path': ['system']},
+                                         headers={'If-None-Match': header})
+            self.assertEqual(status, 200)
+
+    def test_batch(self):
+        status, _, chunks = self.retrieve([
+            {'op': 'returnValue', 'path': ['system', 'host-name']},
+            {'op': 'returnValue', 'path': ['system', 'name-server']},
+            {'op': 'showConfig', 'path': ['system'], 'configFormat': 'json'},
+            {'path': ['system']},
+            {'op': 'exists', 'path': ['system', 'domain-name']},
+        ])
+        self.assertEqual(status, 200)
+        resp = json.loads(b''.join(chunks))
+        self.assertTrue(resp['success'])
+        self.assertEqual(resp['data'], [
+            {'success': True, 'data': 'vyos', 'error': None},
+            {'success': False, 'data': None,
+             'error': "Cannot use return_value on multi node: system name-server"},
+            {'success': True, 'data': {'host-name': 'vyos', 'name-server': ['192.0.2.1', '192.0.2.2']},
+             'error': None},
+            {'success': False, 'data': None,
+             'error': "Missing required field. \"op\" and \"path\" fields are required"},
+            {'success': True, 'data': False, 'error': None},
+        ])
+
+    def test_stream(self):
+        self.show_config_output = "".join("    address 192.0.2.{0}/32\n".format(i % 256) for i in range(100000))
+        status, _, chunks = self.retrieve([{'op': 'showConfig', 'path': ['interfaces']}])
+        self.assertEqual(status, 200)
+        self.assertGreater(len(chunks), 10)
+        self.assertLessEqual(max(len(c) for c in chunks), server.STREAM_CHUNK_SIZE)
+        self.assertEqual(json.loads(b''.join(chunks))['data'][0]['data'], self.show_config_output)
+
+        status, _, chunks = self.retrieve({'op': 'showConfig', 'path': ['interfaces']})
+        self.assertGreater(len(chunks), 10)
+        self.assertEqual(json.loads(b''.join(chunks))['data'], self.show_config_output)
+
+    def test_metrics(self):
+        status, _, _ = self.request('GET', '/metrics')
+        self.assertEqual(status, 401)
+
+        self.retrieve({'op': 'exists', 'path': ['system']})
+        self.retrieve({'op': 'dropEverything', 'path': ['system']})
+        self.retrieve([{'op': 'exists', 'path': ['system']}])
+
+        status, _, _ = self.request('GET', '/metrics?key=test')
+        self.assertEqual(status, 401)
+        status, _, _ = self.request('GET', '/metrics', headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(status, 401)
+
+        status, headers, chunks = self.request('GET', '/metrics', headers={'Authorization': 'Bearer test'})
+        self.assertEqual(status, 200)
+        self.assertTrue(headers['content-type'].startswith('text/plain; version=0.0.4'))
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertIn('# TYPE vyos_http_api_request_duration_seconds histogram', lines)
+        for labels in ['route="/retrieve",op="exists",code="200"',
+                       'route="/retrieve",op="invalid",code="400"',
+                       'route="/retrieve",op="batch",code="200"']:
+            self.assertTrue([l for l in lines if l.startswith('vyos_http_api_requests_total{' + labels + '}')],
+                            labels)
+        self.assertIn('vyos_http_api_commit_failures_total 0', lines)
+
+    def test_metrics_exceptions(self):
+        # requests whose callback raises are counted too
+        app = server.bottle.Bottle()
+        app.install(server.measure_request)
+        app.route('/abort', callback=lambda: server.bottle.abort(403))
+        app.route('/fail', callback=lambda: 1 / 0)
+        for path in ['/abort', '/fail']:
+            app({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'wsgi.input': io.BytesIO(b''),
+                 'wsgi.errors': io.StringIO()}, lambda status, headers, exc_info=None: None)
+
+        lines = server.metrics.render().splitlines()
+        for labels in ['route="/abort",op="",code="403"', 'route="/fail",op="",code="500"']:
+            self.assertTrue([l for l in lines if l.startswith('vyos_http_api_requests_total{' + labels + '}')],
+                            labels)
+
+
+if __name__ == '__main__':
+    unittest.main()
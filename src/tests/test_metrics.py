@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import unittest
+from unittest import TestCase
+
+from vyos.metrics import Registry, Counter, Gauge, Histogram
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter(self):
+        requests = self.registry.register(Counter('requests_total', 'Requests handled', ['route', 'code']))
+        requests.inc(route='/retrieve', code='200')
+        requests.inc(route='/retrieve', code='200')
+        requests.inc(route='/configure', code='400')
+        self.assertEqual(self.registry.render(),
+            '# HELP requests_total Requests handled\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{route="/configure",code="400"} 1\n'
+            'requests_total{route="/retrieve",code="200"} 2\n')
+
+    def test_missing_label(self):
+        requests = Counter('requests_total', 'Requests handled', ['route'])
+        with self.assertRaises(ValueError):
+            requests.inc()
+
+    def test_function(self):
+        depth = {'read': 3}
+        self.registry.register(Gauge('queue_depth', 'Queue depth', function=lambda: 5))
+        self.registry.register(Gauge('pool_depth', 'Pool depth', ['pool'],
+                                     function=lambda: dict(((k,), v) for k, v in depth.items())))
+        lines = self.registry.render().splitlines()
+        self.assertIn('queue_depth 5', lines)
+        self.assertIn('pool_depth{pool="read"} 3', lines)
+        depth['read'] = 0
+        self.assertIn('pool_depth{pool="read"} 0', self.registry.render().splitlines())
+
+    def test_escape(self):
+        gauge = self.registry.register(Gauge('value', 'Value', ['name']))
+        gauge.set(1.5, name='a "b"\\\n')
+        self.assertIn('value{name="a \\"b\\"\\\\\\n"} 1.5', self.registry.render().splitlines())
+
+    def test_histogram(self):
+        duration = self.registry.register(Histogram('duration_seconds', 'Duration', ['op'], buckets=[0.1, 1]))
+        for value in [0.05, 0.1, 0.5, 2]:
+            duration.observe(value, op='set')
+        self.assertEqual(self.registry.render().splitlines()[2:], [
+            'duration_seconds_bucket{op="set",le="0.1"} 2',
+            'duration_seconds_bucket{op="set",le="1"} 3',
+            'duration_seconds_bucket{op="set",le="+Inf"} 4',
+            'duration_seconds_sum{op="set"} 2.65',
+            'duration_seconds_count{op="set"} 4',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
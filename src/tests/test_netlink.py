@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import sys
+import json
+import shutil
+import struct
+import unittest
+import subprocess
+from unittest import TestCase
+
+try:
+    import vyos.netlink
+except ModuleNotFoundError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../python'))
+    import vyos.netlink
+
+import vyos.ifconfig
+
+python_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../python')
+
+NETNS = 'vyos-test-netlink'
+
+
+def can_use_netns():
+    if os.geteuid() != 0 or not shutil.which('ip'):
+        return False
+    if subprocess.run(['ip', 'netns', 'add', NETNS], stderr=subprocess.DEVNULL).returncode != 0:
+        return False
+    subprocess.run(['ip', 'netns', 'del', NETNS])
+    return True
+
+def kernel_supports(kind, *args):
+    """ Returns: whether links of that kind can be created in a namespace """
+    subprocess.run(['ip', 'netns', 'add', NETNS], check=True)
+    try:
+        subprocess.run(['ip', '-n', NETNS, 'link', 'add', 'veth0', 'type', 'veth', 'peer', 'name', 'veth1'],
+                       check=True)
+        return subprocess.run(['ip', '-n', NETNS, 'link', 'add', 'test0'] + list(args) + ['type', kind],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+    finally:
+        subprocess.run(['ip', 'netns', 'del', NETNS])
+
+netns = can_use_netns()
+kinds = {}
+if netns:
+    kinds = {
+        'bridge': kernel_supports('bridge'),
+        'bond': kernel_supports('bond'),
+        'dummy': kernel_supports('dummy'),
+        'vlan': kernel_supports('vlan', 'link', 'veth0'),
+    }
+
+
+class TestNetlinkMessages(TestCase):
+    def test_attr(self):
+        self.assertEqual(vyos.netlink.attr(3, 'eth0'), struct.pack('=HH', 9, 3) + b'eth0\0\0\0\0')
+        nested = vyos.netlink.attr(18, [vyos.netlink.attr(1, 'vlan')])
+        self.assertEqual(struct.unpack_from('=HH', nested), (16, 18 | vyos.netlink.NLA_F_NESTED))
+
+        attrs = vyos.netlink.parse_attrs(nested + vyos.netlink.attr(4, b'\x01\x02'))
+        self.assertEqual(attrs[4], b'\x01\x02')
+        self.assertEqual(vyos.netlink.parse_attrs(attrs[18]), {1: b'vlan\0'})
+
+    def test_vlan_info(self):
+        info = vyos.netlink.vlan_info(10, '802.1ad', ingress_qos='1:2 3:4')
+        attrs = vyos.netlink.parse_attrs(b''.join(info))
+        self.assertEqual(attrs[vyos.netlink.IFLA_VLAN_ID], struct.pack('=H', 10))
+        self.assertEqual(attrs[vyos.netlink.IFLA_VLAN_PROTOCOL], b'\x88\xa8')
+        mappings = vyos.netlink.parse_attrs(attrs[vyos.netlink.IFLA_VLAN_INGRESS_QOS])
+        self.assertEqual(len(mappings), 1)
+        self.assertRaises(ValueError, vyos.netlink.vlan_info, 10, '802.1x')
+
+    def test_backend_selection(self):
+        env = os.environ.get('VYOS_IFCONFIG_BACKEND')
+        os.environ['VYOS_IFCONFIG_BACKEND'] = 'iproute2'
+        try:
+            self.assertIsNone(vyos.netlink.get_socket())
+        finally:
+            if env is None:
+                del os.environ['VYOS_IFCONFIG_BACKEND']
+            else:
+                os.environ['VYOS_IFCONFIG_BACKEND'] = env
+
+
+class NetnsTestCase(TestCase):
+    """ Runs vyos.ifconfig code in a network namespace with a veth pair """
+    def setUp(self):
+        subprocess.run(['ip', 'netns', 'add', NETNS], check=True)
+        self.ip('link', 'add', 'veth0', 'type', 'veth', 'peer', 'name', 'veth1')
+
+    def tearDown(self):
+        subprocess.run(['ip', 'netns', 'del', NETNS], check=True)
+
+    def ip(self, *args):
+        subprocess.run(['ip', '-n', NETNS] + list(args), check=True)
+
+    def run_in_netns(self, code, backend='netlink'):
+        env = dict(os.environ, PYTHONPATH=python_dir, VYOS_IFCONFIG_BACKEND=backend)
+        # ip netns exec remounts /sys, which vyos.ifconfig reads
+        p = subprocess.run(['ip', 'netns', 'exec', NETNS, sys.executable, '-c',
+                            'from vyos.ifconfig import *\n' + code],
+                           env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.assertEqual(p.returncode, 0, p.stdout.decode())
+        return p.stdout.decode()
+
+    def links(self):
+        out = subprocess.check_output(['ip', '-n', NETNS, '-details', '-json', 'link', 'show'])
+        return {l['ifname']: l for l in json.loads(out)}
+
+    def addrs(self, ifname):
+        out = subprocess.check_output(['ip', '-n', NETNS, '-json', 'addr', 'show', 'dev', ifname])
+        return ['{0}/{1}'.format(a['local'], a['prefixlen']) for a in json.loads(out)[0]['addr_info']
+                if a.get('scope') != 'link']
+
+    def for_backends(self, test):
+        for backend in ['netlink', 'iproute2']:
+            with self.subTest(backend=backend):
+                test(backend)
+                self.tearDown()
+                self.setUp()
+
+
+@unittest.skipUnless(netns, 'needs root and network namespaces')
+class TestNetlinkBackend(NetnsTestCase):
+    """
+    Changes made by vyos.ifconfig in a network namespace, with both backends.
+    Link kinds the kernel doesn't support are skipped.
+    """
+    def test_link(self):
+        def test(backend):
+            self.run_in_netns("""
+i = Interface('veth0')
+i.set_mtu(1400)
+i.set_mac('00:53:00:00:00:01')
+i.set_state('up')
+i.add_addr('192.0.2.1/24')
+i.add_addr('2001:db8::1/64')
+""", backend)
+            veth = self.links()['veth0']
+            self.assertEqual(veth['mtu'], 1400)
+            self.assertEqual(veth['address'], '00:53:00:00:00:01')
+            self.assertIn('UP', veth['flags'])
+            self.assertEqual(self.addrs('veth0'), ['192.0.2.1/24', '2001:db8::1/64'])
+
+            self.run_in_netns("""
+Interface('veth0').del_addr('192.0.2.1/24')
+""", backend)
+            self.assertEqual(self.addrs('veth0'), ['2001:db8::1/64'])
+
+            out = self.run_in_netns("""
+i = Interface('veth0')
+print(i.get_state())
+Interface('veth1').set_state('up')
+print(i.get_state())
+i.set_state('down')
+print(i.get_state())
+""", backend)
+            self.assertEqual(out.split(), ['lowerlayerdown', 'up', 'down'])
+        self.for_backends(test)
+
+    @unittest.skipUnless(kinds.get('bridge'), 'no bridge support')
+    def test_bridge(self):
+        def test(backend):
+            self.run_in_netns("""
+BridgeIf('br0').add_port('veth0')
+""", backend)
+            self.assertEqual(self.links()['veth0']['master'], 'br0')
+            self.run_in_netns("""
+b = BridgeIf('br0')
+b.del_port('veth0')
+# a member deleted earlier in the same commit
+b.del_port('nonexistent')
+b.remove()
+""", backend)
+            links = self.links()
+            self.assertNotIn('br0', links)
+            self.assertNotIn('master', links['veth0'])
+        self.for_backends(test)
+
+    @unittest.skipUnless(kinds.get('vlan'), 'no VLAN support')
+    def test_vlan(self):
+        def test(backend):
+            self.run_in_netns("""
+v = VLANIf('veth0').add_vlan(10, ethertype='802.1ad', egress_qos='1:2')
+v.add_vlan(20)
+VLANIf('veth0').add_vlan(30)
+""", backend)
+            links = self.links()
+            vlan = links['veth0.10']['linkinfo']['info_data']
+            self.assertEqual((vlan['protocol'], vlan['id']), ('802.1ad', 10))
+            self.assertEqual(vlan['egress_qos'][0], {'from': 1, 'to': 2})
+            self.assertEqual(links['veth0.10.20']['linkinfo']['info_data']['protocol'], '802.1Q')
+
+            self.run_in_netns("""
+VLANIf('veth0').del_vlan(10)
+""", backend)
+            self.assertEqual(sorted(self.links()), ['lo', 'veth0', 'veth0.30', 'veth1'])
+        self.for_backends(test)
+
+    @unittest.skipUnless(kinds.get('bond'), 'no bonding support')
+    def test_bond(self):
+        def test(backend):
+            self.run_in_netns("""
+BondIf('bond0')
+""", backend)
+            self.assertEqual(self.links()['bond0']['linkinfo']['info_kind'], 'bond')
+            self.run_in_netns("""
+BondIf('bond0').remove()
+""", backend)
+            self.assertNotIn('bond0', self.links())
+        self.for_backends(test)
+
+    def test_vxlan(self):
+        def test(backend):
+            self.run_in_netns("""
+c = VXLANIf.get_config()
+c.update({'vni': 100, 'remote': '192.0.2.2', 'dev': 'veth0'})
+VXLANIf('vxlan0', config=c)
+""", backend)
+            vxlan = self.links()['vxlan0']['linkinfo']['info_data']
+            self.assertEqual((vxlan['id'], vxlan['remote'], vxlan['port']), (100, '192.0.2.2', 8472))
+            self.run_in_netns("""
+VXLANIf('vxlan0').remove()
+""", backend)
+            self.assertNotIn('vxlan0', self.links())
+        self.for_backends(test)
+
+    def test_errors(self):
+        out = self.run_in_netns("""
+import errno
+import vyos.netlink
+Interface('veth0').add_addr('192.0.2.1/24')
+try:
+    vyos.netlink.addr_add('veth0', '192.0.2.1/24')
+except vyos.netlink.NetlinkError as e:
+    print(errno.errorcode[e.errno])
+try:
+    vyos.netlink.link_del('nonexistent')
+except vyos.netlink.NetlinkError as e:
+    print(errno.errorcode[e.errno])
+try:
+    vyos.netlink.link_add('test0', 'nonexistent')
+except vyos.netlink.NetlinkError as e:
+    print(e.errno == errno.EOPNOTSUPP)
+""")
+        self.assertEqual(out.split(), ['EEXIST', 'ENODEV', 'True'])
+
+    def test_ifconfig_errors(self):
+        # errors of changes that are already made are ignored, as with ip
+        out = self.run_in_netns("""
+import errno
+import vyos.netlink
+i = Interface('veth0')
+print(i._ip('link set veth2 up', vyos.netlink.link_set, 'veth2', state='up') != '')
+print(i._ip('link add veth0 type dummy', vyos.netlink.link_add, 'veth0', 'dummy') != '')
+try:
+    i._ip('link set veth0 mtu 10', vyos.netlink.link_set, 'veth0', mtu=10)
+except vyos.netlink.NetlinkError as e:
+    print(errno.errorcode[e.errno])
+""")
+        self.assertEqual(out.split(), ['True', 'True', 'EINVAL'])
+
+
+@unittest.skipUnless(netns, 'needs root and network namespaces')
+class TestVLANPlan(NetnsTestCase):
+    def test_configure(self):
+        def test(backend):
+            # Links that exist are configured, not created, whatever their kind
+            for vlan in ['10', '20', '20.30']:
+                self.ip('link', 'add', 'veth0.' + vlan, 'type', 'veth', 'peer', 'name', 'peer' + vlan)
+            self.ip('addr', 'add', '192.0.2.1/24', 'dev', 'veth0.10')
+
+            out = self.run_in_netns("""
+plan = VLANIf('veth0').plan()
+plan.del_vlan(20)
+v = plan.add_vlan(10)
+v.set_alias('customer')
+v.set_mtu(1400)
+v.set_mac('00:53:00:00:00:10')
+v.set_state('up')
+v.del_addr('192.0.2.9/24')
+v.add_addr('192.0.2.1/24')
+v.add_addr('2001:db8::1/64')
+print(plan.commit())
+""", backend)
+            self.assertEqual(out.strip(), '[]')
+            links = self.links()
+            self.assertNotIn('veth0.20', links)
+            self.assertNotIn('veth0.20.30', links)
+            vlan = links['veth0.10']
+            self.assertEqual((vlan['mtu'], vlan['address'], vlan['ifalias']), (1400, '00:53:00:00:00:10', 'customer'))
+            self.assertIn('UP', vlan['flags'])
+            self.assertEqual(self.addrs('veth0.10'), ['192.0.2.1/24', '2001:db8::1/64'])
+        self.for_backends(test)
+
+    def test_errors(self):
+        def test(backend):
+            self.ip('link', 'add', 'veth0.10', 'type', 'veth', 'peer', 'name', 'peer10')
+            out = self.run_in_netns("""
+import subprocess
+plan = VLANIf('veth0').plan()
+v = plan.add_vlan(10)
+v.set_state('up')
+v.add_addr('192.0.2.1/24')
+# Gone before the commit
+subprocess.run(['ip', 'link', 'del', 'veth0.10'], check=True)
+for i, error in plan.commit():
+    print(i, plan.operations[i].cmd)
+""", backend)
+            self.assertEqual(out.splitlines(), ['0 link set dev veth0.10 up', '1 addr add 192.0.2.1/24 dev veth0.10'])
+        self.for_backends(test)
+
+    @unittest.skipUnless(kinds.get('vlan'), 'no VLAN support')
+    def test_create(self):
+        def test(backend):
+            out = self.run_in_netns("""
+plan = VLANIf('veth0').plan()
+for vlan_id in range(1, 101):
+    v = plan.add_vlan(vlan_id)
+    v.set_state('up')
+    v.add_addr('10.0.{}.1/24'.format(vlan_id))
+s = plan.add_vlan(200, ethertype='802.1ad')
+s.add_vlan(300).add_addr('192.0.2.1/24')
+print(plan.commit())
+""", backend)
+            self.assertEqual(out.strip(), '[]')
+            links = self.links()
+            self.assertEqual(len([l for l in links if l.startswith('veth0.')]), 102)
+            self.assertEqual(links['veth0.200']['linkinfo']['info_data']['protocol'], '802.1ad')
+            self.assertEqual(self.addrs('veth0.200.300'), ['192.0.2.1/24'])
+            self.assertEqual(self.addrs('veth0.100'), ['10.0.100.1/24'])
+        self.for_backends(test)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class RecordingIf(vyos.ifconfig.Interface):
+    """ Interface with settings in a dict, recording the setters called """
+    def __init__(self, settings):
+        super().__init__('lo')
+        self.settings = settings
+        self.calls = []
+
+    def get_settings(self):
+        return dict(self.settings)
+
+    def set_mtu(self, mtu):
+        self.calls.append(('set_mtu', mtu))
+
+    def set_state(self, state):
+        self.calls.append(('set_state', state))
+
+    def set_mac(self, mac):
+        self.calls.append(('set_mac', mac))
+
+    def add_addr(self, addr):
+        self.calls.append(('add_addr', addr))
+
+
+class TestReconciler(TestCase):
+    def test_apply(self):
+        i = RecordingIf({'mtu': '1500', 'state': 'up', 'mac': '00:53:00:00:00:01'})
+        r = i.reconciler()
+        r.set_mtu(1500)
+        r.set_mac('00:53:00:00:00:02')
+        r.add_addr('192.0.2.1/24')
+        r.set_state('down')
+        self.assertEqual(i.calls, [])
+        self.assertEqual(r.changes(), [('mac', '00:53:00:00:00:01', '00:53:00:00:00:02'),
+                                       ('state', 'up', 'down')])
+
+        self.assertEqual(r.apply(), [('mac', '00:53:00:00:00:01', '00:53:00:00:00:02'),
+                                     ('state', 'up', 'down')])
+        self.assertEqual(i.calls, [('set_mac', '00:53:00:00:00:02'), ('add_addr', '192.0.2.1/24'),
+                                   ('set_state', 'down')])
+
+    def test_replace(self):
+        i = RecordingIf({'mtu': '1500', 'state': 'down', 'mac': None})
+        r = i.reconciler()
+        r.set_state('up')
+        r.set_mtu(1400)
+        r.set_state('down')
+        # an empty MAC address changes nothing, an unknown setting is always set
+        r.set_mac('')
+        self.assertEqual(r.apply(), [('mtu', '1500', '1400')])
+        self.assertEqual(i.calls, [('set_mtu', 1400)])
+
+        r.set_mac('00:53:00:00:00:01')
+        self.assertEqual(r.apply(), [('mac', None, '00:53:00:00:00:01')])
+
+
+@unittest.skipUnless(netns, 'needs root and network namespaces')
+class TestAddressesNetns(NetnsTestCase):
+    def test_secondary(self):
+        def test(backend):
+            # deleting the primary address deletes the secondary one as well
+            self.run_in_netns("""
+i = Interface('veth0')
+i.add_addr('192.0.2.1/24')
+i.add_addr('192.0.2.2/24')
+i.del_addr('192.0.2.1/24')
+i.add_addr('192.0.2.2/24')
+""", backend)
+            self.assertEqual(self.addrs('veth0'), ['192.0.2.2/24'])
+        self.for_backends(test)
+
+
+@unittest.skipUnless(netns, 'needs root and network namespaces')
+class TestReconcilerNetns(NetnsTestCase):
+    def test_interface(self):
+        def test(backend):
+            out = self.run_in_netns("""
+for n in range(2):
+    r = Interface('veth0').reconciler()
+    r.set_alias('uplink')
+    r.set_mtu(1400)
+    r.set_mac('00:53:00:00:00:01')
+    r.set_arp_cache_tmo(60)
+    r.set_proxy_arp(1)
+    r.set_state('up')
+    print(sorted(setting for setting, _, _ in r.apply()))
+""", backend)
+            self.assertEqual(out.splitlines(), ["['alias', 'arp_cache_tmo', 'mac', 'mtu', 'proxy_arp', 'state']", '[]'])
+            veth = self.links()['veth0']
+            self.assertEqual((veth['mtu'], veth['address'], veth['ifalias']), (1400, '00:53:00:00:00:01', 'uplink'))
+        self.for_backends(test)
+
+    @unittest.skipUnless(kinds.get('bridge'), 'no bridge support')
+    def test_bridge(self):
+        def test(backend):
+            out = self.run_in_netns("""
+for n in range(2):
+    r = BridgeIf('br0').reconciler()
+    r.set_forward_delay(4)
+    r.set_hello_time(1)
+    r.set_priority(8192)
+    r.set_stp(1)
+    r.add_port('veth0')
+    r.set_state('up')
+    print(sorted(setting for setting, _, _ in r.apply()))
+    r = STPIf('veth0').reconciler()
+    r.set_path_cost(10)
+    print(sorted(setting for setting, _, _ in r.apply()))
+""", backend)
+            self.assertEqual(out.splitlines(), ["['forward_delay', 'hello_time', 'priority', 'state', 'stp_state']",
+                                                "['path_cost']", '[]', '[]'])
+            self.assertEqual(self.links()['veth0']['master'], 'br0')
+        self.for_backends(test)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import unittest
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+import vyos.shellapi
+
+
+class TestShellAPI(TestCase):
+    def tearDown(self):
+        vyos.shellapi.close()
+
+    def test_output_and_exit_code(self):
+        self.assertEqual(vyos.shellapi.run(['printf', 'a b\n"c"\n']), (0, b'a b\n"c"\n'))
+        # Output without a trailing newline
+        self.assertEqual(vyos.shellapi.run(['printf', 'abc']), (0, b'abc'))
+        self.assertEqual(vyos.shellapi.run(['sh', '-c', 'exit 3']), (3, b''))
+
+    def test_quoting(self):
+        arg = "it's $HOME; `true` \"quoted\"\nsecond line"
+        self.assertEqual(vyos.shellapi.run(['printf', '%s', arg]), (0, arg.encode()))
+
+    def test_stderr(self):
+        self.assertEqual(vyos.shellapi.run(['sh', '-c', 'echo err >&2'], stderr=True), (0, b'err\n'))
+
+    def test_large_output(self):
+        code, out = vyos.shellapi.run(['head', '-c', '1000000', '/dev/zero'])
+        self.assertEqual(code, 0)
+        self.assertEqual(len(out), 1000000)
+
+    def test_shared_per_env(self):
+        env = dict(os.environ, VYOS_TEST_VAR='session1')
+        self.assertEqual(vyos.shellapi.run(['sh', '-c', 'echo $VYOS_TEST_VAR'], env=env), (0, b'session1\n'))
+        pid = vyos.shellapi.run(['sh', '-c', 'echo $PPID'], env=env)
+        self.assertEqual(vyos.shellapi.run(['sh', '-c', 'echo $PPID'], env=dict(env)), pid)
+        self.assertNotEqual(vyos.shellapi.run(['sh', '-c', 'echo $PPID']), pid)
+
+    def test_restart(self):
+        # The shell exits while running the command
+        code, out = vyos.shellapi.run(['sh', '-c', 'kill -9 $PPID'])
+        self.assertNotEqual(code, 0)
+        self.assertEqual(vyos.shellapi.run(['echo', 'ok']), (0, b'ok\n'))
+
+    def test_split_exit_code(self):
+        # The exit code line arrives in a read of its own, after the marker
+        coproc = vyos.shellapi._get_coprocess(None)
+        marker = b'\n' + coproc._marker + b' '
+        reads = [b'out' + marker + b'1', b'\n', b'']
+        with patch('vyos.shellapi.os.read', side_effect=reads):
+            self.assertEqual(coproc._read_result(), (1, b'out'))
+
+        reads = [b'out' + marker[:5], marker[5:] + b'0\n', b'']
+        with patch('vyos.shellapi.os.read', side_effect=reads):
+            self.assertEqual(coproc._read_result(), (0, b'out'))
+
+    def test_threads(self):
+        results = []
+        def run(n):
+            env = dict(os.environ, VYOS_TEST_VAR=str(n % 2))
+            results.append(vyos.shellapi.run(['sh', '-c', 'echo $VYOS_TEST_VAR'], env=env))
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(results), [(0, b'0\n')] * 10 + [(0, b'1\n')] * 10)
+        # one shell per environment
+        self.assertEqual(len(vyos.shellapi._coprocesses), 2)
+
+    def test_command_counts(self):
+        before = vyos.shellapi.command_counts().get('true', 0)
+        vyos.shellapi.run(['/bin/true'])
+        vyos.shellapi.run(['true'])
+        self.assertEqual(vyos.shellapi.command_counts()['true'], before + 2)
+
+    def test_legacy_backend(self):
+        os.environ['VYOS_CONFIG_BACKEND'] = 'cli-shell-api'
+        try:
+            self.assertEqual(vyos.shellapi.run(['echo', 'ok']), (0, b'ok\n'))
+            self.assertEqual(vyos.shellapi._coprocesses, {})
+        finally:
+            del os.environ['VYOS_CONFIG_BACKEND']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest import TestCase, mock
+
+import jinja2
+
+import vyos.template
+
+
+script = '''
+import jinja2
+from vyos.template import get_template
+
+config_tmpl = """
+{% for s in servers %}
+server {{ s }}
+{% endfor %}
+"""
+
+def generate(c):
+    return get_template(config_tmpl, trim_blocks=True).render(c)
+
+def generate_inline(c):
+    return get_template("hostname {{ host_name }}").render(c)
+
+def generate_dynamic(c, tmpl):
+    return get_template(tmpl).render(c)
+'''
+
+
+class TestTemplate(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, 'cache')
+        self.reset(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        self.reset(vyos.template.CACHE_DIR)
+
+    def reset(self, cache_dir):
+        vyos.template.CACHE_DIR = cache_dir
+        vyos.template._cache = None
+        vyos.template._environments.clear()
+        vyos.template._templates.clear()
+
+    def test_same_as_jinja2(self):
+        source = "{% for s in servers %}\nserver {{ s }}\n{% endfor %}\n"
+        data = {'servers': ['192.0.2.1', '192.0.2.2']}
+        for options in [{}, {'trim_blocks': True}]:
+            self.assertEqual(vyos.template.get_template(source, **options).render(data),
+                             jinja2.Template(source, **options).render(data))
+
+    def test_compiled_once(self):
+        tmpl = vyos.template.get_template("{{ a }}")
+        self.assertIs(vyos.template.get_template("{{ a }}"), tmpl)
+        self.assertIsNot(vyos.template.get_template("{{ a }}", trim_blocks=True), tmpl)
+
+    def test_build_cache(self):
+        path = os.path.join(self.dir, 'script.py')
+        with open(path, 'w') as f:
+            f.write(script)
+        output = subprocess.check_output(['scripts/build-template-cache', self.cache_dir, path])
+        # The template built at run time is not found
+        self.assertIn(b'Compiled 2 templates', output)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+        with mock.patch.object(jinja2.Environment, 'compile', side_effect=AssertionError):
+            tmpl = vyos.template.get_template("hostname {{ host_name }}")
+        self.assertEqual(tmpl.render(host_name='vyos'), "hostname vyos")
+
+        # Templates that are not in the cache are compiled, but not added to it
+        self.assertEqual(vyos.template.get_template("{{ a }}").render(a=1), "1")
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import json
+import types
+import shutil
+import tempfile
+import unittest
+import importlib.machinery
+from unittest import TestCase
+from unittest.mock import patch
+
+import vyos.trace
+import vyos.configindex
+
+loader = importlib.machinery.SourceFileLoader('show_commit_trace',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '../op_mode/show_commit_trace.py'))
+show_commit_trace = types.ModuleType(loader.name)
+loader.exec_module(show_commit_trace)
+
+node_index = vyos.configindex.NodeIndex({
+    'system': {'type': 'node', 'children': {
+        'host-name': {'type': 'leaf'},
+        'login': {'type': 'node', 'children': {
+            'user': {'type': 'tag', 'children': {
+                'authentication': {'type': 'node', 'children': {
+                    'plaintext-password': {'type': 'leaf'}}}}}}}}}})
+
+
+class TestTrace(TestCase):
+    def setUp(self):
+        self.trace_dir = tempfile.mkdtemp()
+        self._saved = (vyos.trace.TRACE_DIR, vyos.trace._enabled)
+        vyos.trace.TRACE_DIR = self.trace_dir
+        vyos.trace._enabled = True
+        index = patch('vyos.configindex.load', return_value=node_index)
+        index.start()
+        self.addCleanup(index.stop)
+
+    def tearDown(self):
+        vyos.trace.TRACE_DIR, vyos.trace._enabled = self._saved
+        vyos.trace._events = []
+        shutil.rmtree(self.trace_dir)
+
+    def test_traced(self):
+        class Backend(object):
+            @vyos.trace.traced('config')
+            def _run(self, cmd):
+                if cmd[-1] == 'fail':
+                    raise ValueError()
+                return 'ok'
+
+        b = Backend()
+        self.assertEqual(b._run(['cli-shell-api', 'exists', 'system']), 'ok')
+        with self.assertRaises(ValueError):
+            b._run(['cli-shell-api', 'fail'])
+
+        events = vyos.trace._events
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0]['cat'], 'config')
+        self.assertEqual(events[0]['name'], 'exists system')
+        self.assertEqual(events[1]['name'], 'fail')
+
+    def test_no_arguments(self):
+        vyos.trace.add_event('session', ['/opt/vyatta/sbin/my_set', 'system', 'login', 'user', 'vyos',
+                                         'authentication', 'plaintext-password', 'secret'], 1000, 20)
+        vyos.trace.add_event('subprocess', 'ip link set eth0 up', 1000, 20)
+        vyos.trace.add_event('config', ['/bin/cli-shell-api', '--show-working-only', 'showConfig',
+                                        'system', 'unknown', 'secret'], 1000, 20)
+        vyos.trace.add_event('session', ['/opt/vyatta/sbin/my_comment', 'system', 'a secret comment'], 1000, 20)
+        self.assertEqual([e['name'] for e in vyos.trace._events],
+                         ['my_set system login user vyos authentication plaintext-password ...', 'ip',
+                          'showConfig system ...', 'my_comment system ...'])
+        self.assertNotIn('secret', json.dumps(vyos.trace._events))
+
+    def test_summary(self):
+        for path, dur in [(['system', 'host-name'], 30), (['system', 'login'], 10), (['system', 'host-name'], 40)]:
+            vyos.trace.add_event('config', ['/bin/cli-shell-api', 'returnValue'] + path, 1000, dur * 1000)
+        vyos.trace.add_event('subprocess', ['ip', 'link'], 1000, 50000)
+        events = vyos.trace._events
+
+        self.assertEqual(show_commit_trace.slowest_calls(events, 10, backend=True),
+                         [['config', 'returnValue system host-name', 2, '70.0', '40.0'],
+                          ['config', 'returnValue system login', 1, '10.0', '10.0']])
+        self.assertEqual(show_commit_trace.slowest_calls(events, 1, backend=True),
+                         [['config', 'returnValue system host-name', 2, '70.0', '40.0']])
+        self.assertEqual(show_commit_trace.slowest_calls(events, 10),
+                         [['subprocess', 'ip', 1, '50.0', '50.0']])
+
+    def test_disabled(self):
+        vyos.trace._enabled = False
+        def run(cmd):
+            pass
+        self.assertIs(vyos.trace.traced('config')(run), run)
+
+    @unittest.skipUnless(os.geteuid() == 0, 'trace files are only written by root')
+    def test_flush_and_load(self):
+        vyos.trace.add_event('system', 'ip link set eth0 up', 1000, 20)
+        vyos.trace.flush()
+        vyos.trace.add_event('config', ['cli-shell-api', 'exists', 'system'], 2000, 10)
+        vyos.trace.flush()
+        # Nothing to write
+        vyos.trace.flush()
+
+        path = vyos.trace.trace_file()
+        self.assertEqual(os.listdir(self.trace_dir), [os.path.basename(path)])
+
+        events = vyos.trace.load(path)
+        self.assertEqual([e['cat'] for e in events], ['system', 'config'])
+        self.assertEqual(events[0]['name'], 'ip')
+
+        # Also valid JSON for other tools once the array is closed
+        with open(path) as f:
+            data = json.loads(f.read().rstrip().rstrip(',') + ']')
+        self.assertEqual(len([e for e in data if e['ph'] == 'M']), 2)
+
+    @unittest.skipUnless(os.geteuid() == 0, 'trace files are only written by root')
+    def test_symlink(self):
+        target = os.path.join(self.trace_dir, 'target')
+        with open(target, 'w') as f:
+            f.write('root-owned file')
+        os.symlink(target, vyos.trace.trace_file())
+
+        vyos.trace.add_event('system', 'ip link set eth0 up', 1000, 20)
+        vyos.trace.flush()
+        with open(target) as f:
+            self.assertEqual(f.read(), 'root-owned file')
+
+    def test_flag(self):
+        saved = vyos.trace.TRACE_FLAG
+        vyos.trace.TRACE_FLAG = os.path.join(self.trace_dir, 'vyos.trace')
+        try:
+            self.assertFalse(vyos.trace.flag_set())
+            os.symlink('/etc/passwd', vyos.trace.TRACE_FLAG)
+            self.assertFalse(vyos.trace.flag_set())
+            os.unlink(vyos.trace.TRACE_FLAG)
+            open(vyos.trace.TRACE_FLAG, 'w').close()
+            self.assertEqual(vyos.trace.flag_set(), os.geteuid() == 0)
+        finally:
+            vyos.trace.TRACE_FLAG = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import TestCase, mock
+
+import vyos.util
+
+
+class TestWriteFileIfChanged(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'daemon.conf')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_write(self):
+        self.assertTrue(vyos.util.write_file_if_changed(self.path, "listen 192.0.2.1\n"))
+        self.assertEqual(vyos.util.read_file(self.path), "listen 192.0.2.1")
+        self.assertEqual(os.listdir(self.dir), ['daemon.conf'])
+
+    def test_unchanged(self):
+        vyos.util.write_file_if_changed(self.path, "listen 192.0.2.1\n")
+        inode = os.stat(self.path).st_ino
+        self.assertFalse(vyos.util.write_file_if_changed(self.path, "listen 192.0.2.1\n"))
+        self.assertEqual(os.stat(self.path).st_ino, inode)
+
+        self.assertTrue(vyos.util.write_file_if_changed(self.path, "listen 192.0.2.2\n"))
+        self.assertNotEqual(os.stat(self.path).st_ino, inode)
+
+    def test_mode(self):
+        vyos.util.write_file_if_changed(self.path, "secret\n", mode=0o600)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        # The mode of the old file is kept
+        vyos.util.write_file_if_changed(self.path, "other secret\n")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+
+@mock.patch('subprocess.call')
+class TestUpdateService(TestCase):
+    def test_not_running(self, call):
+        call.return_value = 3
+        self.assertEqual(vyos.util.update_service('ntp.service', False), 'start')
+        call.assert_called_with(['sudo', 'systemctl', 'start', 'ntp.service'])
+
+    def test_unchanged(self, call):
+        call.return_value = 0
+        self.assertIsNone(vyos.util.update_service('ntp.service', False))
+        call.assert_called_once_with(['systemctl', 'is-active', '--quiet', 'ntp.service'])
+
+    def test_changed(self, call):
+        call.return_value = 0
+        self.assertEqual(vyos.util.update_service('ntp.service', True), 'restart')
+        self.assertEqual(vyos.util.update_service('nginx.service', True, reload=True), 'reload')
+        call.assert_called_with(['sudo', 'systemctl', 'reload', 'nginx.service'])
+
+    def test_files(self, call):
+        call.return_value = 0
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        cert = os.path.join(tmp, 'cert.pem')
+        with open(cert, 'w') as f:
+            f.write('certificate\n')
+
+        with mock.patch('vyos.util.SERVICE_FILES_DIR', os.path.join(tmp, 'state')):
+            # the files were never seen
+            self.assertEqual(vyos.util.update_service('nginx.service', False, reload=True, files=[cert]), 'reload')
+            self.assertIsNone(vyos.util.update_service('nginx.service', False, reload=True, files=[cert]))
+
+            # a renewed certificate at the same path, with the same config
+            with open(cert, 'w') as f:
+                f.write('renewed certificate\n')
+            self.assertEqual(vyos.util.update_service('nginx.service', False, reload=True, files=[cert]), 'reload')
+            self.assertIsNone(vyos.util.update_service('nginx.service', False, reload=True, files=[cert]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+import os
+import sys
+import random
+import unittest
+import ipaddress
+from unittest import TestCase
+
+try:
+    import vyos.validate
+except ModuleNotFoundError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../python'))
+    import vyos.validate
+
+from vyos.validate import AddressSnapshot
+
+
+def snapshot(addresses):
+    """ Returns: AddressSnapshot: of the addresses by interface, not of the system """
+    s = AddressSnapshot([])
+    for intf, addrs in addresses.items():
+        for addr in addrs:
+            s.add(intf, addr)
+    return s
+
+
+class TestAddressSnapshot(TestCase):
+    def setUp(self):
+        self.addresses = snapshot({
+            'eth0': ['192.0.2.1/24', '198.51.100.1/24', '2001:db8::1/64', 'fe80::1/64'],
+            'eth1': ['203.0.113.1/25', '192.0.2.1/32'],
+        })
+
+    def test_assigned(self):
+        a = self.addresses
+        self.assertTrue(a.is_intf_addr_assigned('eth0', '192.0.2.1'))
+        self.assertTrue(a.is_intf_addr_assigned('eth0', '192.0.2.1/24'))
+        self.assertFalse(a.is_intf_addr_assigned('eth0', '192.0.2.1/25'))
+        self.assertTrue(a.is_intf_addr_assigned('eth1', '192.0.2.1/32'))
+        self.assertFalse(a.is_intf_addr_assigned('eth2', '192.0.2.1'))
+        self.assertTrue(a.is_intf_addr_assigned('eth0', '2001:db8:0::0001/64'))
+        self.assertFalse(a.is_intf_addr_assigned('eth1', '2001:db8::1'))
+
+        self.assertTrue(a.is_addr_assigned('203.0.113.1'))
+        self.assertTrue(a.is_addr_assigned('fe80::1'))
+        self.assertFalse(a.is_addr_assigned('203.0.113.2'))
+        self.assertFalse(a.is_addr_assigned('192.0.2.0'))
+
+        with self.assertRaises(ValueError):
+            a.is_addr_assigned('dhcp')
+
+    def test_connected(self):
+        a = self.addresses
+        self.assertTrue(a.is_subnet_connected('192.0.2.0/24'))
+        self.assertTrue(a.is_subnet_connected('198.51.100.0/24'))
+        self.assertTrue(a.is_subnet_connected('0.0.0.0/0'))
+        self.assertTrue(a.is_subnet_connected('2001:db8::/32'))
+        self.assertFalse(a.is_subnet_connected('192.0.3.0/24'))
+        self.assertFalse(a.is_subnet_connected('2001:db9::/32'))
+
+        # only the first address of a family on an interface is primary
+        self.assertTrue(a.is_subnet_connected('192.0.2.0/24', primary=True))
+        self.assertFalse(a.is_subnet_connected('198.51.100.0/24', primary=True))
+        self.assertTrue(a.is_subnet_connected('203.0.113.0/24', primary=True))
+        self.assertFalse(a.is_subnet_connected('fe80::/10', primary=True))
+
+    def test_add_remove(self):
+        a = self.addresses
+        a.remove('eth0', '192.0.2.1/24')
+        self.assertFalse(a.is_intf_addr_assigned('eth0', '192.0.2.1'))
+        # still on eth1
+        self.assertTrue(a.is_addr_assigned('192.0.2.1'))
+        # the next address became primary
+        self.assertTrue(a.is_subnet_connected('198.51.100.0/24', primary=True))
+        self.assertEqual(a.get_addr('eth0'), ['198.51.100.1/24', '2001:db8::1/64', 'fe80::1/64'])
+
+        a.remove('eth1', '192.0.2.1/32')
+        self.assertFalse(a.is_subnet_connected('192.0.2.0/24'))
+
+        a.add('eth0', '192.0.2.1/24')
+        a.add('eth0', '192.0.2.1/24')
+        self.assertEqual(a.get_addr('eth0'), ['198.51.100.1/24', '192.0.2.1/24', '2001:db8::1/64', 'fe80::1/64'])
+        self.assertFalse(a.is_subnet_connected('192.0.2.0/24', primary=True))
+
+    def test_random(self):
+        # the trie answers as a search through all addresses does
+        rand = random.Random(0)
+        addresses = {}
+        for n in range(50):
+            addresses['eth{}'.format(n)] = ['10.{}.{}.1/{}'.format(rand.randrange(4), rand.randrange(256),
+                                                                     rand.randrange(8, 31))
+                                            for _ in range(rand.randrange(1, 5))]
+        a = snapshot(addresses)
+
+        for _ in range(500):
+            prefixlen = rand.randrange(8, 25)
+            subnet = ipaddress.ip_network('10.{}.{}.0/{}'.format(rand.randrange(4), rand.randrange(256),
+                                                                 prefixlen), strict=False)
+            connected = any(ipaddress.ip_interface(addr).ip in subnet
+                            for addrs in addresses.values() for addr in addrs)
+            primary = any(ipaddress.ip_interface(addrs[0]).ip in subnet for addrs in addresses.values())
+            self.assertEqual(a.is_subnet_connected(str(subnet)), connected)
+            self.assertEqual(a.is_subnet_connected(str(subnet), primary=True), primary)
+
+    def test_system(self):
+        # the loopback interface of the system running the tests
+        a = AddressSnapshot(['lo'])
+        self.assertTrue(a.is_intf_addr_assigned('lo', '127.0.0.1/8'))
+        self.assertIn('127.0.0.1/8', a.get_addr('lo'))
+        self.assertTrue(vyos.validate.is_intf_addr_assigned('lo', '127.0.0.1'))
+        self.assertTrue(vyos.validate.is_subnet_connected('127.0.0.0/8', primary=True))
+        self.assertFalse(AddressSnapshot(['nonexistent0']).is_addr_assigned('127.0.0.1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Compares a serial commit with one where vyos-configd runs the scripts of
+# independent subsystems before the commit engine asks for them.
+#
+# The proposed config is tests/data/config.boot.default with interfaces and
+# the usual services added, committed on top of an empty running config,
+# as at boot. Conf_mode scripts are replaced with stubs that take
+# --apply-time milliseconds, as restarting a daemon does. The scripts are
+# asked for one by one through vyos-configd-client, as the commit engine
+# does, from a vyos-configd instance started with --jobs 1 and --jobs N.
+# Without a commit session to plan from, vyos-configd is given the plan.
+#
+# Runs from the source tree root without a VyOS system:
+#   PYTHONPATH=python python3 tests/benchmarks/commit_executor.py --jobs 4
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import vyos.configindex
+from vyos.commitplan import find_tasks, build_graph
+from vyos.configdiff import ConfigDiff
+from vyos.configsnapshot import ConfigSnapshot
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
+configd = os.path.join(base_dir, 'src/services/vyos-configd')
+client = os.path.join(base_dir, 'src/helpers/vyos-configd-client.py')
+
+# vyos-configd, with this process as the commit process and a fixed plan
+planned_configd = """
+import sys
+import json
+import types
+import psutil
+import importlib.machinery
+import vyos.trace
+from vyos.commitplan import Task
+
+commit_pid, conf_dir, tasks, configd, socket_path, jobs = sys.argv[1:7]
+vyos.trace.COMMIT_PROCESSES = [psutil.Process(int(commit_pid)).name()]
+
+loader = importlib.machinery.SourceFileLoader('vyos_configd', configd)
+module = types.ModuleType(loader.name)
+loader.exec_module(module)
+module.plan = lambda request: [Task(*t, conf_dir=conf_dir) for t in json.loads(tasks)]
+module.jobs = int(jobs)
+module.main(socket_path)
+"""
+
+services_config = """
+service {
+    ssh {
+        port 22
+    }
+    snmp {
+        community public {
+            authorization ro
+        }
+    }
+    lldp {
+        interface all {
+        }
+    }
+    tftp-server {
+        directory /config/tftpboot
+        listen-address 192.0.2.1
+    }
+    mdns {
+        repeater {
+            interface eth0
+            interface eth1
+        }
+    }
+    dns {
+        forwarding {
+            listen-address 192.0.2.1
+        }
+    }
+    dhcp-server {
+        shared-network-name LAN {
+            subnet 192.0.2.0/24 {
+                default-router 192.0.2.1
+                start 192.0.2.100 {
+                    stop 192.0.2.199
+                }
+            }
+        }
+    }
+    https {
+    }
+}
+"""
+
+stub_script = """#!/usr/bin/env python3
+import time
+time.sleep({0})
+"""
+
+
+def make_config(interfaces):
+    with open(os.path.join(base_dir, 'tests/data/config.boot.default')) as f:
+        config = f.read()
+    lines = ["interfaces {"]
+    for i in range(interfaces):
+        lines += ["    ethernet eth{0} {{".format(i),
+                  "        address 192.0.{0}.1/24".format(i + 2),
+                  "    }"]
+    lines += ["}"]
+    return config + "\n".join(lines) + "\n" + services_config
+
+def make_stubs(conf_dir, apply_time):
+    owners = set()
+    for xml in glob.glob(os.path.join(base_dir, 'interface-definitions/*.xml')):
+        with open(xml) as f:
+            for line in f:
+                if 'owner="' in line:
+                    owners.add(line.split('owner="')[1].split('"')[0].split('/')[-1])
+    for name in owners:
+        path = os.path.join(conf_dir, name)
+        with open(path, 'w') as f:
+            f.write(stub_script.format(apply_time / 1000.0))
+        os.chmod(path, 0o755)
+
+def commit(tasks, conf_dir, jobs):
+    """ Returns: the time it takes to run the tasks, and the number of failed ones """
+    socket_path = os.path.join(conf_dir, 'configd.sock')
+    plan = [(t.owner, t.path, t.priority, t.tag_value) for t in tasks]
+    server = subprocess.Popen([sys.executable, '-c', planned_configd, str(os.getpid()), conf_dir,
+                               json.dumps(plan), configd, socket_path, str(jobs)],
+                              stdout=subprocess.PIPE)
+    # Wait until it's ready
+    server.stdout.readline()
+
+    env = dict(os.environ, VYOS_CONFIGD_SOCKET=socket_path)
+    failed = 0
+    try:
+        start = time.time()
+        for task in tasks:
+            if subprocess.call([client] + task.argv, env=task.env(env),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) != 0:
+                failed += 1
+        return time.time() - start, failed
+    finally:
+        server.terminate()
+        server.wait()
+        server.stdout.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=4, help='Number of scripts to run at the same time')
+    parser.add_argument('--interfaces', type=int, default=2, help='Number of ethernet interfaces')
+    parser.add_argument('--apply-time', type=int, default=300, help='Run time of stub scripts, in ms')
+    parser.add_argument('--conf-dir', type=str, help='Real conf_mode scripts to run instead of stubs')
+    args = parser.parse_args()
+
+    fd, index_file = tempfile.mkstemp()
+    os.close(fd)
+    subprocess.check_call([os.path.join(base_dir, 'scripts/build-config-index'), index_file] +
+                          glob.glob(os.path.join(base_dir, 'interface-definitions/*.xml')))
+    index = vyos.configindex.load(index_file)
+    os.unlink(index_file)
+
+    conf_dir = args.conf_dir
+    if conf_dir is None:
+        conf_dir = tempfile.mkdtemp()
+        make_stubs(conf_dir, args.apply_time)
+
+    diff = ConfigDiff(ConfigSnapshot(''), ConfigSnapshot(make_config(args.interfaces)))
+    tasks = find_tasks(index, diff, conf_dir=conf_dir)
+    graph = build_graph(tasks)
+    concurrent = len([i for i, deps in enumerate(graph) if len(deps) < i])
+    print("{0} scripts, {1} of them may run concurrently with earlier ones".format(len(tasks), concurrent))
+    for task, deps in zip(tasks, graph):
+        print("  {0:<5} {1:<40} waits for {2}".format(task.priority, " ".join(task.full_path()), len(deps)))
+
+    timings = {}
+    for jobs in [1, args.jobs]:
+        timings[jobs], failed = commit(tasks, conf_dir, jobs)
+        print("jobs={0}: {1:.3f}s, {2} failed".format(jobs, timings[jobs], failed))
+
+    print("speedup: {0:.2f}x".format(timings[1] / timings[args.jobs]))
+
+    if args.conf_dir is None:
+        shutil.rmtree(conf_dir)
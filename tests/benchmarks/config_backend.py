@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Compares the number of processes forked and the time spent by vyos.config
+# with and without the config snapshot, using the same queries as
+# interfaces-ethernet.py does for every ethernet interface and VLAN.
+#
+# Must be run on a VyOS system, e.g.:
+#   python3 tests/benchmarks/config_backend.py
+
+import sys
+import time
+import argparse
+import subprocess
+
+from vyos.config import Config
+from vyos.configdict import vlan_to_dict
+
+
+forks = 0
+_popen_init = subprocess.Popen.__init__
+
+def counting_popen_init(self, *args, **kwargs):
+    global forks
+    forks += 1
+    _popen_init(self, *args, **kwargs)
+
+subprocess.Popen.__init__ = counting_popen_init
+
+
+def workload(conf):
+    vifs = 0
+    for intf in conf.list_effective_nodes('interfaces ethernet'):
+        base = 'interfaces ethernet ' + intf
+        for vif_type in ['vif', 'vif-s']:
+            conf.set_level(base)
+            for vif in conf.list_nodes(vif_type):
+                conf.set_level('{0} {1} {2}'.format(base, vif_type, vif))
+                vlan_to_dict(conf)
+                vifs += 1
+        conf.set_level('')
+    return vifs
+
+def run(snapshot):
+    global forks
+    forks = 0
+    start = time.time()
+    vifs = workload(Config(snapshot=snapshot))
+    return (vifs, forks, time.time() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=1, help='Number of rounds per backend')
+    args = parser.parse_args()
+
+    for name, snapshot in [('cli-shell-api', False), ('snapshot', True)]:
+        for i in range(args.rounds):
+            vifs, count, elapsed = run(snapshot)
+            print("{0:<14} VLANs: {1:<6} forks: {2:<8} time: {3:.3f}s".format(name, vifs, count, elapsed))
+
+    sys.exit(0)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Measures how long it takes to render "interfaces ethernet" with
+# thousands of vifs to dicts, both with get_config_dict alone and with
+# vlan_to_dict for every vif as interfaces-ethernet.py does.
+#
+# Runs from the source tree root without a VyOS system:
+#   PYTHONPATH=python python3 tests/benchmarks/config_dict.py --vifs 4000
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+
+import vyos.configindex
+from vyos.configdict import vlan_to_dict
+from src.tests.helper import FakeConfig
+
+
+def make_config(vifs):
+    lines = ["interfaces {", "    ethernet eth0 {", "        address 192.0.2.1/24"]
+    for i in range(1, vifs + 1):
+        lines += ["        vif {0} {{".format(i),
+                  "            address 10.{0}.{1}.1/24".format(i // 256, i % 256),
+                  "            description \"customer {0}\"".format(i),
+                  "            mtu 1500",
+                  "        }"]
+    lines += ["    }", "}"]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vifs', type=int, default=4000, help='Number of vifs')
+    args = parser.parse_args()
+
+    fd, index_file = tempfile.mkstemp()
+    os.close(fd)
+    subprocess.check_call(['scripts/build-config-index', index_file,
+                           'interface-definitions/interfaces-ethernet.xml'])
+    index = vyos.configindex.load(index_file)
+    os.unlink(index_file)
+
+    config_text = make_config(args.vifs)
+
+    start = time.time()
+    conf = FakeConfig(config_text, config_text, index)
+    eth = conf.get_config_dict('interfaces ethernet')
+    elapsed = time.time() - start
+    print("get_config_dict: {0} vifs in {1:.3f}s (including snapshot load)".format(len(eth['eth0']['vif']), elapsed))
+
+    start = time.time()
+    conf = FakeConfig(config_text, config_text, index)
+    conf.set_level('interfaces ethernet eth0')
+    vifs = []
+    for vif in conf.list_nodes('vif'):
+        conf.set_level('interfaces ethernet eth0 vif ' + vif)
+        vifs.append(vlan_to_dict(conf))
+    elapsed = time.time() - start
+    print("vlan_to_dict:    {0} vifs in {1:.3f}s (including snapshot load)".format(len(vifs), elapsed))
+    print("backend calls:   {0}".format(len(conf.calls)))
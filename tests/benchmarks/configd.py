@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Compares the time it takes to run config scripts directly and through
+# vyos-configd. A vyos-configd instance is started for the benchmark.
+#
+# Without arguments, a script that only imports what most conf_mode scripts
+# import is used. To measure a boot commit on a VyOS system, pass the scripts
+# that are run at boot, e.g.:
+#   python3 tests/benchmarks/configd.py /usr/libexec/vyos/conf_mode/*.py
+#
+# From the source tree:
+#   PYTHONPATH=python python3 tests/benchmarks/configd.py
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
+configd = os.path.join(base_dir, 'src/services/vyos-configd')
+client = os.path.join(base_dir, 'src/helpers/vyos-configd-client.py')
+
+import_only_script = """#!/usr/bin/env python3
+import os
+import sys
+from copy import deepcopy
+import jinja2
+import netifaces
+import psutil
+from vyos.config import Config
+from vyos.configdict import vlan_to_dict
+from vyos.ifconfig import Interface
+from vyos import ConfigError
+sys.exit(0)
+"""
+
+
+def run(scripts, rounds, via_client, env):
+    start = time.time()
+    for i in range(rounds):
+        for script in scripts:
+            cmd = [script]
+            if via_client:
+                cmd = [client] + cmd
+            # conf_mode scripts may fail outside of a commit, only the time matters
+            subprocess.call(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=5, help='Number of times to run every script')
+    parser.add_argument('SCRIPTS', nargs='*', help='Scripts to run')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    scripts = args.SCRIPTS
+    if not scripts:
+        script = os.path.join(tmp_dir, 'import_only.py')
+        with open(script, 'w') as f:
+            f.write(import_only_script)
+        os.chmod(script, 0o755)
+        scripts = [script] * 40
+
+    socket_path = os.path.join(tmp_dir, 'configd.sock')
+    env = dict(os.environ, VYOS_CONFIGD_SOCKET=socket_path)
+    server = subprocess.Popen([sys.executable, configd, '--socket', socket_path],
+                              stdout=subprocess.PIPE, env=env)
+    # Wait until it's ready
+    server.stdout.readline()
+
+    try:
+        direct = run(scripts, args.rounds, False, env)
+        via_configd = run(scripts, args.rounds, True, env)
+    finally:
+        server.terminate()
+        server.wait()
+
+    runs = len(scripts) * args.rounds
+    print("direct       runs: {0:<6} time: {1:.3f}s  per script: {2:.1f}ms".format(runs, direct, direct * 1000 / runs))
+    print("vyos-configd runs: {0:<6} time: {1:.3f}s  per script: {2:.1f}ms".format(runs, via_configd, via_configd * 1000 / runs))
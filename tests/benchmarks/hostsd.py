@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Measures vyos-hostsd with a large DHCP server: --hosts entries, each
+# with its own tag as on-dhcp-event.sh makes them, and a churn of
+# lease events, each deleting the entries of a tag and adding them again.
+#
+# Reports the cost of applying a message with the tag-indexed store and
+# with the flat dict scan hostsd used to do, and the share of one CPU
+# needed to keep up with --rate events per second, files written out
+# once per --write-window included. Changes are appended to the journal
+# with the --fsync policy, and the cost of compacting the journal into
+# the state file is spread over --compact-after events.
+#
+# Then imports --import-hosts leases into a running hostsd through
+# vyos.hostsd_client, one message per lease and in a single batch.
+#
+# Runs from the source tree root without a VyOS system:
+#   PYTHONPATH=python python3 tests/benchmarks/hostsd.py --hosts 100000 --rate 1000
+
+import os
+import json
+import time
+import types
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import importlib.machinery
+
+import zmq
+
+import vyos.hostsd_client
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
+
+
+def load_hostsd():
+    loader = importlib.machinery.SourceFileLoader('vyos_hostsd',
+        os.path.join(base_dir, 'src/services/vyos-hostsd'))
+    module = types.ModuleType(loader.name)
+    loader.exec_module(module)
+    module.debug = False
+    module.print = lambda *args, **kwargs: None
+    return module
+
+def flat_delete_hosts(data, tag):
+    # What delete_hosts used to do
+    hosts = data['hosts']
+    for k in [h for h in hosts if hosts[h]['tag'] == tag]:
+        del hosts[k]
+
+def address(i):
+    return '10.{0}.{1}.{2}'.format(i >> 16, (i >> 8) & 0xff, i & 0xff)
+
+def add_message(i):
+    return json.dumps({'type': 'hosts', 'op': 'add', 'tag': 'DHCP-' + address(i),
+                       'data': [{'host': 'host{0}'.format(i), 'address': address(i), 'aliases': []}]})
+
+def delete_message(i):
+    return json.dumps({'type': 'hosts', 'op': 'delete', 'tag': 'DHCP-' + address(i)})
+
+def bulk_import(hosts, write_window, batch):
+    hostsd = load_hostsd()
+    work_dir = tempfile.mkdtemp()
+    hostsd.RESOLV_CONF_FILE = os.path.join(work_dir, 'resolv.conf')
+    hostsd.HOSTS_FILE = os.path.join(work_dir, 'hosts')
+    hostsd.STATE_FILE = os.path.join(work_dir, 'hostsd.state')
+    journal = hostsd.Journal(os.path.join(work_dir, 'hostsd.journal'))
+
+    server = zmq.Context.instance().socket(zmq.ROUTER)
+    vyos.hostsd_client.SOCKET_PATH = 'ipc://' + os.path.join(work_dir, 'hostsd.sock')
+    server.bind(vyos.hostsd_client.SOCKET_PATH)
+    threading.Thread(target=hostsd.serve, args=(server, journal, write_window), daemon=True).start()
+
+    start = time.time()
+    client = vyos.hostsd_client.Client()
+    with client.batch() as b:
+        target = b if batch else client
+        for i in range(hosts):
+            target.delete_hosts('DHCP-' + address(i))
+            target.add_hosts('DHCP-' + address(i), [{'host': 'host{0}'.format(i), 'address': address(i), 'aliases': []}])
+    elapsed = time.time() - start
+
+    vyos.hostsd_client._disconnect()
+    shutil.rmtree(work_dir)
+    return elapsed
+
+def churn(handle, hosts, events):
+    random.seed(1)
+    start = time.process_time()
+    for n in range(events):
+        i = random.randrange(hosts)
+        handle(delete_message(i))
+        handle(add_message(i))
+    return (time.process_time() - start) / events
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=100000, help='Number of host entries')
+    parser.add_argument('--rate', type=int, default=1000, help='Lease events per second')
+    parser.add_argument('--events', type=int, default=2000, help='Number of lease events to measure')
+    parser.add_argument('--flat-events', type=int, default=200, help='Number of lease events for the flat scan')
+    parser.add_argument('--write-window', type=float, default=0.05, help='Write window of hostsd, in seconds')
+    parser.add_argument('--fsync', default='always', help='Journal fsync policy')
+    parser.add_argument('--compact-after', type=int, default=10000, help='Journal entries to compact after')
+    parser.add_argument('--import-hosts', type=int, default=100, help='Number of leases to import')
+    args = parser.parse_args()
+
+    hostsd = load_hostsd()
+    work_dir = tempfile.mkdtemp()
+    hostsd.RESOLV_CONF_FILE = os.path.join(work_dir, 'resolv.conf')
+    hostsd.HOSTS_FILE = os.path.join(work_dir, 'hosts')
+    hostsd.STATE_FILE = os.path.join(work_dir, 'hostsd.state')
+    journal = hostsd.Journal(os.path.join(work_dir, 'hostsd.journal'), fsync=args.fsync)
+
+    for i in range(args.hosts):
+        hostsd.handle_message(add_message(i))
+    print("{0} hosts, {1} lease events/s".format(args.hosts, args.rate))
+
+    indexed = churn(hostsd.handle_message, args.hosts, args.events)
+    print("indexed store:  {0:8.3f}ms per event".format(indexed * 1000))
+
+    # The same messages against plain dicts
+    flat_state = hostsd.state_to_dict(hostsd.STATE)
+    def flat_handle(message):
+        msg = json.loads(message)
+        if msg['op'] == 'delete':
+            flat_delete_hosts(flat_state, msg['tag'])
+        else:
+            for e in msg['data']:
+                flat_state['hosts'][e['host']] = {'tag': msg['tag'], 'address': e['address'],
+                                                  'aliases': e['aliases']}
+    flat = churn(flat_handle, args.hosts, args.flat_events)
+    print("flat scan:      {0:8.3f}ms per event".format(flat * 1000))
+
+    # Files are written once per window, with all changes received in it
+    def journaled_handle(message):
+        hostsd.handle_message(message)
+        journal.append(message)
+    writes = 20
+    start = time.process_time()
+    for n in range(writes):
+        churn(journaled_handle, args.hosts, 1)
+        journal.flush()
+        hostsd.write_files(hostsd.STATE)
+    write = (time.process_time() - start) / writes - indexed
+    print("write out:      {0:8.3f}ms per window".format(write * 1000))
+
+    start = time.process_time()
+    journal.compact(hostsd.STATE)
+    compact = time.process_time() - start
+    print("compaction:     {0:8.3f}ms, {1:.3f}ms per event".format(
+          compact * 1000, compact / args.compact_after * 1000))
+    indexed += compact / args.compact_after
+
+    # Changes received while writing wait for the next window,
+    # so a window is at least as long as a write
+    writes_per_second = 1 / (args.write_window + write)
+    load = (indexed * args.rate) + (write * writes_per_second)
+    print("CPU needed for {0} events/s with a {1}s window: {2:.0f}%, {3:.1f} writes/s".format(
+          args.rate, args.write_window, load * 100, writes_per_second))
+    print("CPU needed for {0} events/s with the flat scan alone: {1:.0f}%".format(
+          args.rate, flat * args.rate * 100))
+
+    journal.close()
+    shutil.rmtree(work_dir)
+
+    for name, batch in [('one message per change', False), ('batch', True)]:
+        elapsed = bulk_import(args.import_hosts, args.write_window, batch)
+        print("import of {0} leases, {1}: {2:8.3f}ms".format(args.import_hosts, name, elapsed * 1000))
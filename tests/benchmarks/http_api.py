@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Load test for vyos-http-api-server: reader clients poll /retrieve while
+# a writer commits through /configure, first with the single-threaded
+# reference WSGI server the API used to run on, then with the asyncio
+# server and its worker pools.
+#
+# The config backend is a stub cli-shell-api that takes --backend-time ms
+# per call, commits take --commit-time ms.
+#
+# Runs from the source tree root without a VyOS system:
+#   PYTHONPATH=python python3 tests/benchmarks/http_api.py --clients 16
+#
+# Pass --check to exit with an error if the asyncio server is not faster,
+# e.g. in CI.
+
+import os
+import sys
+import glob
+import time
+import json
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import urllib.parse
+import importlib.machinery
+import wsgiref.simple_server
+
+import vyos.config
+import vyos.configindex
+from vyos.configversions import ConfigVersions
+from vyos.commitcoalescer import CommitCoalescer
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
+
+stub_cli_shell_api = """#!/bin/sh
+sleep {delay}
+for arg in "$@"; do
+    case "$arg" in
+        showConfig) cat {config}; exit 0 ;;
+        inSession|isMulti|isTag) exit 1 ;;
+        isLeaf|exists) exit 0 ;;
+    esac
+done
+exit 1
+"""
+
+running_config = """
+system {
+    host-name vyos
+    name-server 192.0.2.1
+}
+"""
+
+
+class StubSession(object):
+    def __init__(self, commit_time):
+        self.commit_time = commit_time
+
+    def apply_batch(self, ops):
+        return []
+
+    def commit(self):
+        time.sleep(self.commit_time)
+
+    def discard(self):
+        pass
+
+
+def load_server():
+    loader = importlib.machinery.SourceFileLoader('vyos_http_api_server',
+        os.path.join(base_dir, 'src/services/vyos-http-api-server'))
+    return loader.load_module()
+
+def setup(server, work_dir, args):
+    config_file = os.path.join(work_dir, 'config')
+    with open(config_file, 'w') as f:
+        f.write(running_config)
+    backend = os.path.join(work_dir, 'cli-shell-api')
+    with open(backend, 'w') as f:
+        f.write(stub_cli_shell_api.format(delay=args.backend_time / 1000.0, config=config_file))
+    os.chmod(backend, 0o755)
+
+    index_file = os.path.join(work_dir, 'index.json')
+    subprocess.check_call([os.path.join(base_dir, 'scripts/build-config-index'), index_file] +
+                          glob.glob(os.path.join(base_dir, 'interface-definitions/*.xml')))
+    index = vyos.configindex.load(index_file)
+
+    class StubConfig(vyos.config.Config):
+        def __init__(self):
+            super().__init__(snapshot=True)
+            self._cli_shell_api = backend
+            self._node_index = index
+
+    session = StubSession(args.commit_time / 1000.0)
+    app = server.app
+    app.config['vyos_session'] = session
+    app.config['vyos_config'] = StubConfig()
+    app.config['vyos_keys'] = [{'id': 'bench', 'key': 'bench'}]
+    app.config['vyos_debug'] = False
+    app.config['vyos_versions'] = ConfigVersions(config_class=StubConfig)
+    app.config['vyos_coalescer'] = CommitCoalescer(session, server.lock, on_commit=server.refresh_config)
+
+def start_wsgiref(server):
+    httpd = wsgiref.simple_server.make_server('127.0.0.1', 0, server.app,
+                                              handler_class=QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd.server_port, httpd.shutdown
+
+def start_async(server):
+    httpd = server.make_server({'listen_address': '127.0.0.1', 'port': 0})
+    started = threading.Event()
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(httpd.start())
+        started.set()
+        loop.run_forever()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+    return httpd.port, lambda: httpd.loop.call_soon_threadsafe(httpd.loop.stop)
+
+
+class QuietHandler(wsgiref.simple_server.WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def post(conn, url, data):
+    body = urllib.parse.urlencode({'key': 'bench', 'data': json.dumps(data)})
+    conn.request('POST', url, body=body, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    resp = conn.getresponse()
+    resp.read()
+    return resp.status
+
+def reader(port, deadline, latencies):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while time.time() < deadline:
+        start = time.time()
+        status = post(conn, '/retrieve', {'op': 'returnValue', 'path': ['system', 'host-name']})
+        if status == 200:
+            latencies.append(time.time() - start)
+    conn.close()
+
+def writer(port, deadline, commits):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while time.time() < deadline:
+        if post(conn, '/configure', {'op': 'set', 'path': ['system', 'host-name'], 'value': 'vyos'}) == 200:
+            commits.append(1)
+    conn.close()
+
+def run(name, port, args):
+    deadline = time.time() + args.duration
+    latencies = []
+    commits = []
+    threads = [threading.Thread(target=reader, args=(port, deadline, latencies)) for i in range(args.clients)]
+    threads.append(threading.Thread(target=writer, args=(port, deadline, commits)))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    rate = len(latencies) / args.duration
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print("{0:<8} reads: {1:8.1f}/s  p50: {2:7.1f}ms  p99: {3:8.1f}ms  commits: {4}".format(
+          name, rate, p50, p99, len(commits)))
+    return rate
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=16, help='Number of concurrent readers')
+    parser.add_argument('--duration', type=float, default=5, help='Duration of each run, in seconds')
+    parser.add_argument('--backend-time', type=int, default=5, help='Run time of the stub cli-shell-api, in ms')
+    parser.add_argument('--commit-time', type=int, default=500, help='Run time of a commit, in ms')
+    parser.add_argument('--check', action='store_true', help='Fail unless the asyncio server is faster')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    server = load_server()
+    setup(server, work_dir, args)
+
+    print("{0} readers, 1 writer, {1}ms commits".format(args.clients, args.commit_time))
+    rates = {}
+    for name, start in [('wsgiref', start_wsgiref), ('asyncio', start_async)]:
+        port, stop = start(server)
+        rates[name] = run(name, port, args)
+        stop()
+
+    print("speedup: {0:.2f}x".format(rates['asyncio'] / rates['wsgiref']))
+    shutil.rmtree(work_dir)
+
+    if args.check and rates['asyncio'] <= rates['wsgiref']:
+        sys.exit(1)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Measures vyos.ifconfig link and address changes with the netlink
+# backend and with ip commands: --links links of --kind are created,
+# brought up, given an address, changed back and deleted.
+#
+# Then applies the settings of --links links again, unchanged, with the
+# setters and with a Reconciler.
+#
+# Then configures --vlans VLAN interfaces of a parent as
+# interfaces-ethernet.py does, one at a time with VLANIf and all at once
+# with a VLANPlan. The VLAN interfaces are links of --kind named like
+# VLANs, so that kernels without 802.1q support can run it too, and the
+# plan only configures them.
+#
+# Changes interfaces, so it runs as root in a network namespace of its own,
+# from the source tree root:
+#   ip netns add bench
+#   ip netns exec bench env PYTHONPATH=python python3 tests/benchmarks/ifconfig.py --links 200
+#   ip netns del bench
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+from vyos.ifconfig import Interface, VLANIf
+
+
+class BenchIf(Interface):
+    kind = 'bridge'
+
+    def __init__(self, ifname):
+        super().__init__(ifname, type=self.kind)
+
+
+def address(n):
+    return '10.{0}.{1}.1/24'.format(n >> 8, n & 0xff)
+
+def measure(backend, links):
+    """ Returns: the average time of every step, by step, in seconds """
+    os.environ['VYOS_IFCONFIG_BACKEND'] = backend
+    steps = [
+        ('link add', lambda i, n: BenchIf('bench{0}'.format(n))),
+        ('link set up', lambda i, n: i.set_state('up')),
+        ('addr add', lambda i, n: i.add_addr(address(n))),
+        ('addr del', lambda i, n: i.del_addr(address(n))),
+        ('link set mtu', lambda i, n: i.set_mtu(1400)),
+        ('link del', lambda i, n: i.remove()),
+    ]
+    interfaces = [None] * links
+    times = {}
+    for step, func in steps:
+        start = time.time()
+        for n in range(links):
+            result = func(interfaces[n], n)
+            if interfaces[n] is None:
+                interfaces[n] = result
+        times[step] = (time.time() - start) / links
+    return times
+
+def configure(interface, n):
+    interface.set_alias('customer {0}'.format(n))
+    interface.set_mtu(1500)
+    interface.set_arp_cache_tmo(30)
+    interface.set_proxy_arp(0)
+    interface.set_proxy_arp_pvlan(0)
+    interface.set_state('up')
+
+def measure_reconcile(backend, links):
+    """ Returns: (with the setters, with a reconciler), in seconds """
+    os.environ['VYOS_IFCONFIG_BACKEND'] = backend
+    interfaces = [BenchIf('bench{0}'.format(n)) for n in range(links)]
+    for n, interface in enumerate(interfaces):
+        configure(interface, n)
+
+    times = []
+    for reconciled in [False, True]:
+        start = time.time()
+        for n, interface in enumerate(interfaces):
+            if reconciled:
+                r = interface.reconciler()
+                configure(r, n)
+                r.apply()
+            else:
+                configure(interface, n)
+        times.append(time.time() - start)
+
+    for interface in interfaces:
+        interface.remove()
+    return times
+
+def configure_vlan(vlan, n):
+    # Without link detect, link_filter is a VyOS kernel patch
+    vlan.set_alias('customer {0}'.format(n))
+    vlan.set_mtu(1500)
+    vlan.set_state('up')
+    vlan.add_addr(address(n))
+    vlan.add_addr('2001:db8:{0:x}::1/64'.format(n))
+
+def measure_vlans(backend, vlans, kind):
+    """ Returns: (one at a time, with a plan), in seconds """
+    os.environ['VYOS_IFCONFIG_BACKEND'] = backend
+    parent = BenchIf('bench')
+    commands = ''.join('link add bench.{0} type {1}\n'.format(n, kind) for n in range(1, vlans + 1))
+    times = []
+    for planned in [False, True]:
+        subprocess.run(['ip', '-batch', '-'], input=commands.encode(), check=True)
+        start = time.time()
+        if planned:
+            plan = VLANIf('bench').plan()
+            for n in range(1, vlans + 1):
+                configure_vlan(plan.add_vlan(n), n)
+            errors = plan.commit()
+            if errors:
+                sys.exit(errors[0][1])
+        else:
+            for n in range(1, vlans + 1):
+                configure_vlan(VLANIf('bench').add_vlan(n), n)
+        times.append(time.time() - start)
+        subprocess.run(['ip', '-batch', '-'], check=True,
+                       input=''.join('link del bench.{0}\n'.format(n) for n in range(1, vlans + 1)).encode())
+    parent.remove()
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--links', type=int, default=200, help='Number of links')
+    parser.add_argument('--kind', default='bridge', help='Kind of link to create')
+    parser.add_argument('--vlans', type=int, default=1000, help='Number of VLAN interfaces to configure')
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        sys.exit("Needs root, in a network namespace")
+    BenchIf.kind = args.kind
+
+    results = [(backend, measure(backend, args.links)) for backend in ['iproute2', 'netlink']]
+    print("{0} {1} links, per operation".format(args.links, args.kind))
+    print("{0:<14}".format('') + ''.join('{0:>12}'.format(b) for b, _ in results))
+    for step in results[0][1]:
+        print("{0:<14}".format(step) + ''.join('{0:10.3f}ms'.format(t[step] * 1000) for _, t in results))
+
+    print("{0} unchanged links configured again".format(args.links))
+    for backend in ['iproute2', 'netlink']:
+        setters, reconciled = measure_reconcile(backend, args.links)
+        print("{0:<10} setters: {1:8.3f}s  reconciler: {2:8.3f}s".format(backend, setters, reconciled))
+
+    print("{0} VLAN interfaces configured".format(args.vlans))
+    for backend in ['iproute2', 'netlink']:
+        single, planned = measure_vlans(backend, args.vlans, args.kind)
+        print("{0:<10} one at a time: {1:8.3f}s  with a plan: {2:8.3f}s".format(backend, single, planned))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Measures config backend queries per second, with a subprocess per query
+# (the old behaviour) and through the long-lived shell of vyos.shellapi.
+#
+# On a VyOS system the default query is used, elsewhere pass any command:
+#   PYTHONPATH=python python3 tests/benchmarks/shellapi.py --command /bin/true
+
+import os
+import sys
+import time
+import shlex
+import argparse
+
+import vyos.shellapi
+
+
+def run(queries, cmd):
+    start = time.time()
+    for i in range(queries):
+        code, out = vyos.shellapi.run(cmd)
+        if code != 0:
+            print("Query failed with exit code {0}: {1}".format(code, " ".join(cmd)))
+            sys.exit(1)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=2000, help='Number of queries per backend')
+    parser.add_argument('--rss', type=int, default=0,
+                        help='Megabytes of memory to allocate first, the cost of fork() grows with it')
+    parser.add_argument('--command', type=str, default='/bin/cli-shell-api exists system',
+                        help='Query to run')
+    args = parser.parse_args()
+
+    cmd = shlex.split(args.command)
+    ballast = bytearray(args.rss * 1024 * 1024)
+    for name, legacy in [('subprocess', True), ('shell', False)]:
+        if legacy:
+            os.environ['VYOS_CONFIG_BACKEND'] = 'cli-shell-api'
+        else:
+            os.environ.pop('VYOS_CONFIG_BACKEND', None)
+        elapsed = run(args.queries, cmd)
+        print("{0:<12} queries: {1:<8} time: {2:.3f}s  queries/s: {3:.0f}".format(
+              name, args.queries, elapsed, args.queries / elapsed))
+
+    sys.exit(0)
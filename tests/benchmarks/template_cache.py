@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Measures the time it takes to get the dhcpd.conf template of
+# dhcp_server.py and render it with thousands of static mappings:
+# compiled from source with jinja2.Template as scripts used to do,
+# loaded from the bytecode cache by a new process (the first
+# get_template call in a script), and from the in-process cache.
+#
+# Runs from the source tree root without a VyOS system:
+#   PYTHONPATH=python python3 tests/benchmarks/template_cache.py --mappings 5000
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import ipaddress
+
+import jinja2
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+
+import vyos.template
+from src.tests.helper import prepare_module
+
+prepare_module('src/conf_mode/dhcp_server.py', 'dhcp_server')
+import dhcp_server
+
+
+def make_config(mappings):
+    network = ipaddress.ip_network('10.0.0.0/8')
+    subnet = {
+        'address': str(network.network_address),
+        'netmask': str(network.netmask),
+        'default_router': '10.0.0.1',
+        'dns_server': ['10.0.0.1'],
+        'domain_name': 'example.com',
+        'lease': '86400',
+        'range': [{'start': '10.255.0.1', 'stop': '10.255.255.254'}],
+        'static_mapping': []
+    }
+    for i in range(mappings):
+        subnet['static_mapping'].append({
+            'name': 'host{0}'.format(i),
+            'disabled': False,
+            'ip_address': str(network.network_address + 256 + i),
+            'mac_address': '00:53:{0:02x}:{1:02x}:{2:02x}:00'.format(i >> 16, (i >> 8) & 0xff, i & 0xff),
+            'static_parameters': []
+        })
+
+    dhcp = dict(dhcp_server.default_config_data)
+    dhcp['shared_network'] = [{'name': 'LAN', 'authoritative': True, 'disabled': False,
+                               'network_parameters': [], 'subnet': [subnet]}]
+    return dhcp
+
+def measure(get, dhcp, rounds):
+    get_time = 0.0
+    render_time = 0.0
+    for i in range(rounds):
+        start = time.time()
+        tmpl = get()
+        get_time += time.time() - start
+        start = time.time()
+        tmpl.render(dhcp)
+        render_time += time.time() - start
+    return (get_time / rounds * 1000, render_time / rounds * 1000)
+
+def cold_cache_get():
+    # As in a new process: nothing compiled, bytecode cache not opened yet
+    vyos.template._cache = None
+    vyos.template._environments.clear()
+    vyos.template._templates.clear()
+    return vyos.template.get_template(dhcp_server.config_tmpl)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mappings', type=int, default=5000, help='Number of static mappings')
+    parser.add_argument('--rounds', type=int, default=20, help='Number of renders to average')
+    args = parser.parse_args()
+
+    dhcp = make_config(args.mappings)
+
+    cache_dir = tempfile.mkdtemp()
+    vyos.template.build_cache([(dhcp_server.config_tmpl, {})], cache_dir)
+    vyos.template.CACHE_DIR = cache_dir
+
+    cases = [
+        ('jinja2.Template', lambda: jinja2.Template(dhcp_server.config_tmpl)),
+        ('bytecode cache', cold_cache_get),
+        ('in-process', lambda: vyos.template.get_template(dhcp_server.config_tmpl)),
+    ]
+    print("dhcpd.conf with {0} static mappings, average of {1} rounds".format(args.mappings, args.rounds))
+    for name, get in cases:
+        get_ms, render_ms = measure(get, dhcp, args.rounds)
+        print("{0:<16} get: {1:8.3f}ms  render: {2:8.3f}ms  total: {3:8.3f}ms".format(
+              name, get_ms, render_ms, get_ms + render_ms))
+
+    shutil.rmtree(cache_dir)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2019 VyOS maintainers and contributors
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 or later as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+
+# Measures the check dhcp_server.py makes of every subnet, whether it is
+# connected to the primary address of an interface: with the scan of all
+# interface addresses per subnet vyos.validate used to do, and with one
+# AddressSnapshot for all subnets. --interfaces links of --kind get two
+# addresses each, and --subnets subnets are checked, half of them connected.
+#
+# Creates interfaces, so it runs as root in a network namespace of its own,
+# from the source tree root:
+#   ip netns add bench
+#   ip netns exec bench env PYTHONPATH=python python3 tests/benchmarks/validate.py --subnets 200
+#   ip netns del bench
+
+import os
+import sys
+import time
+import argparse
+import ipaddress
+import subprocess
+
+import netifaces
+
+from vyos.validate import AddressSnapshot
+
+
+def scan_subnet_connected(subnet, primary=False):
+    """ is_subnet_connected as it was, reading all interfaces every time """
+    addr_type = netifaces.AF_INET
+    for interface in netifaces.interfaces():
+        if addr_type not in netifaces.ifaddresses(interface).keys():
+            continue
+        if primary:
+            ip = netifaces.ifaddresses(interface)[addr_type][0]['addr']
+            if ipaddress.ip_address(ip) in ipaddress.ip_network(subnet):
+                return True
+        else:
+            for ip in netifaces.ifaddresses(interface)[addr_type]:
+                addr = ip['addr'].split('%')[0]
+                if ipaddress.ip_address(addr) in ipaddress.ip_network(subnet):
+                    return True
+    return False
+
+def subnet(n):
+    return '10.{0}.{1}.0/24'.format(n >> 8, n & 0xff)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interfaces', type=int, default=200, help='Number of interfaces')
+    parser.add_argument('--subnets', type=int, default=200, help='Number of subnets checked')
+    parser.add_argument('--kind', default='bridge', help='Kind of link to create')
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        sys.exit("Needs root, in a network namespace")
+
+    commands = ''
+    for n in range(args.interfaces):
+        commands += 'link add bench{0} type {1}\n'.format(n, args.kind)
+        commands += 'addr add 10.{0}.{1}.1/24 dev bench{2}\n'.format(n >> 8, n & 0xff, n)
+        commands += 'addr add 172.16.{0}.{1}/32 dev bench{2}\n'.format(n >> 8, n & 0xff, n)
+    subprocess.run(['ip', '-batch', '-'], input=commands.encode(), check=True)
+
+    # every other subnet is on an interface, the others are not
+    subnets = [subnet(n * args.interfaces * 2 // args.subnets) for n in range(args.subnets)]
+    try:
+        start = time.time()
+        scanned = [scan_subnet_connected(s, primary=True) for s in subnets]
+        scan = time.time() - start
+
+        start = time.time()
+        addresses = AddressSnapshot()
+        snapshot = [addresses.is_subnet_connected(s, primary=True) for s in subnets]
+        trie = time.time() - start
+    finally:
+        subprocess.run(['ip', '-batch', '-'], check=True,
+                       input=''.join('link del bench{0}\n'.format(n) for n in range(args.interfaces)).encode())
+
+    if scanned != snapshot:
+        sys.exit("Results differ")
+    print("{0} subnets, {1} connected, {2} interfaces".format(args.subnets, sum(snapshot), args.interfaces))
+    print("scan per subnet: {0:8.3f}s".format(scan))
+    print("AddressSnapshot: {0:8.3f}s".format(trie))